@@ -0,0 +1,226 @@
+'''
+Measure the wall time, the rows read per second and the peak memory usage
+of each aggregate command of "flask data" (see src/commands/data.py) on
+synthetic trade files written by benchmarks.synthetic. Each command runs in
+its own process, on a new SQLite database, so that the peak resident set
+size measured is its own.
+
+The results of each run are appended to a JSON lines file, and compared with
+those of the last run with the same files, so that the effect of a change
+of the commands can be measured by running the benchmark before and after
+it.
+
+Usage (from the dashboard directory):
+
+    python -m benchmarks.etl --rows 2000000
+    python -m benchmarks.etl --data-dir /tmp/comex --rows 20000000
+'''
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import click
+
+from benchmarks.synthetic import get_trades_path, write_files
+
+DASHBOARD_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RESULTS_PATH = os.path.join(DASHBOARD_DIR, 'benchmarks', 'results',
+                            'etl.jsonl')
+
+# The commands to measure, with the arguments they take besides the options
+# of the kind and year
+COMMANDS = {
+    'aggregate-by-state-and-add': ['csv', 'states', 'products'],
+    'aggregate-by-month-and-state-and-add': ['csv', 'states', 'products'],
+    'aggregate-state-contributions-and-add': ['csv', 'states'],
+    'aggregate-all-and-add': ['csv', 'states', 'products']
+}
+
+
+def run(args, env):
+    '''
+    Run the command, and get its wall time in seconds and the peak resident
+    set size of its process in MiB
+    '''
+    start = time.perf_counter()
+    process = subprocess.Popen(args, cwd=DASHBOARD_DIR, env=env,
+                               stdout=subprocess.DEVNULL,
+                               stderr=subprocess.PIPE)
+    # Unlike process.wait(), wait4 gets the resources used by the process
+    _, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    errors = process.stderr.read().decode()
+    process.stderr.close()
+    if process.returncode:
+        raise click.ClickException(f'{" ".join(args[2:])} failed:\n{errors}')
+    return elapsed, usage.ru_maxrss / 1024
+
+
+def get_env(database_path):
+    return dict(os.environ, FLASK_APP='wsgi', FLASK_ENV='production',
+                FLASK_DEBUG='', DATABASE_URL=f'sqlite:///{database_path}')
+
+
+def measure(name, args, rows, tmp):
+    '''
+    Run the data command on a new database, and get its results
+    '''
+    database_path = os.path.join(tmp, f'{name}.db')
+    env = get_env(database_path)
+    flask = [sys.executable, '-m', 'flask']
+    try:
+        run(flask + ['database', 'create'], env)
+        seconds, peak_rss = run(flask + ['data', name] + args, env)
+    finally:
+        if os.path.exists(database_path):
+            os.remove(database_path)
+    return {'command': name, 'seconds': round(seconds, 3),
+            'rows_per_second': round(rows / seconds),
+            'peak_rss': round(peak_rss, 1)}
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=DASHBOARD_DIR,
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_previous(results_path, **fields):
+    '''
+    Get the results of the last run with the same values of the given
+    fields (e.g. the same trade files), if any
+    '''
+    previous = None
+    if os.path.exists(results_path):
+        with open(results_path) as f:
+            for line in f:
+                run_results = json.loads(line)
+                if all(run_results.get(name) == value
+                       for name, value in fields.items()):
+                    previous = run_results
+    return previous
+
+
+def save(results_path, run_results):
+    os.makedirs(os.path.dirname(results_path), exist_ok=True)
+    with open(results_path, 'a') as f:
+        f.write(json.dumps(run_results) + '\n')
+
+
+def format_change(value, previous):
+    if previous is None:
+        return ''
+    return f'{100 * (value - previous) / previous:+.0f}%'
+
+
+@click.command()
+@click.option('--rows', default=2000000, show_default=True,
+              help='How many rows to write to each trade file')
+@click.option('--year', 'years', type=int, multiple=True, default=[2019],
+              show_default=True, help='The years of the trade files')
+@click.option('--kind', 'kinds', type=click.Choice(['import', 'export']),
+              multiple=True, default=['import'], show_default=True,
+              help='The kinds of the trade files')
+@click.option('--products', default=10000, show_default=True,
+              help='How many distinct products to use')
+@click.option('--chunksize', type=click.IntRange(min=1),
+              help='Pass this --chunksize to the commands')
+@click.option('--data-dir', type=click.Path(file_okay=False),
+              help='Keep the synthetic files in this directory, and reuse '
+                   'those already there')
+@click.option('--results', 'results_path', type=click.Path(dir_okay=False),
+              default=RESULTS_PATH, show_default=True,
+              help='The file where the results of each run are appended')
+def main(rows, years, kinds, products, chunksize, data_dir, results_path):
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = data_dir or os.path.join(tmp, 'data')
+        paths = {(kind, year): get_trades_path(data_dir, kind, year)
+                 for kind in kinds for year in years}
+        # The files are reused only if they have the expected size, since
+        # writing tens of millions of rows takes a while
+        files = {'rows': rows, 'years': sorted(years),
+                 'kinds': sorted(kinds), 'products': products}
+        files_path = os.path.join(data_dir, 'synthetic.json')
+        if os.path.exists(files_path) and all(map(os.path.exists,
+                                                  paths.values())):
+            with open(files_path) as f:
+                reuse = json.load(f) == files
+        else:
+            reuse = False
+        if not reuse:
+            click.echo(f'Writing {len(paths)} files of {rows} rows...')
+            # The peak memory usage of a process is inherited by the
+            # processes it starts, so do not write the files in this one
+            process = multiprocessing.Process(
+                target=write_files,
+                args=(data_dir, rows, years, kinds, products))
+            process.start()
+            process.join()
+            with open(files_path, 'w') as f:
+                json.dump(files, f)
+        size = sum(map(os.path.getsize, paths.values())) / 2**20
+        click.echo(f'{len(paths)} files of {rows} rows ({size:.1f} MiB), '
+                   f'{os.cpu_count()} CPUs')
+
+        # The aggregate commands read the first file only
+        kind, year = next(iter(paths))
+        arguments = {'csv': paths[kind, year],
+                     'states': os.path.join(data_dir, 'UF.csv'),
+                     'products': os.path.join(data_dir, 'NCM.csv')}
+        options = ['--force']
+        if chunksize:
+            options += ['--chunksize', str(chunksize)]
+        results = []
+        for name, names in COMMANDS.items():
+            args = [arguments[arg] for arg in names]
+            args += ['--kind', kind, '--year', str(year)] + options
+            results.append(measure(name, args, rows, tmp))
+        # All of the files, with a process for each one
+        args = [data_dir, arguments['states'], arguments['products'],
+                '--first-year', str(min(years)), '--last-year',
+                str(max(years))]
+        args += [f'--kind={kind}' for kind in kinds] + options
+        results.append(measure('build-all', args, rows * len(paths), tmp))
+
+    previous = load_previous(results_path, files=files)
+    run_results = {
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': get_commit(),
+        'cpus': os.cpu_count(),
+        'chunksize': chunksize,
+        'files': files,
+        'results': results
+    }
+    save(results_path, run_results)
+
+    previous_results = {}
+    if previous is not None:
+        click.echo(f'Compared with the run of {previous["date"]} (commit '
+                   f'{previous["commit"]}):')
+        previous_results = {result['command']: result
+                            for result in previous['results']}
+    click.echo(f'{"command":<40}{"time (s)":>10}{"rows/s":>12}'
+               f'{"peak RSS (MiB)":>16}{"time":>8}{"RSS":>8}')
+    for result in results:
+        old = previous_results.get(result['command'], {})
+        time_change = format_change(result['seconds'], old.get('seconds'))
+        rss_change = format_change(result['peak_rss'], old.get('peak_rss'))
+        click.echo(f'{result["command"]:<40}{result["seconds"]:>10.2f}'
+                   f'{result["rows_per_second"]:>12}'
+                   f'{result["peak_rss"]:>16.1f}{time_change:>8}'
+                   f'{rss_change:>8}')
+    click.echo(f'Results saved to {results_path}.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+'''
+Measure the throughput and the latency percentiles of the dashboard pages
+(/dashboard/<state_code>/<year>[/<month>]) under a given number of
+concurrent clients. Each client requests a page as soon as it gets the
+previous one, for a fixed duration. The pages are chosen at random with a
+mix like that of real visits: the large states and the latest years are the
+most visited, and some of the visits are to the pages of a month. With
+--charts, the clients also get the charts of each page, as browsers do.
+
+By default, the pages are served by gunicorn (with gunicorn.conf.py) from a
+temporary SQLite database filled by "flask data build-all" with files
+written by benchmarks.synthetic. With --url, the pages of a server already
+running are requested instead.
+
+The results of each run are appended to a JSON lines file, and compared with
+those of the last run with the same settings, so that the effect of a change
+of the routes can be measured by running the benchmark before and after it.
+
+Usage (from the dashboard directory):
+
+    python -m benchmarks.load --concurrency 1 --concurrency 8 --duration 30
+    python -m benchmarks.load --url http://localhost:5000 --charts
+'''
+import json
+import multiprocessing
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from itertools import cycle
+
+import click
+
+from benchmarks.etl import (format_change, get_commit, get_env,
+                            load_previous, run, save)
+from benchmarks.server import start_server
+from benchmarks.synthetic import STATE_CODES, STATE_WEIGHTS, write_files
+
+DASHBOARD_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RESULTS_PATH = os.path.join(DASHBOARD_DIR, 'benchmarks', 'results',
+                            'load.jsonl')
+
+# The share of visits to the pages of a month, and how much more the pages
+# of each year are visited than those of the year before
+MONTH_SHARE = 0.3
+YEAR_DECAY = 2
+
+CHART_URL = re.compile(r'src="(/chart/[^"]+)"')
+
+
+def seed_database(tmp, rows, years):
+    '''
+    Fill a SQLite database in the directory with the aggregates of
+    synthetic trade files of both kinds for the given years, and get its
+    path
+    '''
+    data_dir = os.path.join(tmp, 'data')
+    # Do not keep the memory used to write the files in this process
+    process = multiprocessing.Process(
+        target=write_files,
+        args=(data_dir, rows, years, ['import', 'export']))
+    process.start()
+    process.join()
+    database_path = os.path.join(tmp, 'load.db')
+    env = get_env(database_path)
+    flask = [sys.executable, '-m', 'flask']
+    run(flask + ['database', 'create'], env)
+    run(flask + ['data', 'build-all', data_dir,
+                 os.path.join(data_dir, 'UF.csv'),
+                 os.path.join(data_dir, 'NCM.csv'),
+                 '--first-year', str(min(years)),
+                 '--last-year', str(max(years))], env)
+    return database_path
+
+
+def get_json(url):
+    with urllib.request.urlopen(url) as response:
+        return json.load(response)
+
+
+def get_paths(base_url, count, seed=0):
+    '''
+    Get the paths of the given number of visits to the dashboard pages of
+    the states and years available in the server
+    '''
+    state_codes = get_json(f'{base_url}/api/states')['state_codes']
+    years = get_json(f'{base_url}/api/years')['years']
+    shares = dict(zip(STATE_CODES, STATE_WEIGHTS))
+    state_weights = [shares.get(state_code, min(STATE_WEIGHTS))
+                     for state_code in state_codes]
+    year_weights = [YEAR_DECAY ** i for i in range(len(years))]
+    rng = random.Random(seed)
+    paths = []
+    for state_code, year in zip(
+            rng.choices(state_codes, state_weights, k=count),
+            rng.choices(years, year_weights, k=count)):
+        path = f'/dashboard/{state_code}/{year}'
+        if rng.random() < MONTH_SHARE:
+            path += f'/{rng.randint(1, 12)}'
+        paths.append(path)
+    return paths
+
+
+def fetch(url):
+    '''
+    Get the URL, and return its response body, or None if it failed
+    '''
+    try:
+        with urllib.request.urlopen(url, timeout=60) as response:
+            return response.read()
+    except (urllib.error.URLError, ConnectionError, TimeoutError):
+        return None
+
+
+def visit(base_url, path, charts):
+    '''
+    Get the page (and its charts), and return the latency of each request
+    in seconds by whether it was for a page or a chart, with None for those
+    which failed
+    '''
+    start = time.perf_counter()
+    page = fetch(base_url + path)
+    latencies = {'page': [time.perf_counter() - start if page else None],
+                 'chart': []}
+    if charts and page:
+        for chart_path in CHART_URL.findall(page.decode('utf-8')):
+            start = time.perf_counter()
+            chart = fetch(base_url + chart_path.replace('&amp;', '&'))
+            latencies['chart'].append(
+                time.perf_counter() - start if chart else None)
+    return latencies
+
+
+def measure(base_url, paths, concurrency, duration, charts):
+    '''
+    Visit the pages with the given number of concurrent clients for the
+    duration (in seconds), and get the latencies of the requests by kind
+    '''
+    latencies = {'page': [], 'chart': []}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+    visits = cycle(paths)
+
+    def client(_):
+        while time.monotonic() < deadline:
+            with lock:
+                path = next(visits)
+            result = visit(base_url, path, charts)
+            with lock:
+                for kind, values in result.items():
+                    latencies[kind].extend(values)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(client, range(concurrency)))
+    return latencies, time.perf_counter() - start
+
+
+def summarize(latencies, elapsed):
+    '''
+    Get the number of requests per second, the number of failures and the
+    latency percentiles (in milliseconds) of the requests
+    '''
+    succeeded = sorted(value for value in latencies if value is not None)
+    summary = {'requests': len(latencies),
+               'errors': len(latencies) - len(succeeded),
+               'requests_per_second': round(len(succeeded) / elapsed, 2)}
+    if len(succeeded) > 1:
+        percentiles = statistics.quantiles(succeeded, n=100,
+                                           method='inclusive')
+        for percentile in [50, 95, 99]:
+            summary[f'p{percentile}'] = \
+                round(1000 * percentiles[percentile - 1], 1)
+        summary['max'] = round(1000 * succeeded[-1], 1)
+    return summary
+
+
+def report(results, previous):
+    '''
+    Show the results, with the change of the p99 latency since the previous
+    run
+    '''
+    previous_results = {}
+    if previous is not None:
+        click.echo(f'Compared with the run of {previous["date"]} (commit '
+                   f'{previous["commit"]}):')
+        previous_results = {(result['concurrency'], result['kind']): result
+                            for result in previous['results']}
+    click.echo(f'{"clients":>7}{"kind":>7}{"requests":>10}{"errors":>8}'
+               f'{"req/s":>9}{"p50 (ms)":>10}{"p95 (ms)":>10}'
+               f'{"p99 (ms)":>10}{"max (ms)":>10}{"p99":>7}')
+    for result in results:
+        old = previous_results.get((result['concurrency'], result['kind']),
+                                   {})
+        p99_change = ''
+        if 'p99' in result:
+            p99_change = format_change(result['p99'], old.get('p99'))
+        percentiles = ''.join(
+            f'{result[name]:>10.1f}' if name in result else f'{"-":>10}'
+            for name in ['p50', 'p95', 'p99', 'max'])
+        click.echo(f'{result["concurrency"]:>7}{result["kind"]:>7}'
+                   f'{result["requests"]:>10}{result["errors"]:>8}'
+                   f'{result["requests_per_second"]:>9.1f}{percentiles}'
+                   f'{p99_change:>7}')
+
+
+@click.command()
+@click.option('--url', help='Request the pages of this server instead of '
+                            'starting one')
+@click.option('--concurrency', 'levels', type=click.IntRange(min=1),
+              multiple=True, default=[1, 4, 16], show_default=True,
+              help='How many clients to run at a time (can be repeated)')
+@click.option('--duration', default=20.0, show_default=True,
+              help='For how many seconds to run the clients of each level')
+@click.option('--charts', is_flag=True,
+              help='Also get the charts of each page')
+@click.option('--rows', default=200000, show_default=True,
+              help='How many rows to write to each synthetic trade file')
+@click.option('--year', 'years', type=int, multiple=True,
+              default=[datetime.now().year - 2, datetime.now().year - 1],
+              help='The years of the synthetic trade files  [default: the '
+                   'last two years]')
+@click.option('--config', 'config_path', default='gunicorn.conf.py',
+              show_default=True, help='The config file of gunicorn')
+@click.option('--port', default=5099, show_default=True,
+              help='The port of the server started')
+@click.option('--no-cache', is_flag=True,
+              help='Disable the chart and page caches of the server started')
+@click.option('--seed', default=0, show_default=True,
+              help='Seed for the random choice of the pages')
+@click.option('--results', 'results_path', type=click.Path(dir_okay=False),
+              default=RESULTS_PATH, show_default=True,
+              help='The file where the results of each run are appended')
+def main(url, levels, duration, charts, rows, years, config_path, port,
+         no_cache, seed, results_path):
+    with tempfile.TemporaryDirectory() as tmp:
+        process = None
+        if url is None:
+            click.echo(f'Loading {rows} synthetic rows of each kind and '
+                       f'year into the database...')
+            env = get_env(seed_database(tmp, rows, years))
+            env.update(CHART_CACHE_DIR=os.path.join(tmp, 'charts'),
+                       PRERENDER_DIR=os.path.join(tmp, 'prerendered'))
+            if no_cache:
+                env.update(CHART_CACHE_SIZE='0', CHART_CACHE_DIR='',
+                           PAGE_CACHE_SIZE='0', PAGE_CACHE_DIR='')
+            process = start_server(config_path, port, env)
+            url = f'http://127.0.0.1:{port}'
+        try:
+            paths = get_paths(url, 1000, seed)
+            # Warm up the workers (and the caches of the pages visited most)
+            with ThreadPoolExecutor(max(levels)) as executor:
+                list(executor.map(lambda path: visit(url, path, charts),
+                                  paths[:2 * max(levels)]))
+            results = []
+            for concurrency in levels:
+                click.echo(f'Running {concurrency} clients for {duration} '
+                           's...')
+                latencies, elapsed = measure(url, paths, concurrency,
+                                             duration, charts)
+                for kind in ['page', 'chart'] if charts else ['page']:
+                    results.append(dict(
+                        concurrency=concurrency, kind=kind,
+                        **summarize(latencies[kind], elapsed)))
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+    settings = {'url': None if process else url, 'duration': duration,
+                'charts': charts, 'no_cache': no_cache, 'seed': seed}
+    if process is not None:
+        settings.update(rows=rows, years=sorted(years),
+                        config=config_path)
+    previous = load_previous(results_path, settings=settings)
+    save(results_path, {
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': get_commit(),
+        'cpus': os.cpu_count(),
+        'settings': settings,
+        'results': results
+    })
+    click.echo(f'{len(set(paths))} distinct pages, {os.cpu_count()} CPUs')
+    report(results, previous)
+    click.echo(f'Results saved to {results_path}.')
+
+
+if __name__ == '__main__':
+    main()
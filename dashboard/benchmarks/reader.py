@@ -0,0 +1,82 @@
+'''
+Compare the time and memory used to read a synthetic trade CSV file with
+plain pandas.read_csv calls (as the data commands used to do) and with the
+compact reader used by the data commands now.
+
+Usage (from the dashboard directory):
+
+    python -m benchmarks.reader --rows 2000000
+'''
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+import click
+import pandas as pd
+
+from benchmarks.synthetic import write_trades
+from src.commands.data import TRADE_COLUMNS, get_trades
+
+YEAR = 2019
+
+
+def read_plain(csv_path):
+    df = pd.read_csv(csv_path, delimiter=';', usecols=list(TRADE_COLUMNS))
+    df = df.rename(columns=TRADE_COLUMNS)
+    return df[df['year'] == YEAR]
+
+
+def read_compact(csv_path):
+    return get_trades(csv_path, YEAR, list(TRADE_COLUMNS))
+
+
+READERS = {'plain read_csv': read_plain, 'compact reader': read_compact}
+
+
+def get_peak_rss():
+    '''
+    Get the peak resident set size of the current process in MiB
+    '''
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(name, csv_path, results):
+    before = get_peak_rss()
+    start = time.perf_counter()
+    df = READERS[name](csv_path)
+    elapsed = time.perf_counter() - start
+    results[name] = {
+        'seconds': elapsed,
+        'peak_rss': get_peak_rss() - before,
+        'frame': df.memory_usage(deep=True).sum() / 2**20
+    }
+
+
+@click.command()
+@click.option('--rows', default=1000000, show_default=True,
+              help='How many rows to write to the synthetic file')
+def main(rows):
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, f'IMP_{YEAR}.csv')
+        write_trades(csv_path, rows, YEAR)
+        click.echo(f'{rows} rows, {os.path.getsize(csv_path) / 2**20:.1f} '
+                   'MiB on disk')
+        results = multiprocessing.Manager().dict()
+        for name in READERS:
+            # Use a fresh process for each reader, so that the peak memory
+            # usage of one does not hide the usage of the other
+            process = multiprocessing.Process(
+                target=measure, args=(name, csv_path, results))
+            process.start()
+            process.join()
+        click.echo(f'{"reader":<16}{"time (s)":>10}{"peak RSS (MiB)":>16}'
+                   f'{"frame (MiB)":>13}')
+        for name, result in results.items():
+            click.echo(f'{name:<16}{result["seconds"]:>10.2f}'
+                       f'{result["peak_rss"]:>16.1f}{result["frame"]:>13.1f}')
+
+
+if __name__ == '__main__':
+    main()
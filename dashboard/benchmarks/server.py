@@ -0,0 +1,164 @@
+'''
+Compare the throughput of the dashboard served by gunicorn with its default
+settings (a single sync worker, as docker-compose used to start it) and with
+the settings of gunicorn.conf.py, on a temporary SQLite database with
+synthetic data. The requests cycle through the pages and charts of every
+state, with the chart caches disabled (unless --cache is given), so that
+each chart is rendered again.
+
+Usage (from the dashboard directory):
+
+    python -m benchmarks.server --requests 300 --concurrency 8
+    WEB_CONCURRENCY=4 GUNICORN_THREADS=2 python -m benchmarks.server
+'''
+import os
+import random
+import subprocess
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import click
+
+from benchmarks.queries import add_rows
+from src import create_app
+from src.database import db
+from src.model import TopByStateAndYear
+from src.queries import STATE_CODES
+
+# The year of the data, which has monthly charts in the dashboard
+YEAR = datetime.now().year - 1
+
+DASHBOARD_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def create_database(path, products):
+    '''
+    Fill a SQLite database with the totals of the given number of products
+    for each state and month of YEAR
+    '''
+    app = create_app('testing')
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    with app.app_context():
+        db.create_all()
+        add_rows(products, year=YEAR)
+        # The years available in the dashboard
+        db.session.add_all([
+            TopByStateAndYear(state_code=state_code, state='Nome', year=YEAR,
+                              kind='import', product_code=0, product='Nome',
+                              total=1)
+            for state_code in STATE_CODES])
+        db.session.commit()
+
+
+def get_paths():
+    '''
+    Get the paths of the pages of each state, and of their charts
+    '''
+    paths = []
+    for i, state in enumerate(STATE_CODES):
+        paths.append(f'/dashboard/{state}/{YEAR}')
+        for kind in ['import', 'export']:
+            paths.append(f'/chart/top-products/{kind}/{state}/{YEAR}.png')
+            paths.append(f'/chart/top-products/{kind}/{state}/{YEAR}/'
+                         f'{i % 12 + 1}.png')
+            paths.append(f'/chart/contribution/{kind}/{state}/{YEAR}.png')
+    for kind in ['import', 'export']:
+        paths.append(f'/chart/top-states/{kind}/{YEAR}.png')
+    return paths
+
+
+def start_server(config_path, port, env):
+    '''
+    Start gunicorn with the given config file, and wait until it answers
+    '''
+    process = subprocess.Popen(
+        ['gunicorn', '--config', config_path, '--bind', f'127.0.0.1:{port}',
+         'wsgi:app'],
+        cwd=DASHBOARD_DIR, env=env, stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/api/years')
+            return process
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    process.terminate()
+    raise click.ClickException('The server did not start')
+
+
+def fetch(url):
+    '''
+    Get the URL, and return whether it succeeded
+    '''
+    try:
+        with urllib.request.urlopen(url) as response:
+            response.read()
+            return True
+    except urllib.error.URLError:
+        return False
+
+
+def measure(base_url, paths, requests, concurrency):
+    '''
+    Send the requests with the given number of concurrent clients, and get
+    the number of requests per second and how many of them failed
+    '''
+    urls = [base_url + paths[i % len(paths)] for i in range(requests)]
+    with ThreadPoolExecutor(concurrency) as executor:
+        # Warm up each worker
+        list(executor.map(fetch, urls[:2 * concurrency]))
+        start = time.perf_counter()
+        results = list(executor.map(fetch, urls))
+        elapsed = time.perf_counter() - start
+    return requests / elapsed, results.count(False)
+
+
+@click.command()
+@click.option('--products', default=200, show_default=True,
+              help='How many products each state trades in each month')
+@click.option('--requests', default=300, show_default=True,
+              help='How many requests to send to each server')
+@click.option('--concurrency', default=8, show_default=True,
+              help='How many requests to send at a time')
+@click.option('--port', default=5099, show_default=True,
+              help='The port of the servers')
+@click.option('--cache', is_flag=True,
+              help='Keep the rendered charts in the chart cache')
+def main(products, requests, concurrency, port, cache):
+    with tempfile.TemporaryDirectory() as tmp:
+        database_path = os.path.join(tmp, 'bench.db')
+        create_database(database_path, products)
+        env = dict(os.environ, FLASK_ENV='production', FLASK_DEBUG='',
+                   DATABASE_URL=f'sqlite:///{database_path}',
+                   PRERENDER_DIR=os.path.join(tmp, 'prerendered'))
+        if not cache:
+            env.update(CHART_CACHE_SIZE='0', CHART_CACHE_DIR='')
+        default_config = os.path.join(tmp, 'default.conf.py')
+        open(default_config, 'w').close()
+        paths = get_paths()
+        random.Random(0).shuffle(paths)
+        click.echo(f'{requests} requests, {concurrency} at a time, '
+                   f'{os.cpu_count()} CPUs')
+        click.echo(f'{"config":<20}{"requests/s":>12}{"errors":>8}')
+        for name, config_path in [('default', default_config),
+                                  ('gunicorn.conf.py', 'gunicorn.conf.py')]:
+            if cache:
+                # Each server starts without any chart in its cache
+                env['CHART_CACHE_DIR'] = os.path.join(tmp, f'charts-{name}')
+            process = start_server(config_path, port, env)
+            try:
+                throughput, errors = measure(f'http://127.0.0.1:{port}',
+                                             paths, requests, concurrency)
+            finally:
+                process.terminate()
+                process.wait()
+            click.echo(f'{name:<20}{throughput:>12.1f}{errors:>8}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+'''
+Write synthetic trade files shaped like the COMEX files (IMP_2019.csv,
+EXP_2019.csv, etc), with the same columns, quoting and ";" delimiter, and
+with the tables of states (UF.csv) and products (NCM.csv) they refer to.
+
+The trades have cardinalities and skew like those of the real files: about
+10 thousand products, 27 states plus a few other locations, more than 200
+countries and a few hundred customs units, with a few states (SP above all)
+and products accounting for most of the trades, and values following a
+heavy tailed distribution. The files are written in chunks, so they can
+have tens of millions of rows.
+
+Usage (from the dashboard directory):
+
+    python -m benchmarks.synthetic /tmp/comex --rows 2000000 --kind import
+'''
+import csv
+import os
+
+import click
+import numpy as np
+
+# Codes of the states (and of the other locations) found in the trade files
+STATE_CODES = ['AC', 'AL', 'AM', 'AP', 'BA', 'CE', 'DF', 'ES', 'GO', 'MA',
+               'MG', 'MS', 'MT', 'PA', 'PB', 'PE', 'PI', 'PR', 'RJ', 'RN',
+               'RO', 'RR', 'RS', 'SC', 'SE', 'SP', 'TO', 'CB', 'EX', 'MN',
+               'ND', 'RE', 'ZN']
+
+# Code, name and region of each location of STATE_CODES, as in UF.csv
+STATES = {
+    'AC': (12, 'Acre', 'NORTE'),
+    'AL': (27, 'Alagoas', 'NORDESTE'),
+    'AM': (13, 'Amazonas', 'NORTE'),
+    'AP': (16, 'Amapá', 'NORTE'),
+    'BA': (29, 'Bahia', 'NORDESTE'),
+    'CE': (23, 'Ceará', 'NORDESTE'),
+    'DF': (53, 'Distrito Federal', 'CENTRO OESTE'),
+    'ES': (32, 'Espírito Santo', 'SUDESTE'),
+    'GO': (52, 'Goiás', 'CENTRO OESTE'),
+    'MA': (21, 'Maranhão', 'NORDESTE'),
+    'MG': (31, 'Minas Gerais', 'SUDESTE'),
+    'MS': (50, 'Mato Grosso do Sul', 'CENTRO OESTE'),
+    'MT': (51, 'Mato Grosso', 'CENTRO OESTE'),
+    'PA': (15, 'Pará', 'NORTE'),
+    'PB': (25, 'Paraíba', 'NORDESTE'),
+    'PE': (26, 'Pernambuco', 'NORDESTE'),
+    'PI': (22, 'Piauí', 'NORDESTE'),
+    'PR': (41, 'Paraná', 'SUL'),
+    'RJ': (33, 'Rio de Janeiro', 'SUDESTE'),
+    'RN': (24, 'Rio Grande do Norte', 'NORDESTE'),
+    'RO': (11, 'Rondônia', 'NORTE'),
+    'RR': (14, 'Roraima', 'NORTE'),
+    'RS': (43, 'Rio Grande do Sul', 'SUL'),
+    'SC': (42, 'Santa Catarina', 'SUL'),
+    'SE': (28, 'Sergipe', 'NORDESTE'),
+    'SP': (35, 'São Paulo', 'SUDESTE'),
+    'TO': (17, 'Tocantins', 'NORTE'),
+    'CB': (93, 'Consumo de Bordo', 'NAO DECLARADA'),
+    'EX': (94, 'Exterior', 'NAO DECLARADA'),
+    'MN': (95, 'Mercadoria Nacionalizada', 'NAO DECLARADA'),
+    'ND': (98, 'Não Declarada', 'NAO DECLARADA'),
+    'RE': (97, 'Reexportação', 'NAO DECLARADA'),
+    'ZN': (99, 'Zona Não Declarada', 'NAO DECLARADA')
+}
+
+# Approximate share (in percent) of the rows of the trade files of each
+# location of STATE_CODES
+STATE_WEIGHTS = [0.1, 0.5, 4, 0.2, 3, 2, 1.5, 4, 3, 1, 7, 2, 2, 1.5, 0.5, 3,
+                 0.3, 8, 7, 0.5, 0.3, 0.1, 7, 8, 0.3, 30, 0.3, 0.05, 0.05,
+                 0.05, 0.2, 0.05, 0.05]
+
+HEADER = ['CO_ANO', 'CO_MES', 'CO_NCM', 'CO_UNID', 'CO_PAIS', 'SG_UF_NCM',
+          'CO_VIA', 'CO_URF', 'QT_ESTAT', 'KG_LIQUIDO', 'VL_FOB']
+
+PRODUCTS_HEADER = ['CO_NCM', 'CO_UNID', 'CO_SH6', 'CO_PPE', 'CO_PPI',
+                   'CO_FAT_AGREG', 'CO_CUCI_ITEM', 'CO_CGCE_N3', 'CO_SIIT',
+                   'CO_ISIC_CLASSE', 'CO_EXP_SUBSET', 'NO_NCM_POR',
+                   'NO_NCM_ESP', 'NO_NCM_ING']
+
+# Prefixes of the names of the trade files of each kind
+FILE_PREFIXES = {'import': 'IMP', 'export': 'EXP'}
+
+# How many countries, customs units (URF), transport modes (VIA) and
+# statistical units the trades refer to
+COUNTRIES = 240
+CUSTOMS_UNITS = 250
+TRANSPORT_MODES = 12
+UNITS = 20
+
+# How many rows to generate and write at a time
+CHUNK_SIZE = 1000000
+
+
+def get_zipf_weights(count, exponent=1.1):
+    '''
+    Get the weights of items whose popularity decreases with their rank
+    '''
+    weights = 1 / np.arange(1, count + 1) ** exponent
+    return weights / weights.sum()
+
+
+def get_product_codes(products, seed=0):
+    '''
+    Get the distinct NCM codes of the products, in a random order (which is
+    their order of popularity in the trades)
+    '''
+    rng = np.random.default_rng(seed)
+    return rng.choice(np.arange(1000000, 99999999), products, replace=False)
+
+
+def quote(values):
+    return np.array([f'"{value}"' for value in values], dtype=object)
+
+
+def pick(tokens, rows, rng, weights=None):
+    '''
+    Pick the tokens of the given number of rows at random, with the given
+    weights
+    '''
+    return tokens[rng.choice(len(tokens), rows, p=weights)].tolist()
+
+
+def format_integers(values):
+    return list(map(str, values.tolist()))
+
+
+def get_trade_lines(rows, year, codes, rng):
+    '''
+    Get the given number of lines of random trades of the products, with the
+    columns of HEADER formatted and quoted as in the trade files.
+
+    Each column is picked from its possible values already formatted, and
+    the lines are joined in C, since formatting each value with pandas (or
+    the csv module) would take most of the time.
+    '''
+    quantity = rng.lognormal(5, 3, rows).astype('int64')
+    columns = [
+        [f'"{year}"'] * rows,
+        pick(quote(f'{month:02}' for month in range(1, 13)), rows, rng),
+        # Each product has its own statistical unit
+        pick(quote(f'{code:08}";"{code % UNITS + 10}' for code in codes),
+             rows, rng, get_zipf_weights(len(codes))),
+        pick(quote(f'{country:03}' for country in range(COUNTRIES)), rows,
+             rng, get_zipf_weights(COUNTRIES)),
+        pick(quote(STATE_CODES), rows, rng,
+             np.array(STATE_WEIGHTS) / sum(STATE_WEIGHTS)),
+        pick(quote(f'{mode:02}' for mode in range(TRANSPORT_MODES)), rows,
+             rng, get_zipf_weights(TRANSPORT_MODES, 2)),
+        pick(quote(f'{800000 + 100 * unit:07}'
+                   for unit in range(CUSTOMS_UNITS)),
+             rows, rng, get_zipf_weights(CUSTOMS_UNITS)),
+        format_integers(quantity),
+        format_integers(quantity * rng.integers(1, 10, rows)),
+        # Most trades are small, but a few are worth billions
+        format_integers(rng.lognormal(9, 2.5, rows).astype('int64') + 1)
+    ]
+    return map(';'.join, zip(*columns))
+
+
+def write_trades(path, rows, year, products=10000, seed=0):
+    '''
+    Write a CSV file of trades with the same layout of the COMEX files, with
+    random states, products and values, skewed as in the real files
+
+    Parameters:
+        path: (str): Where to write the file
+        rows: (int): How many trades to write
+        year: (int): The year of the trades
+        products: (int): How many distinct product codes to use
+        seed: (int): Seed for the random number generator
+    '''
+    rng = np.random.default_rng(seed)
+    codes = get_product_codes(products, seed)
+    with open(path, 'w') as f:
+        f.write(';'.join(f'"{column}"' for column in HEADER) + '\n')
+        for start in range(0, rows, CHUNK_SIZE):
+            size = min(CHUNK_SIZE, rows - start)
+            f.write('\n'.join(get_trade_lines(size, year, codes, rng)))
+            f.write('\n')
+
+
+def write_states(path):
+    '''
+    Write the table of states, with the same layout of UF.csv
+    '''
+    with open(path, 'w', newline='', encoding='ISO-8859-1') as f:
+        writer = csv.writer(f, delimiter=';', quoting=csv.QUOTE_ALL)
+        writer.writerow(['CO_UF', 'SG_UF', 'NO_UF', 'NO_REGIAO'])
+        for state_code, (code, name, region) in STATES.items():
+            writer.writerow([code, state_code, name, f'REGIAO {region}'])
+
+
+def write_products(path, products=10000, seed=0):
+    '''
+    Write the table of the products used by write_trades (with the same
+    products and seed), with the same layout of NCM.csv
+    '''
+    with open(path, 'w', newline='', encoding='ISO-8859-1') as f:
+        writer = csv.writer(f, delimiter=';', quoting=csv.QUOTE_ALL)
+        writer.writerow(PRODUCTS_HEADER)
+        for code in sorted(get_product_codes(products, seed)):
+            code = f'{code:08}'
+            writer.writerow([code, '10', code[:6], '0', '0', '03', '0', '0',
+                             '0', '0', '0', f'Produto {code}',
+                             f'Producto {code}', f'Product {code}'])
+
+
+def get_trades_path(data_dir, kind, year):
+    return os.path.join(data_dir, f'{FILE_PREFIXES[kind]}_{year}.csv')
+
+
+def write_files(data_dir, rows, years, kinds, products=10000, seed=0):
+    '''
+    Write the trade files of each kind and year into the directory, with
+    the tables of states and products, and get the path of each trade file
+    by kind and year
+    '''
+    os.makedirs(data_dir, exist_ok=True)
+    write_states(os.path.join(data_dir, 'UF.csv'))
+    write_products(os.path.join(data_dir, 'NCM.csv'), products, seed)
+    paths = {}
+    for i, (kind, year) in enumerate((kind, year) for kind in kinds
+                                     for year in years):
+        paths[kind, year] = get_trades_path(data_dir, kind, year)
+        write_trades(paths[kind, year], rows, year, products, seed + i)
+    return paths
+
+
+@click.command()
+@click.argument('data_dir', type=click.Path(file_okay=False), nargs=1)
+@click.option('--rows', default=2000000, show_default=True,
+              help='How many rows to write to each trade file')
+@click.option('--year', 'years', type=int, multiple=True, default=[2019],
+              show_default=True, help='The years of the trade files')
+@click.option('--kind', 'kinds', type=click.Choice(['import', 'export']),
+              multiple=True, default=['import'], show_default=True,
+              help='The kinds of the trade files')
+@click.option('--products', default=10000, show_default=True,
+              help='How many distinct products to use')
+@click.option('--seed', default=0, show_default=True,
+              help='Seed for the random number generator')
+def main(data_dir, rows, years, kinds, products, seed):
+    paths = write_files(data_dir, rows, years, kinds, products, seed)
+    for path in paths.values():
+        click.echo(f'Wrote {rows} rows ({os.path.getsize(path) / 2**20:.1f} '
+                   f'MiB) to {path}.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+'''
+Compare the time taken to keep the top n products of each group of the
+totals computed by the data commands, by sorting all totals (as the data
+commands used to do) and with the partial selection of rank_top_products.
+
+Usage (from the dashboard directory):
+
+    python -m benchmarks.top_n --products 8000
+'''
+import time
+
+import click
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import STATE_CODES
+from src.commands.data import rank_top_products
+
+
+def rank_by_sorting(totals, by, n):
+    ranked = totals.assign(
+        rank=totals.sort_values(['total'], ascending=False)
+        .groupby(by)
+        .cumcount() + 1
+    )
+    order = ['state_code'] + [key for key in by if key != 'state_code']
+    return (ranked.query(f'rank <= {n}')
+            .sort_values(order + ['rank'])
+            .drop('rank', axis=1)
+            ).reset_index()
+
+
+def get_totals(keys, products, seed=0):
+    '''
+    Make a dataframe of totals indexed by the given keys, with every
+    combination of month, state and product, as returned by groupby
+    '''
+    rng = np.random.default_rng(seed)
+    levels = {'month': range(1, 13), 'state_code': sorted(STATE_CODES),
+              'product_code': range(products)}
+    index = pd.MultiIndex.from_product([levels[key] for key in keys],
+                                       names=keys)
+    # Skewed values, as few products account for most of the trades
+    total = rng.lognormal(10, 3, len(index)).astype('int64')
+    return pd.DataFrame({'total': total}, index=index)
+
+
+def best_of(repeat, function, *args):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+@click.command()
+@click.option('--products', default=8000, show_default=True,
+              help='How many products each group has')
+@click.option('--n', default=3, show_default=True,
+              help='How many of the top products to keep for each group')
+@click.option('--repeat', default=3, show_default=True,
+              help='How many times to repeat each measurement')
+def main(products, n, repeat):
+    cases = {
+        'by state': (['state_code', 'product_code'], ['state_code']),
+        'by month and state': (['month', 'state_code', 'product_code'],
+                               ['month', 'state_code'])
+    }
+    click.echo(f'{"grouping":<20}{"groups":>8}{"totals":>10}'
+               f'{"sort (s)":>10}{"select (s)":>12}{"speedup":>9}')
+    for name, (keys, by) in cases.items():
+        totals = get_totals(keys, products)
+        # Tied products may be ranked differently, but not their totals
+        expected = rank_by_sorting(totals, by, n).drop(columns='product_code')
+        actual = rank_top_products(totals, by, n).drop(columns='product_code')
+        pd.testing.assert_frame_equal(actual, expected)
+        groups = len(totals) // products
+        sort = best_of(repeat, rank_by_sorting, totals, by, n)
+        select = best_of(repeat, rank_top_products, totals, by, n)
+        click.echo(f'{name:<20}{groups:>8}{len(totals):>10}{sort:>10.3f}'
+                   f'{select:>12.3f}{sort / select:>8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+'''
+Settings of gunicorn for the dashboard, read from the working directory by
+default (run "gunicorn wsgi:app" from the dashboard directory). Each one can
+be overridden by an environment variable, or on the command line.
+'''
+import multiprocessing
+import os
+
+bind = f'0.0.0.0:{os.environ.get("PORT") or 5000}'
+
+# Rendering the charts is mostly CPU bound, but the requests also wait for
+# the database, so use the usual 2 workers per CPU (plus one). WEB_CONCURRENCY
+# is set by Heroku according to the size of the dyno.
+workers = int(os.environ.get('WEB_CONCURRENCY') or
+              multiprocessing.cpu_count() * 2 + 1)
+# The matplotlib backend can not render charts from several threads at once,
+# so each worker serves a request at a time unless GUNICORN_THREADS is set
+# (e.g. with the SVG backend, or with a render pool), which switches to the
+# gthread worker class
+threads = int(os.environ.get('GUNICORN_THREADS') or 1)
+
+# Restart each worker after a (jittered) number of requests, so the memory
+# used by matplotlib and pandas does not grow without bounds, and the
+# workers do not all restart at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS') or 1000)
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER') or
+                          100)
+timeout = int(os.environ.get('GUNICORN_TIMEOUT') or 30)
+graceful_timeout = timeout
+# nginx keeps its connections to the app open for a few seconds
+keepalive = 5
+
+# Reload the workers when the code changes (for development only)
+reload = bool(os.environ.get('GUNICORN_RELOAD'))
+# Otherwise, import the app (and pandas and matplotlib) once in the master
+# process before forking the workers, which share its memory
+preload_app = not reload
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')
+errorlog = '-'
+
+
+def when_ready(server):
+    '''
+    Load the fonts of the chart backend in the master process, so each
+    worker does not load them again for its first chart
+    '''
+    if not preload_app:
+        return
+    from src.rendering import warm_up
+
+    app = server.app.wsgi()
+    warm_up(app.config['CHART_BACKEND'])
+
+
+def post_fork(server, worker):
+    '''
+    Do not share the connections of the database opened by the master
+    process with the workers
+    '''
+    if not preload_app:
+        return
+    from src.database import db
+
+    with server.app.wsgi().app_context():
+        db.engine.dispose()
+
+
+def post_worker_init(worker):
+    '''
+    Start the render pool of the worker (if RENDER_POOL_SIZE is set) before
+    it accepts any request, so that the first requests do not wait for its
+    processes to start and load the chart backend
+    '''
+    from src.rendering import pool
+
+    pool.start()
@@ -2,7 +2,8 @@ import os
 
 from flask import Flask
 
-from src import commands, database, routes
+from src import (api, cache, commands, database, loader, lookups,
+                 rendering, routes)
 from src.config import config
 
 
@@ -15,7 +16,12 @@ def create_app(config_name=None):
 
     from src import model
     database.init_app(app)
+    cache.init_app(app)
+    lookups.init_app(app)
+    loader.init_app(app)
+    rendering.init_app(app)
     commands.init_app(app)
     routes.init_app(app)
+    api.init_app(app)
 
     return app
@@ -0,0 +1,92 @@
+'''
+Read-only JSON API with the data of the dashboard charts, so that browsers
+can draw the charts themselves. The rows are sent as compact columns (a list
+of values for each field), and the responses have a strong ETag. As the
+chart images, the responses whose URL has the current version of the data
+(as the "v" parameter) can be cached for long, and the others are reused
+for PAGE_MAX_AGE seconds.
+'''
+import hashlib
+
+from flask import abort, current_app, jsonify, request
+
+from src.loader import get_loader
+from src.lookups import lookups
+from src.routes import CHART_MAX_AGE, check_period
+
+
+def send_data(**data):
+    '''
+    Respond with the data and the version of the data as a JSON object
+    '''
+    version = lookups.get_version()
+    response = jsonify(version=version, **data)
+    response.set_etag(hashlib.sha1(response.get_data()).hexdigest())
+    if request.args.get('v') == version:
+        response.headers['Cache-Control'] = \
+            f'public, max-age={CHART_MAX_AGE}, immutable'
+    else:
+        response.headers['Cache-Control'] = \
+            f'public, max-age={current_app.config.get("PAGE_MAX_AGE", 0)}'
+    return response.make_conditional(request)
+
+
+def states_data():
+    """
+    The codes and the names of the states with data, ordered by name
+    """
+    state_names = lookups.get_state_names()
+    return send_data(state_codes=list(state_names),
+                     states=list(state_names.values()))
+
+
+def years_data():
+    """
+    The years with data, in increasing order
+    """
+    return send_data(years=list(lookups.get_years()))
+
+
+def top_products_data(kind, state_code, year, month=None):
+    """
+    The products most traded by the state in the given period, in
+    increasing order of total, as in the top products charts
+    """
+    check_period(state_code, year, month)
+    rows = get_loader().get_top_products(kind, state_code, year, month)
+    return send_data(products=[product for product, _, _ in rows],
+                     totals=[total for _, _, total in rows])
+
+
+def contributions_data(kind, year):
+    """
+    The contributions of the states to the trades of the country in the
+    given year, in increasing order of total. With the parameter "limit",
+    only those of the states with the largest contributions are sent, as in
+    the top states charts.
+    """
+    check_period(None, year)
+    limit = request.args.get('limit', type=int)
+    if limit is not None and limit < 0:
+        abort(400)
+    rows = get_loader().get_top_contributions(kind, year, limit=limit)
+    return send_data(
+        state_codes=[state_code for state_code, _, _, _ in rows],
+        states=[state for _, state, _, _ in rows],
+        totals=[total for _, _, total, _ in rows],
+        percentages=[percentage for _, _, _, percentage in rows])
+
+
+def init_app(app):
+    kinds = '<any(import, export):kind>'
+    app.add_url_rule('/api/states', view_func=states_data)
+    app.add_url_rule('/api/years', view_func=years_data)
+    app.add_url_rule(
+        f'/api/top-products/{kinds}/<string:state_code>/<int:year>',
+        view_func=top_products_data)
+    app.add_url_rule(
+        f'/api/top-products/{kinds}/<string:state_code>/<int:year>/'
+        '<int:month>',
+        view_func=top_products_data)
+    app.add_url_rule(f'/api/contributions/{kinds}/<int:year>',
+                     view_func=contributions_data)
@@ -0,0 +1,68 @@
+import csv
+import io
+
+from sqlalchemy.engine.url import make_url
+
+
+def get_table_name(table):
+    '''
+    Get the quoted name of the table of a pandas SQLTable
+    '''
+    if table.schema:
+        return f'"{table.schema}"."{table.name}"'
+    return f'"{table.name}"'
+
+
+def copy_from_stdin(table, connection, keys, data_iter):
+    '''
+    Insert rows into a PostgreSQL table with a single COPY FROM STDIN
+
+    This has the signature of the "method" parameter of DataFrame.to_sql.
+    '''
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(data_iter)
+    buffer.seek(0)
+    columns = ', '.join(f'"{key}"' for key in keys)
+    with connection.connection.cursor() as cursor:
+        cursor.copy_expert(
+            f'COPY {get_table_name(table)} ({columns}) FROM STDIN WITH CSV',
+            buffer)
+
+
+def execute_many(table, connection, keys, data_iter):
+    '''
+    Insert rows into an SQLite table with a single executemany call of the
+    DB-API cursor, inside the transaction of the connection
+
+    This has the signature of the "method" parameter of DataFrame.to_sql.
+    '''
+    columns = ', '.join(f'"{key}"' for key in keys)
+    placeholders = ', '.join('?' for key in keys)
+    cursor = connection.connection.cursor()
+    try:
+        cursor.executemany(
+            f'INSERT INTO {get_table_name(table)} ({columns}) '
+            f'VALUES ({placeholders})',
+            data_iter)
+    finally:
+        cursor.close()
+
+
+# Bulk insert methods for each database backend
+INSERT_METHODS = {
+    'postgresql': copy_from_stdin,
+    'sqlite': execute_many
+}
+
+
+def get_insert_method(database_url):
+    '''
+    Get the function to be used as the "method" of DataFrame.to_sql to bulk
+    insert rows into the database with the given URL, or None (for the
+    default INSERT statements of pandas) if the backend has no bulk method
+
+    Parameters:
+        database_url: (str): The URL of the database, such as the value of
+        SQLALCHEMY_DATABASE_URI
+    '''
+    return INSERT_METHODS.get(make_url(database_url).get_backend_name())
@@ -0,0 +1,139 @@
+import hashlib
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+# Prefix of the names of the directories of each version of the data in the
+# cache directory. Only these are removed, in case the cache directory is
+# shared with other files by mistake.
+VERSION_DIR_PREFIX = 'v-'
+
+
+class RenderCache:
+    '''
+    Cache of rendered charts or pages, keyed by what they show (e.g. the
+    chart type, the kind of trade, the state, the year and the month) and
+    the version of the data.
+
+    Each worker keeps the most recently used items in a bounded LRU cache
+    in memory, backed by a directory on disk which is shared by all the
+    workers. Since the version of the data is part of the key, the items
+    are invalidated as soon as new data is loaded, and the items of the
+    previous versions are then removed.
+    '''
+
+    def __init__(self, prefix, max_size=128, cache_dir=None):
+        self.prefix = prefix
+        self.max_size = max_size
+        self.cache_dir = cache_dir
+        self.version = None
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def init_app(self, app):
+        '''
+        Configure the cache from the settings <prefix>_CACHE_SIZE and
+        <prefix>_CACHE_DIR of the app
+        '''
+        self.max_size = app.config.get(f'{self.prefix}_CACHE_SIZE',
+                                       self.max_size)
+        self.cache_dir = app.config.get(f'{self.prefix}_CACHE_DIR',
+                                        self.cache_dir)
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.version = None
+            self.items.clear()
+
+    def get_version_dir(self, version):
+        digest = hashlib.sha1(str(version).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir,
+                            f'{VERSION_DIR_PREFIX}{digest[:16]}')
+
+    def get_path(self, key, version):
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.get_version_dir(version), digest)
+
+    def set_version(self, version):
+        '''
+        Drop the items of other versions of the data, in memory and on disk
+        '''
+        if version == self.version:
+            return
+        self.version = version
+        self.items.clear()
+        if not self.cache_dir or not os.path.isdir(self.cache_dir):
+            return
+        version_dir = self.get_version_dir(version)
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_dir(follow_symlinks=False) and \
+                    entry.name.startswith(VERSION_DIR_PREFIX) and \
+                    entry.path != version_dir:
+                # Other workers may be removing the same directories
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    def get(self, key, version):
+        '''
+        Get the item with the given key for the given version of the data,
+        or None if it is not in the cache
+        '''
+        with self.lock:
+            self.set_version(version)
+            if key in self.items:
+                self.items.move_to_end(key)
+                return self.items[key]
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self.get_path(key, version), 'rb') as f:
+                item = f.read()
+        except FileNotFoundError:
+            return None
+        self.add(key, version, item)
+        return item
+
+    def add(self, key, version, item):
+        with self.lock:
+            self.set_version(version)
+            self.items[key] = item
+            self.items.move_to_end(key)
+            while len(self.items) > self.max_size:
+                self.items.popitem(last=False)
+
+    def set(self, key, version, item):
+        '''
+        Store the item with the given key for the given version of the data
+        '''
+        self.add(key, version, item)
+        if not self.cache_dir:
+            return
+        path = self.get_path(key, version)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Replace the file atomically, since other workers may read it
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(item)
+        os.replace(tmp_path, path)
+
+    def get_or_render(self, key, version, render):
+        '''
+        Get the item with the given key for the given version of the data
+        from the cache, or render it with the given function and store it
+        '''
+        item = self.get(key, version)
+        if item is None:
+            item = render()
+            self.set(key, version, item)
+        return item
+
+
+# The PAGE cache is disabled unless PAGE_CACHE_SIZE or PAGE_CACHE_DIR is set
+charts = RenderCache('CHART')
+pages = RenderCache('PAGE', max_size=0)
+
+
+def init_app(app):
+    charts.init_app(app)
+    pages.init_app(app)
@@ -0,0 +1,67 @@
+'''
+Backends which render the charts of the dashboard. Each backend is a module
+with the functions get_plot (horizontal bars) and get_contribution_plot
+(pie), which return the bytes of the image, and the constants NAME,
+MIMETYPE and EXTENSION of its images. The backend is only imported when it
+is first used.
+'''
+import importlib
+
+from flask import current_app
+
+# Modules of the backends, by name
+BACKENDS = {
+    'matplotlib': 'src.charts.mpl',
+    'svg': 'src.charts.svg'
+}
+
+# Contributions up to this percentage are not labelled inside their slices
+PERCENTAGE_THRESHOLD = 3
+
+
+def large_num_formatter(num, pos=None):
+    """
+    Format large numbers using appropriate sufixes for powers of 1000
+
+    Parameters:
+        num: (int): The tick value to be formatted
+        pos: (int): Position of the ticker
+    """
+    for unit in ['', 'mil', 'Mi.', 'Bi.']:
+        if abs(num) < 1000.0:
+            return "%3.1f %s" % (num, unit)
+        num /= 1000.0
+    return "%.1f %s" % (num, 'Tri.')
+
+
+def pct_format(percent, skip_small_values=True):
+    if percent <= PERCENTAGE_THRESHOLD and skip_small_values:
+        return ''
+    return '%1.1f%%' % percent
+
+
+def get_pie_labels(rows, state):
+    '''
+    Get the labels of the slices of a pie chart of contributions.
+
+    Hide the percentages of small contributions, unless it is for the
+    current state. In that case, show it as part of the label, since it
+    would not fit inside its slice.
+    '''
+    return [name if percentage > PERCENTAGE_THRESHOLD else
+            name + ' ({})'.format(
+                pct_format(percentage, skip_small_values=False)
+                          ) if code == state
+            else '' for code, name, _, percentage in rows]
+
+
+def get_backend(name=None):
+    '''
+    Get the module of the given chart backend, or of the one set by the
+    CHART_BACKEND setting of the app
+    '''
+    if name is None:
+        name = current_app.config.get('CHART_BACKEND', 'matplotlib')
+    if name not in BACKENDS:
+        raise ValueError(f'Unknown chart backend: {name}')
+    return importlib.import_module(BACKENDS[name])
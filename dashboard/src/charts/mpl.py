@@ -0,0 +1,76 @@
+import io
+from textwrap import fill
+
+import matplotlib.pyplot as plt
+import matplotlib.ticker as ticker
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from src.charts import get_pie_labels, large_num_formatter, pct_format
+
+NAME = 'matplotlib'
+MIMETYPE = 'image/png'
+EXTENSION = 'png'
+
+
+def get_png(fig):
+    '''
+    Render the figure as a PNG image and return its bytes, closing the figure
+    '''
+    png_image = io.BytesIO()
+    canvas = FigureCanvasAgg(fig)
+    canvas.print_png(png_image)
+    plt.close(fig)
+    return png_image.getvalue()
+
+
+def get_contribution_plot(rows, state, title=None):
+    """
+    Make a pie chart of the percentage of contribution of each state
+
+    Parameters:
+        rows: (list): Tuples with the code, name, total and percentage of
+        each state, as returned by queries.get_top_contributions
+        state: (str): The code of the state
+    """
+    # Highlight the current state
+    explode = [0.03 if code != state else 0.2 for code, *_ in rows]
+    colors = ['#CCC' if code != state else '#66F' for code, *_ in rows]
+
+    fig, ax = plt.subplots()
+    ax.pie([total for _, _, total, _ in rows], colors=colors,
+           autopct=pct_format, startangle=90, explode=explode,
+           labels=get_pie_labels(rows, state))
+    if title:
+        ax.set_title(title, pad=20)
+    plt.tight_layout()
+    return get_png(fig)
+
+
+def get_plot(labels, totals, ylabel='Produto', title=None):
+    """
+    Make a horizontal bar plot of the totals.
+
+    Parameters:
+        labels: (list): The label of each bar
+        totals: (list): The length of each bar
+        title: (str): Text to be used as title for the plot
+    """
+    fig, ax = plt.subplots(figsize=(10, len(totals)*0.5 + 1.5))
+
+    positions = range(len(totals))
+    ax.barh(positions, totals, height=0.5)
+    for i, v in enumerate(totals):
+        ax.text(v, i, str(large_num_formatter(v)), color='blue', va='center',
+                fontweight='bold')
+
+    if title:
+        ax.set_title(title)
+    ax.set_ylabel(ylabel)
+    ax.set_xlabel('Valor total anual (US$)')
+
+    ax.set_yticks(positions)
+    ax.set_yticklabels([fill(p, 50) for p in labels])
+    ax.xaxis.set_major_formatter(ticker.FuncFormatter(large_num_formatter))
+
+    plt.tight_layout()
+    return get_png(fig)
@@ -0,0 +1,193 @@
+'''
+Pure-Python SVG versions of the charts of the matplotlib backend, with the
+same layout and colors, written directly as text.
+'''
+import math
+from textwrap import fill
+from xml.sax.saxutils import escape
+
+from src.charts import get_pie_labels, large_num_formatter, pct_format
+
+NAME = 'svg'
+MIMETYPE = 'image/svg+xml'
+EXTENSION = 'svg'
+
+# Sizes in pixels, as in the PNG images of matplotlib (at 100 dpi)
+DPI = 100
+FONT = 'DejaVu Sans, Bitstream Vera Sans, Arial, sans-serif'
+FONT_SIZE = 10 * DPI / 72
+TITLE_SIZE = 12 * DPI / 72
+# Approximate width of a character, relative to the size of the font
+CHAR_WIDTH = 0.55
+BAR_COLOR = '#1f77b4'
+
+
+def get_text(x, y, text, size=FONT_SIZE, anchor='middle', rotate=None,
+             **attributes):
+    '''
+    Get a text element with its lines centered vertically on the point
+    '''
+    lines = str(text).split('\n')
+    attributes = ''.join(f' {name.replace("_", "-")}="{value}"'
+                         for name, value in attributes.items())
+    if rotate is not None:
+        attributes += f' transform="rotate({rotate} {x:.1f} {y:.1f})"'
+    first_dy = 0.35 - 1.2 * (len(lines) - 1) / 2
+    tspans = ''.join(
+        f'<tspan x="{x:.1f}" dy="{first_dy if i == 0 else 1.2:.2f}em">'
+        f'{escape(line)}</tspan>' for i, line in enumerate(lines))
+    return (f'<text x="{x:.1f}" y="{y:.1f}" font-size="{size:.1f}" '
+            f'text-anchor="{anchor}"{attributes}>{tspans}</text>')
+
+
+def get_svg(width, height, elements):
+    '''
+    Get the bytes of an SVG image with the given elements
+    '''
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" '
+            f'width="{width:.0f}" height="{height:.0f}" '
+            f'viewBox="0 0 {width:.0f} {height:.0f}" '
+            f'font-family="{FONT}">'
+            f'<rect width="100%" height="100%" fill="white"/>'
+            + ''.join(elements) + '</svg>').encode('utf-8')
+
+
+def get_text_width(text, size=FONT_SIZE):
+    return max(len(line) for line in str(text).split('\n')) * size * \
+        CHAR_WIDTH
+
+
+def get_tick_step(limit, intervals=8):
+    '''
+    Get a round step for about the given number of intervals up to the limit
+    '''
+    magnitude = 10 ** math.floor(math.log10(limit / intervals))
+    for factor in [1, 2, 2.5, 5, 10]:
+        if magnitude * factor * intervals >= limit:
+            return magnitude * factor
+    return magnitude * 10
+
+
+def get_contribution_plot(rows, state, title=None):
+    """
+    Make a pie chart of the percentage of contribution of each state
+
+    Parameters:
+        rows: (list): Tuples with the code, name, total and percentage of
+        each state, as returned by queries.get_top_contributions
+        state: (str): The code of the state
+    """
+    width, height = 640, 480
+    top = 20 + (len(title.split('\n')) * TITLE_SIZE * 1.2 + 20
+                if title else 0)
+    radius = min(width, height - top) * 0.3
+    cx, cy = width / 2, top + (height - top) / 2
+    elements = []
+    if title:
+        lines = len(title.split('\n'))
+        elements.append(get_text(cx, 20 + lines * TITLE_SIZE * 0.6, title,
+                                 size=TITLE_SIZE))
+
+    totals = [total for _, _, total, _ in rows]
+    labels = get_pie_labels(rows, state)
+    sum_of_totals = sum(totals) or 1
+    # Start at the top and go counterclockwise, as matplotlib does
+    angle = 90
+    for (code, *_), total, label in zip(rows, totals, labels):
+        sweep = 360 * total / sum_of_totals
+        middle = math.radians(angle + sweep / 2)
+        # Highlight the current state
+        explode = 0.2 if code == state else 0.03
+        color = '#66F' if code == state else '#CCC'
+        x = cx + explode * radius * math.cos(middle)
+        y = cy - explode * radius * math.sin(middle)
+        if sweep >= 360:
+            elements.append(f'<circle cx="{x:.2f}" cy="{y:.2f}" '
+                            f'r="{radius:.2f}" fill="{color}"/>')
+        elif sweep > 0:
+            start, end = math.radians(angle), math.radians(angle + sweep)
+            elements.append(
+                f'<path d="M{x:.2f},{y:.2f} '
+                f'L{x + radius * math.cos(start):.2f},'
+                f'{y - radius * math.sin(start):.2f} '
+                f'A{radius:.2f},{radius:.2f} 0 {int(sweep > 180)} 0 '
+                f'{x + radius * math.cos(end):.2f},'
+                f'{y - radius * math.sin(end):.2f} Z" fill="{color}"/>')
+        percent = pct_format(100 * total / sum_of_totals)
+        if percent:
+            elements.append(get_text(x + 0.6 * radius * math.cos(middle),
+                                     y - 0.6 * radius * math.sin(middle),
+                                     percent))
+        if label:
+            lx = x + 1.1 * radius * math.cos(middle)
+            elements.append(get_text(
+                lx, y - 1.1 * radius * math.sin(middle), label,
+                anchor='start' if lx > x else 'end'))
+        angle += sweep
+    return get_svg(width, height, elements)
+
+
+def get_plot(labels, totals, ylabel='Produto', title=None):
+    """
+    Make a horizontal bar plot of the totals.
+
+    Parameters:
+        labels: (list): The label of each bar
+        totals: (list): The length of each bar
+        title: (str): Text to be used as title for the plot
+    """
+    width, height = 10 * DPI, (len(totals) * 0.5 + 1.5) * DPI
+    labels = [fill(label, 50) for label in labels]
+    left = 15 + 1.5 * FONT_SIZE + 10 + \
+        max([get_text_width(label) for label in labels], default=0)
+    right = width - 15 - get_text_width('999.9 Mi.')
+    top = 15 + (TITLE_SIZE * 1.5 if title else 0)
+    bottom = height - 15 - 3 * FONT_SIZE
+
+    # Limits of the axes, with margins like those of matplotlib
+    x_limit = 1.05 * max(totals, default=0) or 1
+    y_low, y_high = -0.25, len(totals) - 0.75
+    y_margin = 0.05 * (y_high - y_low)
+    y_low, y_high = y_low - y_margin, y_high + y_margin
+
+    def get_x(value):
+        return left + (right - left) * value / x_limit
+
+    def get_y(value):
+        return bottom - (bottom - top) * (value - y_low) / (y_high - y_low)
+
+    elements = []
+    if title:
+        elements.append(get_text(width / 2, 15 + TITLE_SIZE * 0.6, title,
+                                 size=TITLE_SIZE))
+    bar_height = (bottom - top) * 0.5 / (y_high - y_low)
+    for i, (label, total) in enumerate(zip(labels, totals)):
+        y = get_y(i)
+        elements.append(
+            f'<rect x="{left:.2f}" y="{y - bar_height / 2:.2f}" '
+            f'width="{get_x(total) - left:.2f}" height="{bar_height:.2f}" '
+            f'fill="{BAR_COLOR}"/>')
+        elements.append(get_text(get_x(total), y, large_num_formatter(total),
+                                 anchor='start', fill='blue',
+                                 font_weight='bold'))
+        elements.append(f'<line x1="{left - 3.5:.2f}" y1="{y:.2f}" '
+                        f'x2="{left:.2f}" y2="{y:.2f}" stroke="black"/>')
+        elements.append(get_text(left - 7, y, label, anchor='end'))
+
+    step = get_tick_step(x_limit)
+    ticks = [i * step for i in range(int(x_limit / step) + 1)]
+    for tick in ticks:
+        x = get_x(tick)
+        elements.append(f'<line x1="{x:.2f}" y1="{bottom:.2f}" '
+                        f'x2="{x:.2f}" y2="{bottom + 3.5:.2f}" '
+                        f'stroke="black"/>')
+        elements.append(get_text(x, bottom + 5 + FONT_SIZE * 0.6,
+                                 large_num_formatter(tick)))
+    elements.append(f'<rect x="{left:.2f}" y="{top:.2f}" '
+                    f'width="{right - left:.2f}" height="{bottom - top:.2f}" '
+                    f'fill="none" stroke="black" stroke-width="0.8"/>')
+    elements.append(get_text((left + right) / 2, height - 15 - FONT_SIZE / 2,
+                             'Valor total anual (US$)'))
+    elements.append(get_text(15 + FONT_SIZE / 2, (top + bottom) / 2, ylabel,
+                             rotate=-90))
+    return get_svg(width, height, elements)
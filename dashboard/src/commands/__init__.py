@@ -1,6 +1,47 @@
-from src.commands import database, data
+'''
+Commands of the flask CLI. Each group of commands is only imported when one
+of its commands is run (or listed), so that the app (in the web workers and
+in the other commands) does not import pandas and numpy, which are needed
+only by the data commands.
+'''
+import importlib
+
+import click
+
+# The group of commands of each module, with its help
+GROUPS = {
+    'database': ('src.commands.database', 'database_cli',
+                 'Commands to manage the database'),
+    'data': ('src.commands.data', 'data_cli',
+             'Commands to populate the database tables'),
+    'charts': ('src.commands.charts', 'charts_cli',
+               'Commands to render the dashboard charts')
+}
+
+
+class LazyGroup(click.Group):
+    '''
+    Group of commands which is imported from the given module only when it
+    is used
+    '''
+
+    def __init__(self, name, module_name, group_name, **kwargs):
+        super().__init__(name, **kwargs)
+        self.module_name = module_name
+        self.group_name = group_name
+
+    def get_group(self):
+        module = importlib.import_module(self.module_name)
+        return getattr(module, self.group_name)
+
+    def list_commands(self, ctx):
+        return self.get_group().list_commands(ctx)
+
+    def get_command(self, ctx, name):
+        return self.get_group().get_command(ctx, name)
 
 
 def init_app(app):
-    database.init_app(app)
-    data.init_app(app)
+    for name, (module_name, group_name, short_help) in GROUPS.items():
+        app.cli.add_command(LazyGroup(name, module_name, group_name,
+                                      short_help=short_help))
@@ -0,0 +1,143 @@
+import os
+import shutil
+
+import click
+from flask import current_app, url_for
+from flask.cli import AppGroup
+from src import rendering, routes
+from src.loader import remove_loader
+from src.lookups import lookups
+
+# Name of the link to the directory of the current version of the data
+CURRENT_LINK = 'current'
+
+# Prefix of the names of the directories of each version of the data, which
+# nginx serves for the URLs with that version. Only these directories are
+# removed from the output directory.
+VERSION_DIR_PREFIX = 'v-'
+
+
+def get_version_dir(version):
+    return f'{VERSION_DIR_PREFIX}{version}'
+
+
+def get_static_path(output_dir, url):
+    '''
+    Get the path of the file which nginx serves for the URL (without its
+    query string): the file itself for charts, and an index.html file in a
+    directory for pages
+    '''
+    path = os.path.join(output_dir, *url.split('?')[0].strip('/').split('/'))
+    if os.path.splitext(path)[1]:
+        return path
+    return os.path.join(path, 'index.html')
+
+
+def write_file(path, content):
+    '''
+    Write the file atomically, since nginx may be serving it
+    '''
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def get_pages(state_codes, year):
+    '''
+    Get the state, year and month of each dashboard page of the given year
+    '''
+    return [(state_code, year, month) for state_code in state_codes
+            for month in [None] + routes.get_month_options(year)]
+
+
+def prerender_year(output_dir, year, version):
+    '''
+    Render all the charts and pages of the given year into the output
+    directory, rendering the charts which are not in the chart cache at
+    once in the render pool, and return how many files were written
+    '''
+    pages = get_pages(routes.get_available_state_codes(), year)
+    charts = list(dict.fromkeys(
+        chart for page in pages
+        for chart in routes.get_dashboard_charts(*page).values()))
+    images = routes.get_charts(charts, version)
+    for chart, image in zip(charts, images):
+        write_file(get_static_path(output_dir, routes.get_chart_url(chart)),
+                   image)
+    for state_code, year, month in pages:
+        page = routes.render_dashboard(state_code, year, month, version)
+        url = url_for('dashboard', state_code=state_code, year=year,
+                      month=month)
+        write_file(get_static_path(output_dir, url), page.encode('utf-8'))
+    # Each year has its own data, so it does not need to be kept in memory
+    remove_loader()
+    return len(charts) + len(pages)
+
+
+def switch_version(output_dir, version):
+    '''
+    Point the link to the current version at the directory of the given
+    version atomically, and remove the directories of the other versions
+    (leaving anything else in the output directory alone)
+    '''
+    version_dir = get_version_dir(version)
+    link = os.path.join(output_dir, CURRENT_LINK)
+    tmp_link = f'{link}.{os.getpid()}.tmp'
+    # The link is relative, so it works wherever the directory is mounted
+    os.symlink(version_dir, tmp_link)
+    os.replace(tmp_link, link)
+    for entry in os.scandir(output_dir):
+        if entry.name.startswith(VERSION_DIR_PREFIX) and \
+                entry.name != version_dir and \
+                entry.is_dir(follow_symlinks=False):
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+charts_cli = AppGroup('charts')
+
+
+@charts_cli.command()
+@click.option(
+    '--output-dir',
+    type=click.Path(file_okay=False),
+    help='Where to write the files (default: the PRERENDER_DIR setting)')
+@click.option(
+    '--jobs',
+    type=click.IntRange(min=1),
+    default=os.cpu_count(),
+    show_default=True,
+    help='How many processes to use to render the charts')
+def prerender(output_dir=None, jobs=None):
+    '''
+    Render every chart and page of the dashboard for the current version of
+    the data into a directory named after the version ("v-<version>"), in
+    the output directory, with the same paths as their URLs, so nginx can
+    serve them without calling the app. Once all of them are written, the
+    link "current" is pointed to that directory, and the directories of
+    older versions are removed.
+
+    The charts are rendered in parallel by the render pool, and stored in
+    the chart cache too, so the app does not render them again.
+    '''
+    output_dir = output_dir or current_app.config['PRERENDER_DIR']
+    lookups.clear()
+    version = lookups.get_version()
+    version_dir = os.path.join(output_dir, get_version_dir(version))
+    years = routes.get_available_years()
+    click.echo(f'Rendering the charts and pages of {len(years)} years '
+               f'with {jobs} processes into {version_dir}...')
+    size, rendering.pool.size = rendering.pool.size, jobs
+    # The URLs of the pages and charts are built as for a request to '/'
+    with current_app.test_request_context():
+        try:
+            for year in years:
+                files = prerender_year(version_dir, year, version)
+                click.echo(f'Finished rendering {files} files of {year}.')
+        finally:
+            rendering.pool.stop()
+            rendering.pool.size = size
+    os.makedirs(version_dir, exist_ok=True)
+    switch_version(output_dir, version)
+    click.echo(f'Finished rendering version {version} of the data.')
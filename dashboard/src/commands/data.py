@@ -1,7 +1,45 @@
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
 import click
+import numpy as np
 import pandas as pd
+from flask import current_app
 from flask.cli import AppGroup
-from src.database import db
+from pandas.api.types import union_categoricals
+from src.dimensions import load_names
+from src.manifest import (get_checksum, get_fingerprint,
+                          get_loaded_checksum, is_unchanged,
+                          replace_partitions, update_fingerprint)
+
+# Names used in the database for the relevant columns of the trade CSV files
+TRADE_COLUMNS = {
+    'CO_ANO': 'year',
+    'CO_MES': 'month',
+    'CO_NCM': 'product_code',
+    'SG_UF_NCM': 'state_code',
+    'VL_FOB': 'total'
+}
+
+# Compact types for the relevant columns of the trade CSV files
+TRADE_DTYPES = {
+    'CO_ANO': 'int16',
+    'CO_MES': 'int8',
+    'CO_NCM': 'int32',
+    'SG_UF_NCM': 'category',
+    'VL_FOB': 'int64'
+}
+
+# How many rows of the trade CSV files to read at a time by default
+READ_CHUNKSIZE = 500000
+
+# Prefixes of the names of the trade CSV files of each kind
+CSV_PREFIXES = {'import': 'IMP', 'export': 'EXP'}
+
+# Tables filled from each trade CSV file
+AGGREGATE_TABLES = ['top_by_state_and_year', 'top_by_state_and_month',
+                    'state_contributions', 'trade_totals']
 
 
 def get_states(csv_path):
@@ -23,8 +61,388 @@ def get_products(csv_path):
                               'NO_NCM_POR': 'product'})
 
 
-data_cli = AppGroup('data',
-                    short_help='Commands to populate the database tables')
+def read_trade_chunks(csv_path, year, columns, chunksize=None):
+    '''
+    Read the specified columns of the trades made in the given year from a
+    CSV file, chunksize (default READ_CHUNKSIZE) rows at a time, using the
+    compact types from TRADE_DTYPES and renaming the columns according to
+    TRADE_COLUMNS.
+
+    The rows from other years are dropped from each chunk as soon as it is
+    read, so they are never held in memory all at once.
+    '''
+    dtype = {column: TRADE_DTYPES[column] for column in columns}
+    for chunk in pd.read_csv(csv_path, delimiter=';', usecols=columns,
+                             dtype=dtype,
+                             chunksize=chunksize or READ_CHUNKSIZE):
+        chunk = chunk.rename(columns=TRADE_COLUMNS)
+        yield chunk[chunk['year'] == year]
+
+
+def get_state_names(csv_path):
+    '''
+    Get the names of the states indexed by their codes, from the dimension
+    cache of the specified CSV file
+    '''
+    return load_names(
+        csv_path,
+        lambda path: get_states(path).set_index('state_code')['state'],
+        current_app.config.get('DIMENSION_CACHE_DIR'))
+
+
+def get_product_names(csv_path):
+    '''
+    Get the names of the products indexed by their codes, from the
+    dimension cache of the specified CSV file
+    '''
+    return load_names(
+        csv_path,
+        lambda path: get_products(path).set_index('product_code')['product'],
+        current_app.config.get('DIMENSION_CACHE_DIR'))
+
+
+def get_stage_path(stage_dir, kind, year):
+    '''
+    Get the path of the partition of the staging directory which holds the
+    trades of the given kind and year
+    '''
+    return os.path.join(stage_dir, f'kind={kind}', f'year={year}')
+
+
+def get_staged_trades(stage_dir, kind, year, columns):
+    '''
+    Read the specified columns of the trades of the given kind made in the
+    given year from a staging directory created by the "stage" command,
+    renaming them according to TRADE_COLUMNS
+
+    Only the Parquet files of the partition for the given kind and year are
+    read, and only the requested columns are loaded from them. The other
+    partitions are not even listed, so they can be restaged meanwhile.
+    '''
+    names = [TRADE_COLUMNS[column] for column in columns]
+    # The year is not stored in the files of its partition, and the month is
+    # its only partition key
+    df = pd.read_parquet(get_stage_path(stage_dir, kind, year),
+                         columns=[name for name in names if name != 'year'],
+                         partitioning='hive')
+    if 'year' in names:
+        df.insert(names.index('year'), 'year', year)
+    # The partition key is read as a category, so restore its type
+    return df.astype({TRADE_COLUMNS[column]: TRADE_DTYPES[column]
+                      for column in ['CO_ANO', 'CO_MES'] if column in columns})
+
+
+def get_trades(csv_path, year, columns, chunksize=None, kind=None):
+    '''
+    Read the specified columns of the trades made in the given year from a
+    CSV file, renaming them according to TRADE_COLUMNS
+
+    If csv_path is a staging directory created by the "stage" command, the
+    trades of the given kind are read from its Parquet files instead, and
+    chunksize is ignored, since only the needed data is loaded from them.
+
+    If chunksize is given, the file is read that many rows at a time, and
+    the values of each chunk are summed into running totals for each
+    combination of the other columns. Then the peak memory usage depends on
+    the number of such combinations instead of the size of the file.
+    '''
+    if os.path.isdir(csv_path):
+        return get_staged_trades(csv_path, kind, year, columns)
+
+    keys = [TRADE_COLUMNS[column] for column in columns
+            if TRADE_COLUMNS[column] not in ('year', 'total')]
+    if chunksize is None:
+        chunks = list(read_trade_chunks(csv_path, year, columns))
+        if not chunks:
+            return pd.DataFrame(columns=keys + ['total'])
+        df = pd.concat(chunks, ignore_index=True)
+        if 'state_code' in df:
+            # Each chunk has its own categories, so they must be combined
+            df['state_code'] = union_categoricals(
+                [chunk['state_code'] for chunk in chunks],
+                sort_categories=True)
+        return df
+
+    totals = None
+    for chunk in read_trade_chunks(csv_path, year, columns, chunksize):
+        partial = chunk.groupby(keys, as_index=False, observed=True)['total']\
+            .sum().astype({key: 'object' for key in keys
+                           if key == 'state_code'})
+        if totals is not None:
+            partial = pd.concat([totals, partial])\
+                .groupby(keys, as_index=False)['total'].sum()
+        totals = partial
+    if totals is None:
+        return pd.DataFrame(columns=keys + ['total'])
+    return totals
+
+
+def add_metadata(df, state_names, product_names=None):
+    '''
+    Add columns with the names of the states (and products, if given) to
+    the dataframe, by looking up their codes in the series of names indexed
+    by code. As in an inner JOIN, rows whose codes have no name are dropped.
+    '''
+    names = {'state': df['state_code'].map(state_names)}
+    if product_names is not None:
+        names['product'] = df['product_code'].map(product_names)
+    return df.assign(**names).dropna(subset=list(names))\
+        .reset_index(drop=True)
+
+
+def get_top_positions(values, starts, n):
+    '''
+    Get the positions of the n largest values in each group of consecutive
+    values, and their ranks within the groups
+
+    Instead of sorting all values, the n-th largest value of each group is
+    found by partial selection (in linear time), and only the values which
+    are not smaller than it are sorted. Ties are broken by position, so the
+    earlier values get the better ranks.
+
+    Parameters:
+        values: (numpy.ndarray): The values of all groups
+        starts: (numpy.ndarray): The position where each group starts
+        n: (int): How many of the largest values to select in each group
+
+    Returns:
+        positions: (numpy.ndarray): The positions of the selected values,
+        group by group, from the largest to the smallest value
+        ranks: (numpy.ndarray): The rank (from 1 to n) of each position
+    '''
+    positions = []
+    ranks = []
+    ends = np.append(starts[1:], len(values))
+    for start, end in zip(starts, ends):
+        group = values[start:end]
+        if len(group) > n:
+            kth = len(group) - n
+            candidates = np.flatnonzero(
+                group >= np.partition(group, kth)[kth])
+        else:
+            candidates = np.arange(len(group))
+        top = candidates[np.lexsort((candidates, -group[candidates]))][:n]
+        positions.append(start + top)
+        ranks.append(np.arange(1, len(top) + 1))
+    if not positions:
+        return np.array([], dtype=int), np.array([], dtype=int)
+    return np.concatenate(positions), np.concatenate(ranks)
+
+
+def rank_top_products(totals, by, n):
+    '''
+    Keep only the n products with the largest totals in each group of the
+    keys given by the list "by", sorting the result by state, by the other
+    keys and by rank
+
+    The keys in "by" must be the first levels of the index of totals, which
+    must be sorted (as are the results of groupby), so that the rows of
+    each group are consecutive.
+    '''
+    groups = totals.groupby(level=by, sort=False, observed=True).ngroup()
+    starts = np.flatnonzero(np.diff(groups.to_numpy(), prepend=-1))
+    positions, ranks = get_top_positions(totals['total'].to_numpy(), starts,
+                                         n)
+    # Keep only the wanted number of products for each group
+    order = ['state_code'] + [key for key in by if key != 'state_code']
+    return (totals.iloc[positions]
+            .assign(rank=ranks)
+            .sort_values(order + ['rank'])
+            .drop('rank', axis=1)
+            ).reset_index()
+
+
+def get_top_by_state(df, kind, year, n=3):
+    '''
+    Compute the top n products with highest total traded value in the
+    dataframe of trades, by state
+    '''
+    # Compute the totals for each combination of state and product
+    totals = df.groupby(['state_code', 'product_code'],
+                        observed=True)[['total']].sum()
+    top = rank_top_products(totals, ['state_code'], n)
+    # Add columns for the year and kind of trade being processed
+    return top.assign(year=year, kind=kind)
+
+
+def get_top_by_month_and_state(df, kind, year, n=3):
+    '''
+    Compute the top n products with highest total traded value in the
+    dataframe of trades, by month and state
+    '''
+    # Compute the totals for each combination of state, month and product
+    totals = df.groupby(['month', 'state_code', 'product_code'],
+                        observed=True)[['total']].sum()
+    top = rank_top_products(totals, ['month', 'state_code'], n)
+    # Add columns for the year and kind of trade being processed
+    return top.assign(year=year, kind=kind)
+
+
+def get_state_contributions(df, kind, year):
+    '''
+    Compute the percentage of contribution of each state to the country's
+    total in the dataframe of trades
+    '''
+    year_total = df['total'].sum()
+    state_contribs = df.groupby(
+        ['state_code'], as_index=False, observed=True)['total'].sum()
+    state_contribs['year'] = year
+    state_contribs['kind'] = kind
+    state_contribs['percentage'] = \
+        100.0 * state_contribs['total'] / year_total
+    return state_contribs
+
+
+def get_trade_totals(df, kind, year):
+    '''
+    Compute the total traded value of each product in each month and state
+    in the dataframe of trades
+    '''
+    totals = df.groupby(['month', 'state_code', 'product_code'],
+                        as_index=False, observed=True)['total'].sum()
+    # Add columns for the year and kind of trade being processed
+    return totals.assign(year=year, kind=kind)
+
+
+def stage_trades(csv_path, stage_dir, kind, year, force=False):
+    '''
+    Convert the trades of the given year from the specified CSV file into
+    Parquet files in the partition of the staging directory for the given
+    kind and year, unless (and force is False) the partition is already
+    newer than the CSV file
+
+    Returns:
+        staged: (bool): Whether the partition was (re)written
+    '''
+    stage_path = get_stage_path(stage_dir, kind, year)
+    if not force and os.path.isdir(stage_path) and \
+            os.path.getmtime(stage_path) >= os.path.getmtime(csv_path):
+        return False
+
+    # Write to a hidden directory first, so that the partition is replaced
+    # only after all of its files were written (and that processes staging
+    # it at the same time do not write to the same one)
+    tmp_path = os.path.join(os.path.dirname(stage_path),
+                            f'.year={year}.{os.getpid()}.tmp')
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    for chunk in read_trade_chunks(csv_path, year, list(TRADE_COLUMNS)):
+        if chunk.empty:
+            continue
+        chunk.drop(columns='year').to_parquet(
+            tmp_path, index=False, partition_cols=['month'])
+    shutil.rmtree(stage_path, ignore_errors=True)
+    os.rename(tmp_path, stage_path)
+    return True
+
+
+def get_all_aggregates(csv_path, kind, year, n=3, chunksize=None):
+    '''
+    Compute the rows of the tables in AGGREGATE_TABLES (without the names of
+    states and products) from a single read of the trades of the given kind
+    and year
+
+    The rows of trade_totals are computed first, and the other tables are
+    derived from them, instead of from the (many more) individual trades.
+    '''
+    df = get_trades(csv_path, year, list(TRADE_COLUMNS), chunksize, kind)
+    totals = get_trade_totals(df, kind, year)
+    return (get_top_by_state(totals, kind, year, n),
+            get_top_by_month_and_state(totals, kind, year, n),
+            get_state_contributions(totals, kind, year),
+            totals)
+
+
+def add_all_aggregates(aggregates, kind, year, state_names, product_names,
+                       fingerprint):
+    '''
+    JOIN metadata to the aggregates computed by get_all_aggregates and
+    replace the rows of the given kind and year in the database by them
+    '''
+    top_by_state, top_by_month_and_state, state_contribs, totals = \
+        aggregates
+    frames = dict(zip(AGGREGATE_TABLES, [
+        add_metadata(top_by_state, state_names, product_names),
+        add_metadata(top_by_month_and_state, state_names, product_names),
+        add_metadata(state_contribs, state_names),
+        add_metadata(totals, state_names, product_names)
+    ]))
+    replace_partitions(frames, kind, year, fingerprint)
+    click.echo(f'Finished ranking of products {kind}ed in {year} by state.')
+    click.echo(f'Finished ranking of products {kind}ed in {year} ' +
+               'by month and state.')
+    click.echo('Finished aggregation of states contributions to the ' +
+               f'{kind}s in {year}.')
+    click.echo(f'Finished aggregation of the totals of products {kind}ed ' +
+               f'in {year} by month and state.')
+
+
+def get_source_path(csv_path, kind, year):
+    '''
+    Get the path of the data read by get_trades for the given kind and year:
+    the CSV file itself, or the partition of the staging directory
+    '''
+    if os.path.isdir(csv_path):
+        stage_path = get_stage_path(csv_path, kind, year)
+        if not os.path.isdir(stage_path):
+            raise click.FileError(
+                stage_path,
+                hint=f'the {kind}s of {year} were not staged (run "flask '
+                     f'data stage" with --kind {kind} --year {year} first)')
+        return stage_path
+    return csv_path
+
+
+def check_source(csv_path, tables, kind, year, force=False):
+    '''
+    Get the fingerprint (with checksum) of the source of the trades of the
+    given kind and year, or None if the rows of all the tables were already
+    loaded from it, as recorded in the manifest (unless force is True)
+    '''
+    source = get_source_path(csv_path, kind, year)
+    fingerprint = get_fingerprint(source)
+    if not force and is_unchanged(tables, kind, year, fingerprint):
+        return None
+    fingerprint = fingerprint._replace(checksum=get_checksum(source))
+    if not force and is_unchanged(tables, kind, year, fingerprint):
+        # The contents are the same (e.g. the file was downloaded again)
+        update_fingerprint(tables, kind, year, fingerprint)
+        return None
+    return fingerprint
+
+
+def get_csv_path(data_dir, kind, year):
+    '''
+    Get the path of the CSV file with the trades of the given kind and year,
+    as named in the COMEX downloads (e.g. IMP_2019.csv)
+    '''
+    return os.path.join(data_dir, f'{CSV_PREFIXES[kind]}_{year}.csv')
+
+
+def build_partition(data_dir, kind, year, n=3, chunksize=None,
+                    stage_dir=None, loaded_checksum=None):
+    '''
+    Compute the aggregates of get_all_aggregates for the trades of the
+    given kind and year in the data directory, staging them first if a
+    staging directory is given. This is run in the worker processes of the
+    "build-all" command.
+
+    Returns:
+        checksum: (str): The checksum of the CSV file
+        aggregates: (tuple): The aggregates, or None if the checksum is
+        the same as loaded_checksum
+    '''
+    csv_path = get_csv_path(data_dir, kind, year)
+    checksum = get_checksum(csv_path)
+    if checksum == loaded_checksum:
+        return checksum, None
+    if stage_dir is not None:
+        stage_trades(csv_path, stage_dir, kind, year)
+        csv_path = stage_dir
+    return checksum, get_all_aggregates(csv_path, kind, year, n, chunksize)
+
+
+data_cli = AppGroup('data')
 
 
 @data_cli.command()
@@ -47,41 +465,43 @@ data_cli = AppGroup('data',
     default=3,
     show_default=True,
     help='How many of the top products to return for each state')
+@click.option(
+    '--chunksize',
+    type=click.IntRange(min=1),
+    help='Read the CSV file this many rows at a time, to bound memory usage')
+@click.option(
+    '--force',
+    is_flag=True,
+    help='Process the data even if it was already loaded from the same file')
 def aggregate_by_state_and_add(csv_path, states_path, products_path,
-                               kind, year, n=3):
+                               kind, year, n=3, chunksize=None, force=False):
     '''
     Process the specified CSV files to generate a table with the top n
     products with highest total traded value in the specified year, by
-    state, for the kind of trade specified.
+    state, for the kind of trade specified. The totals of each product by
+    month and state, from which the dashboard ranks the products, are also
+    stored.
     '''
+    fingerprint = check_source(csv_path,
+                               ['top_by_state_and_year', 'trade_totals'],
+                               kind, year, force)
+    if fingerprint is None:
+        click.echo(f'The {kind}s of {year} were already ranked by state.')
+        return
+
     click.echo(f'Processing {csv_path}...')
-    df = pd.read_csv(csv_path, delimiter=';',
-                     usecols=['CO_ANO', 'CO_NCM', 'SG_UF_NCM', 'VL_FOB'])
-    df.columns = ['year', 'product_code', 'state_code', 'total']
-    df = df[df['year'] == year]
-    # Compute the totals for each combination of state and product
-    totals = df.groupby(['state_code', 'product_code'])[['total']].sum()
-    # Rank the products of each state by their total values
-    ranked = totals.assign(
-        rank=totals.sort_values(['total'], ascending=False)
-        .groupby(['state_code'])
-        .cumcount() + 1
-    )
-    # Keep only the wanted number of products for each state
-    top = (ranked.query(f'rank <= {n}')
-           .sort_values(['state_code', 'rank'])
-           .drop('rank', axis=1)
-           ).reset_index()
-    # Add columns for the year and kind of trade being processed
-    top = top.assign(year=year, kind=kind)
+    df = get_trades(csv_path, year, list(TRADE_COLUMNS), chunksize, kind)
+    totals = get_trade_totals(df, kind, year)
+    top = get_top_by_state(totals, kind, year, n)
 
     # JOIN metadata
-    states = get_states(states_path)
-    products = get_products(products_path)
-    merged_top = top.merge(states, on='state_code')\
-        .merge(products, on='product_code')
-    merged_top.to_sql('top_by_state_and_year', db.engine, index=False,
-                      if_exists='append')
+    state_names = get_state_names(states_path)
+    product_names = get_product_names(products_path)
+    replace_partitions(
+        {'top_by_state_and_year': add_metadata(top, state_names,
+                                               product_names),
+         'trade_totals': add_metadata(totals, state_names, product_names)},
+        kind, year, fingerprint)
     click.echo(f'Finished ranking of products {kind}ed in {year} by state.')
 
 
@@ -105,43 +525,45 @@ def aggregate_by_state_and_add(csv_path, states_path, products_path,
     default=3,
     show_default=True,
     help='How many of the top products to return for each state and month')
+@click.option(
+    '--chunksize',
+    type=click.IntRange(min=1),
+    help='Read the CSV file this many rows at a time, to bound memory usage')
+@click.option(
+    '--force',
+    is_flag=True,
+    help='Process the data even if it was already loaded from the same file')
 def aggregate_by_month_and_state_and_add(csv_path, states_path,
-                                         products_path, kind, year, n=3):
+                                         products_path, kind, year, n=3,
+                                         chunksize=None, force=False):
     '''
     Process the specified CSV files to generate a table with the top n
     products with highest total traded value in the specified year, by
-    month and state, for the kind of trade specified.
+    month and state, for the kind of trade specified. The totals of each
+    product by month and state, from which the dashboard ranks the
+    products, are also stored.
     '''
+    fingerprint = check_source(csv_path,
+                               ['top_by_state_and_month', 'trade_totals'],
+                               kind, year, force)
+    if fingerprint is None:
+        click.echo(f'The {kind}s of {year} were already ranked by month and '
+                   'state.')
+        return
+
     click.echo(f'Processing {csv_path}...')
-    df = pd.read_csv(csv_path, delimiter=';',
-                     usecols=['CO_ANO', 'CO_MES', 'CO_NCM', 'SG_UF_NCM',
-                              'VL_FOB'])
-    df.columns = ['year', 'month', 'product_code', 'state_code', 'total']
-    df = df[df['year'] == year]
-    # Compute the totals for each combination of state, month and product
-    totals = df.groupby(
-        ['month', 'state_code', 'product_code'])[['total']].sum()
-    # Rank the products of each state and month by their total values
-    ranked = totals.assign(
-        rank=totals.sort_values(['total'], ascending=False)
-        .groupby(['month', 'state_code'])
-        .cumcount() + 1
-    )
-    # Keep only the wanted number of products for each state and month
-    top = (ranked.query(f'rank <= {n}')
-           .sort_values(['state_code', 'month', 'rank'])
-           .drop('rank', axis=1)
-           ).reset_index()
-    # Add columns for the year and kind of trade being processed
-    top = top.assign(year=year, kind=kind)
+    df = get_trades(csv_path, year, list(TRADE_COLUMNS), chunksize, kind)
+    totals = get_trade_totals(df, kind, year)
+    top = get_top_by_month_and_state(totals, kind, year, n)
 
     # JOIN metadata
-    states = get_states(states_path)
-    products = get_products(products_path)
-    merged_top = top.merge(states, on='state_code')\
-        .merge(products, on='product_code')
-    merged_top.to_sql('top_by_state_and_month', db.engine, index=False,
-                      if_exists='append')
+    state_names = get_state_names(states_path)
+    product_names = get_product_names(products_path)
+    replace_partitions(
+        {'top_by_state_and_month': add_metadata(top, state_names,
+                                                product_names),
+         'trade_totals': add_metadata(totals, state_names, product_names)},
+        kind, year, fingerprint)
     click.echo(f'Finished ranking of products {kind}ed in {year} ' +
                'by month and state.')
 
@@ -160,35 +582,217 @@ def aggregate_by_month_and_state_and_add(csv_path, states_path,
     type=int,
     required=True,
     help='The year whose data should be aggregated')
+@click.option(
+    '--chunksize',
+    type=click.IntRange(min=1),
+    help='Read the CSV file this many rows at a time, to bound memory usage')
+@click.option(
+    '--force',
+    is_flag=True,
+    help='Process the data even if it was already loaded from the same file')
 def aggregate_state_contributions_and_add(csv_path, states_path,
-                                          kind, year):
+                                          kind, year, chunksize=None,
+                                          force=False):
     '''
     Process the CSV file specified to generate a table with the percentage
     of contribution of each state to the country's total transactions in
     the given year, for the kind of trade specified.
     '''
+    fingerprint = check_source(csv_path, ['state_contributions'], kind, year,
+                               force)
+    if fingerprint is None:
+        click.echo('The contributions of the states to the ' +
+                   f'{kind}s in {year} were already aggregated.')
+        return
+
     click.echo(f'Processing {csv_path}...')
-    df = pd.read_csv(csv_path, delimiter=';',
-                     usecols=['CO_ANO', 'SG_UF_NCM', 'VL_FOB'])
-    df.columns = ['year', 'state_code', 'total']
-    df = df[df['year'] == year]
-    year_total = df['total'].sum()
-    state_contribs = df.groupby(
-        ['state_code'], as_index=False)['total'].sum()
-    state_contribs['year'] = year
-    state_contribs['kind'] = kind
-    state_contribs['percentage'] = \
-        100.0 * state_contribs['total'] / year_total
+    df = get_trades(csv_path, year, ['CO_ANO', 'SG_UF_NCM', 'VL_FOB'],
+                    chunksize, kind)
+    state_contribs = get_state_contributions(df, kind, year)
 
     # JOIN metadata
-    states = get_states(states_path)
-    merged_state_contribs = state_contribs\
-        .merge(states, on='state_code')
-    merged_state_contribs.to_sql('state_contributions', db.engine,
-                                 index=False, if_exists='append')
+    merged_state_contribs = add_metadata(state_contribs,
+                                         get_state_names(states_path))
+    replace_partitions({'state_contributions': merged_state_contribs},
+                       kind, year, fingerprint)
     click.echo('Finished aggregation of states contributions to the ' +
                f'{kind}s in {year}.')
 
 
-def init_app(app):
-    app.cli.add_command(data_cli)
+@data_cli.command()
+@click.argument('csv_path', type=click.Path(exists=True), nargs=1)
+@click.argument('states_path', type=click.Path(exists=True), nargs=1)
+@click.argument('products_path', type=click.Path(exists=True), nargs=1)
+@click.option(
+    '--kind',
+    type=click.Choice(['import', 'export']),
+    help='The kind of trade being processed',
+    required=True
+)
+@click.option(
+    '--year',
+    type=int,
+    required=True,
+    help='The year whose data should be aggregated')
+@click.option(
+    '--n',
+    default=3,
+    show_default=True,
+    help='How many of the top products to return for each state (and month)')
+@click.option(
+    '--chunksize',
+    type=click.IntRange(min=1),
+    help='Read the CSV file this many rows at a time, to bound memory usage')
+@click.option(
+    '--force',
+    is_flag=True,
+    help='Process the data even if it was already loaded from the same file')
+def aggregate_all_and_add(csv_path, states_path, products_path, kind, year,
+                          n=3, chunksize=None, force=False):
+    '''
+    Process the specified CSV files to generate the totals of each product
+    by month and state, the rankings of products by state and by month and
+    state, and the contributions of each state, all from a single read of
+    the CSV file of trades.
+    '''
+    fingerprint = check_source(csv_path, AGGREGATE_TABLES, kind, year, force)
+    if fingerprint is None:
+        click.echo(f'The {kind}s of {year} were already aggregated.')
+        return
+
+    click.echo(f'Processing {csv_path}...')
+    aggregates = get_all_aggregates(csv_path, kind, year, n, chunksize)
+    add_all_aggregates(aggregates, kind, year, get_state_names(states_path),
+                       get_product_names(products_path), fingerprint)
+
+
+@data_cli.command()
+@click.argument('csv_path', type=click.Path(exists=True, dir_okay=False),
+                nargs=1)
+@click.argument('stage_dir', type=click.Path(file_okay=False), nargs=1)
+@click.option(
+    '--kind',
+    type=click.Choice(['import', 'export']),
+    help='The kind of trade being processed',
+    required=True
+)
+@click.option(
+    '--year',
+    type=int,
+    required=True,
+    help='The year whose data should be staged')
+@click.option(
+    '--force',
+    is_flag=True,
+    help='Stage the data even if it is already staged and up to date')
+def stage(csv_path, stage_dir, kind, year, force=False):
+    '''
+    Convert the trades of the given year from the specified CSV file into
+    Parquet files in the staging directory, partitioned by kind, year and
+    month. The staging directory can then be given to the other data
+    commands instead of the CSV file.
+    '''
+    if stage_trades(csv_path, stage_dir, kind, year, force):
+        click.echo(f'Finished staging the {kind}s of {year}.')
+    else:
+        click.echo(f'The {kind}s of {year} are already staged.')
+
+
+@data_cli.command()
+@click.argument('data_dir', type=click.Path(exists=True, file_okay=False),
+                nargs=1)
+@click.argument('states_path', type=click.Path(exists=True), nargs=1)
+@click.argument('products_path', type=click.Path(exists=True), nargs=1)
+@click.option(
+    '--first-year',
+    type=int,
+    required=True,
+    help='The first year whose data should be aggregated')
+@click.option(
+    '--last-year',
+    type=int,
+    required=True,
+    help='The last year whose data should be aggregated')
+@click.option(
+    '--kind',
+    'kinds',
+    type=click.Choice(['import', 'export']),
+    multiple=True,
+    default=['import', 'export'],
+    show_default=True,
+    help='The kinds of trade to be processed (can be repeated)')
+@click.option(
+    '--jobs',
+    type=click.IntRange(min=1),
+    default=os.cpu_count(),
+    show_default=True,
+    help='How many worker processes to use')
+@click.option(
+    '--n',
+    default=3,
+    show_default=True,
+    help='How many of the top products to return for each state (and month)')
+@click.option(
+    '--chunksize',
+    type=click.IntRange(min=1),
+    help='Read the CSV files this many rows at a time, to bound memory usage')
+@click.option(
+    '--stage-dir',
+    type=click.Path(file_okay=False),
+    help='Stage the CSV files into this directory and read them from there')
+@click.option(
+    '--force',
+    is_flag=True,
+    help='Process the data even if it was already loaded from the same file')
+def build_all(data_dir, states_path, products_path, first_year, last_year,
+              kinds, jobs, n=3, chunksize=None, stage_dir=None,
+              force=False):
+    '''
+    Process the CSV files of trades (named as IMP_2019.csv, EXP_2019.csv,
+    etc) in the data directory, for the given kinds and range of years, to
+    fill all the tables. The files are processed in parallel by a pool of
+    worker processes, and only the writes to the database are serialized.
+
+    Files which did not change since their data was loaded, as recorded in
+    the manifest, are skipped (unless --force is given), and the data from
+    the other files replaces the data previously loaded from them.
+    '''
+    partitions = [(kind, year) for kind in kinds
+                  for year in range(first_year, last_year + 1)]
+    fingerprints = {}
+    for kind, year in partitions:
+        csv_path = get_csv_path(data_dir, kind, year)
+        if not os.path.isfile(csv_path):
+            raise click.FileError(csv_path, hint='file does not exist')
+        fingerprint = get_fingerprint(csv_path)
+        if not force and \
+                is_unchanged(AGGREGATE_TABLES, kind, year, fingerprint):
+            click.echo(f'Skipping unchanged file {csv_path}.')
+        else:
+            fingerprints[kind, year] = fingerprint
+    if not fingerprints:
+        click.echo('All files were already processed.')
+        return
+    state_names = get_state_names(states_path)
+    product_names = get_product_names(products_path)
+
+    click.echo(f'Processing {len(fingerprints)} files with {jobs} jobs...')
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            (kind, year): executor.submit(
+                build_partition, data_dir, kind, year, n, chunksize,
+                stage_dir, None if force else
+                get_loaded_checksum(AGGREGATE_TABLES, kind, year))
+            for kind, year in fingerprints
+        }
+        for (kind, year), future in futures.items():
+            checksum, aggregates = future.result()
+            fingerprint = fingerprints[kind, year]._replace(checksum=checksum)
+            if aggregates is None:
+                # Only the size or modification time of the file changed
+                update_fingerprint(AGGREGATE_TABLES, kind, year, fingerprint)
+                click.echo(f'Skipping unchanged file {fingerprint.source}.')
+            else:
+                add_all_aggregates(aggregates, kind, year, state_names,
+                                   product_names, fingerprint)
+    click.echo('Finished processing all files.')
@@ -2,8 +2,7 @@ import click
 from flask.cli import AppGroup
 from src.database import db
 
-database_cli = AppGroup('database',
-                        short_help='Commands to manage the database')
+database_cli = AppGroup('database')
 
 
 @database_cli.command()
@@ -21,7 +20,3 @@ def drop():
     """Drop all database tables"""
     db.drop_all()
     click.echo('All tables were dropped.')
-
-
-def init_app(app):
-    app.cli.add_command(database_cli)
@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 
 class Config:
@@ -6,6 +7,54 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY')
     ENV = os.environ.get('FLASK_ENV') or 'production'
     DEBUG = os.environ.get('FLASK_DEBUG') or False
+    # How many connections to the database each worker keeps open (it uses
+    # at most one per thread at a time), how many more it may open when
+    # they are busy, and how many seconds to wait for one before failing
+    DATABASE_POOL_SIZE = int(os.environ.get('DATABASE_POOL_SIZE') or 5)
+    DATABASE_MAX_OVERFLOW = int(os.environ.get('DATABASE_MAX_OVERFLOW') or 5)
+    DATABASE_POOL_TIMEOUT = int(os.environ.get('DATABASE_POOL_TIMEOUT') or 10)
+    # Test each connection before using it, and replace the connections
+    # which are older than this many seconds, since the server (e.g. on
+    # Heroku) may close the idle ones
+    DATABASE_POOL_PRE_PING = not os.environ.get('DATABASE_NO_PRE_PING')
+    DATABASE_POOL_RECYCLE = int(os.environ.get('DATABASE_POOL_RECYCLE') or
+                                1800)
+    # Where to cache the parsed UF and NCM tables (default: a hidden
+    # directory next to each CSV file)
+    DIMENSION_CACHE_DIR = os.environ.get('DIMENSION_CACHE_DIR')
+    # How many rendered charts each worker keeps in memory, and where the
+    # charts shared by all workers are stored (empty to disable)
+    CHART_CACHE_SIZE = int(os.environ.get('CHART_CACHE_SIZE') or 128)
+    CHART_CACHE_DIR = os.environ.get('CHART_CACHE_DIR',
+                                     os.path.join(tempfile.gettempdir(),
+                                                  'dashboard-charts'))
+    # Whether to embed the charts in the page as data urls, instead of
+    # linking to their (separately cacheable) endpoints
+    INLINE_CHARTS = bool(os.environ.get('INLINE_CHARTS'))
+    # Whether the browser draws the charts from the data of the JSON API,
+    # instead of getting their images from the app
+    CLIENT_CHARTS = bool(os.environ.get('CLIENT_CHARTS'))
+    # How the charts are rendered: 'matplotlib' (PNG images) or 'svg' (SVG
+    # images written in Python, which are smaller and faster to render)
+    CHART_BACKEND = os.environ.get('CHART_BACKEND') or 'matplotlib'
+    # How many processes of each worker render the charts of a page in
+    # parallel (0 to render them in the worker itself)
+    RENDER_POOL_SIZE = int(os.environ.get('RENDER_POOL_SIZE') or 0)
+    # How many rendered pages each worker keeps in memory, and where the
+    # pages shared by all workers are stored (both disabled by default)
+    PAGE_CACHE_SIZE = int(os.environ.get('PAGE_CACHE_SIZE') or 0)
+    PAGE_CACHE_DIR = os.environ.get('PAGE_CACHE_DIR')
+    # How many seconds browsers and proxies may reuse a page before
+    # revalidating it
+    PAGE_MAX_AGE = int(os.environ.get('PAGE_MAX_AGE') or 60)
+    # Where the command "flask charts prerender" writes the charts and pages
+    # of each version of the data, for nginx to serve them
+    PRERENDER_DIR = os.environ.get('PRERENDER_DIR',
+                                   os.path.join(tempfile.gettempdir(),
+                                                'dashboard-prerendered'))
+    # How many seconds each worker may use the version of the data (and the
+    # states and years available) before checking whether it changed
+    DATA_VERSION_TTL = float(os.environ.get('DATA_VERSION_TTL') or 10)
 
 
 class DevelopmentConfig(Config):
@@ -21,6 +70,7 @@ class ProductionConfig(Config):
 
 class TestingConfig(Config):
     TESTING = True
+    DATA_VERSION_TTL = 0
     SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL') or \
         'sqlite:///:memory:'
 
@@ -3,5 +3,25 @@ from flask_sqlalchemy import SQLAlchemy
 db = SQLAlchemy()
 
 
+def get_engine_options(config):
+    '''
+    Get the options of the engine from the DATABASE_POOL_* settings. SQLite
+    databases get connections which are not pooled (or a single one, when in
+    memory), so only the options common to all pools are set for them.
+    '''
+    options = {
+        'pool_pre_ping': config['DATABASE_POOL_PRE_PING'],
+        'pool_recycle': config['DATABASE_POOL_RECYCLE']
+    }
+    url = config.get('SQLALCHEMY_DATABASE_URI') or ''
+    if not url.startswith('sqlite'):
+        options.update(pool_size=config['DATABASE_POOL_SIZE'],
+                       max_overflow=config['DATABASE_MAX_OVERFLOW'],
+                       pool_timeout=config['DATABASE_POOL_TIMEOUT'])
+    return options
+
+
 def init_app(app):
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS',
+                          get_engine_options(app.config))
     db.init_app(app)
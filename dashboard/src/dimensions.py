@@ -0,0 +1,54 @@
+import hashlib
+import os
+import pickle
+
+from src.manifest import get_checksum, get_fingerprint
+
+
+def get_cache_path(csv_path, cache_dir=None):
+    '''
+    Get the path of the cache file of a CSV file. Unless a cache directory
+    is given, it is kept in the hidden directory ".cache" next to the file.
+    '''
+    csv_path = os.path.abspath(csv_path)
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(csv_path), '.cache')
+    digest = hashlib.sha1(csv_path.encode('utf-8')).hexdigest()[:8]
+    return os.path.join(cache_dir,
+                        f'{os.path.basename(csv_path)}.{digest}.pickle')
+
+
+def load_names(csv_path, reader, cache_dir=None):
+    '''
+    Get the series of names indexed by codes which the reader function
+    parses from the CSV file, from its cache file if the CSV file did not
+    change since the cache was written, or parsing it (and updating the
+    cache) otherwise
+
+    The CSV file is assumed to be unchanged if it has the same size and
+    modification time, or else the same checksum, as when it was cached.
+    '''
+    cache_path = get_cache_path(csv_path, cache_dir)
+    fingerprint = get_fingerprint(csv_path)
+    cached = None
+    if os.path.isfile(cache_path):
+        with open(cache_path, 'rb') as f:
+            cached = pickle.load(f)
+        if (cached['size'], cached['mtime']) == \
+                (fingerprint.size, fingerprint.mtime):
+            return cached['names']
+
+    checksum = get_checksum(csv_path)
+    if cached is not None and cached['checksum'] == checksum:
+        names = cached['names']
+    else:
+        names = reader(csv_path)
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    # Replace the cache file atomically, since other processes may read it
+    tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump({'size': fingerprint.size, 'mtime': fingerprint.mtime,
+                     'checksum': checksum, 'names': names}, f,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
+    return names
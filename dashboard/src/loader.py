@@ -0,0 +1,58 @@
+from flask import g
+
+from src import queries
+
+
+class DashboardLoader:
+    '''
+    Loader of the data of the charts of a single request, which fetches each
+    distinct dataset once, for both kinds of trade at a time, and derives
+    the smaller slices requested by each chart from it in memory.
+    '''
+
+    def __init__(self):
+        self.datasets = {}
+
+    def load(self, key, query, *args):
+        if key not in self.datasets:
+            self.datasets[key] = query(*args)
+        return self.datasets[key]
+
+    def get_top_contributions(self, kind, year, limit=3):
+        """
+        Get the same rows as queries.get_top_contributions, from the
+        contributions of all states to the trades of both kinds.
+        """
+        rows = self.load(('contributions', year),
+                         queries.get_contributions_of_kinds, year)[kind]
+        if limit is not None:
+            rows = rows[:limit]
+        return sorted(rows, key=lambda row: row[2])
+
+    def get_top_products(self, kind, state, year, month, count=3):
+        """
+        Get the same rows as queries.get_top_products, from the top products
+        of both kinds.
+        """
+        return self.load(('top-products', state, year, month, count),
+                         queries.get_top_products_of_kinds, state, year,
+                         month, count)[kind]
+
+
+def get_loader():
+    '''
+    Get the loader of the current request (or of the app context, outside
+    of requests)
+    '''
+    if 'loader' not in g:
+        g.loader = DashboardLoader()
+    return g.loader
+
+
+def remove_loader(exception=None):
+    g.pop('loader', None)
+
+
+def init_app(app):
+    # The app context (and g) may outlive the request, as in the tests
+    app.teardown_request(remove_loader)
@@ -0,0 +1,78 @@
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+from src import queries
+from src.manifest import get_data_version
+
+Snapshot = namedtuple('Snapshot',
+                      ['version', 'checked_at', 'state_names', 'years'])
+
+
+def load_state_names():
+    """
+    Get states' codes and names from DB and return them as an immutable
+    mapping from codes to names, ordered by name
+    """
+    return MappingProxyType(dict(queries.get_state_names()))
+
+
+def load_years():
+    """
+    Get the years which are present in the DB and return them as a tuple of
+    integers.
+    """
+    return tuple(queries.get_years())
+
+
+class Lookups:
+    '''
+    Per-worker memo of the version of the data and of the states and years
+    for which there is data, which only change when new data is loaded.
+
+    The version of the data is checked again at most every ttl seconds, and
+    the states and years are loaded again only when it changes. Each check
+    replaces the whole (immutable) snapshot at once, so concurrent requests
+    always see consistent values.
+    '''
+
+    def __init__(self, ttl=0):
+        self.ttl = ttl
+        self.snapshot = None
+
+    def init_app(self, app):
+        self.ttl = app.config.get('DATA_VERSION_TTL', self.ttl)
+        self.clear()
+
+    def clear(self):
+        self.snapshot = None
+
+    def get_snapshot(self):
+        snapshot = self.snapshot
+        now = time.monotonic()
+        if snapshot is not None and now - snapshot.checked_at < self.ttl:
+            return snapshot
+        version = get_data_version()
+        if snapshot is not None and snapshot.version == version:
+            snapshot = snapshot._replace(checked_at=now)
+        else:
+            snapshot = Snapshot(version, now, load_state_names(),
+                                load_years())
+        self.snapshot = snapshot
+        return snapshot
+
+    def get_version(self):
+        return self.get_snapshot().version
+
+    def get_state_names(self):
+        return self.get_snapshot().state_names
+
+    def get_years(self):
+        return self.get_snapshot().years
+
+
+lookups = Lookups()
+
+
+def init_app(app):
+    lookups.init_app(app)
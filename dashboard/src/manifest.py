@@ -0,0 +1,185 @@
+import hashlib
+import os
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+from src.bulk import get_insert_method
+from src.database import db
+from src.model import SourceManifest
+
+# Size of the blocks read at a time when computing checksums
+BLOCK_SIZE = 2**20
+
+# Format of the time of the latest load in the version of the data
+VERSION_TIME_FORMAT = '%Y%m%d%H%M%S%f'
+
+# Time of the latest load, read from the end of the index of the load times.
+# Each load records a new time, even if it only replaces partitions.
+DATA_VERSION = select([func.max(SourceManifest.__table__.c.loaded_at)])
+
+Fingerprint = namedtuple('Fingerprint',
+                         ['source', 'size', 'mtime', 'checksum'])
+
+
+def get_files(path):
+    '''
+    Get the path of a file, or the sorted paths of all files in a directory
+    (and its subdirectories), skipping hidden files and directories
+    '''
+    if not os.path.isdir(path):
+        return [path]
+    paths = []
+    for root, dirs, files in os.walk(path):
+        dirs[:] = [name for name in dirs if not name.startswith('.')]
+        paths += [os.path.join(root, name) for name in files
+                  if not name.startswith('.')]
+    return sorted(paths)
+
+
+def get_fingerprint(path):
+    '''
+    Get the size and the modification time of a file, or the total size and
+    the latest modification time of the files in a directory. The checksum
+    is not computed, since it requires reading all the data.
+    '''
+    stats = [os.stat(file_path) for file_path in get_files(path)]
+    return Fingerprint(
+        source=path,
+        size=sum(stat.st_size for stat in stats),
+        mtime=max((stat.st_mtime for stat in stats), default=0.0),
+        checksum=None
+    )
+
+
+def get_checksum(path):
+    '''
+    Get the SHA-256 checksum of the contents of a file, or of all files in a
+    directory
+    '''
+    sha256 = hashlib.sha256()
+    for file_path in get_files(path):
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(BLOCK_SIZE), b''):
+                sha256.update(block)
+    return sha256.hexdigest()
+
+
+def get_entries(tables, kind, year):
+    '''
+    Get the entries of the manifest for the given kind, year and tables
+    '''
+    manifest = SourceManifest.__table__
+    query = manifest.select().where(
+        manifest.c.table_name.in_(tables) &
+        (manifest.c.kind == kind) & (manifest.c.year == year))
+    with db.engine.connect() as connection:
+        return connection.execute(query).fetchall()
+
+
+def get_loaded_checksum(tables, kind, year):
+    '''
+    Get the checksum of the source from which the rows of the given kind and
+    year were loaded into all the tables, or None if they were not all
+    loaded from the same source
+    '''
+    entries = get_entries(tables, kind, year)
+    checksums = {entry.checksum for entry in entries}
+    if len(entries) == len(tables) and len(checksums) == 1:
+        return checksums.pop()
+    return None
+
+
+def is_unchanged(tables, kind, year, fingerprint):
+    '''
+    Check whether the rows of the given kind and year in all the tables were
+    loaded from a source with the given fingerprint.
+
+    A source with the same size and modification time is assumed to be
+    unchanged. Otherwise, if the fingerprint has a checksum, the source is
+    unchanged if its contents have the same checksum (e.g. when the file is
+    downloaded again), in which case the manifest should be updated with
+    update_fingerprint.
+    '''
+    entries = get_entries(tables, kind, year)
+    if len(entries) < len(tables):
+        return False
+    if all(entry.size == fingerprint.size and
+           entry.mtime == fingerprint.mtime for entry in entries):
+        return True
+    return fingerprint.checksum is not None and \
+        all(entry.checksum == fingerprint.checksum for entry in entries)
+
+
+def update_fingerprint(tables, kind, year, fingerprint):
+    '''
+    Record the path, size and modification time of the given fingerprint in
+    the manifest entries of the given kind, year and tables, whose source
+    has the same contents, so that it is not read again to compute its
+    checksum
+    '''
+    manifest = SourceManifest.__table__
+    with db.engine.begin() as connection:
+        connection.execute(
+            manifest.update().where(
+                manifest.c.table_name.in_(tables) &
+                (manifest.c.kind == kind) & (manifest.c.year == year)
+            ).values(source=fingerprint.source, size=fingerprint.size,
+                     mtime=fingerprint.mtime))
+
+
+def replace_partitions(frames, kind, year, fingerprint):
+    '''
+    Replace the rows of the given kind and year in each table by the rows of
+    the corresponding dataframe, and record the fingerprint of the source
+    they were computed from in the manifest, all in a single transaction.
+    The rows are inserted with the bulk method of the database backend.
+
+    Parameters:
+        frames: (dict): The dataframes of the new rows, by table name
+        kind: (str): The kind of trade. One of 'import' or 'export'.
+        year: (int): The year of the trades
+        fingerprint: (Fingerprint): The fingerprint of the source, with its
+        checksum
+    '''
+    manifest = SourceManifest.__table__
+    loaded_at = datetime.utcnow()
+    method = get_insert_method(db.engine.url)
+    with db.engine.begin() as connection:
+        for table_name, frame in frames.items():
+            table = db.metadata.tables[table_name]
+            connection.execute(table.delete().where(
+                (table.c.kind == kind) & (table.c.year == year)))
+            frame.to_sql(table_name, connection, index=False,
+                         if_exists='append', method=method)
+            connection.execute(manifest.delete().where(
+                (manifest.c.table_name == table_name) &
+                (manifest.c.kind == kind) & (manifest.c.year == year)))
+            connection.execute(manifest.insert().values(
+                table_name=table_name, kind=kind, year=year,
+                source=fingerprint.source, size=fingerprint.size,
+                mtime=fingerprint.mtime, checksum=fingerprint.checksum,
+                loaded_at=loaded_at))
+
+
+def get_data_version():
+    '''
+    Get a string identifying the version of the data in the database, which
+    changes whenever any rows are (re)loaded by replace_partitions
+    '''
+    with db.engine.connect() as connection:
+        loaded_at = connection.execute(DATA_VERSION).scalar()
+    if loaded_at is None:
+        return '0'
+    return f'{loaded_at:{VERSION_TIME_FORMAT}}'
+
+
+def get_version_time(version):
+    '''
+    Get the time (in UTC) when the given version of the data was loaded, or
+    None if no data was loaded
+    '''
+    if version == '0':
+        return None
+    return datetime.strptime(version, VERSION_TIME_FORMAT)
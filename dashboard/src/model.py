@@ -11,6 +11,11 @@ class TopByStateAndYear(db.Model):
     product = db.Column(db.VARCHAR(344), nullable=False)
     total = db.Column(db.BigInteger, nullable=False)
 
+    __table_args__ = (
+        # For the years available in the dashboard
+        db.Index('ix_top_by_state_and_year_year', 'year'),
+    )
+
 
 class TopByStateAndMonth(db.Model):
 
@@ -32,3 +37,54 @@ class StateContributions(db.Model):
     state = db.Column(db.String(24), nullable=False)
     total = db.Column(db.BigInteger, nullable=False)
     percentage = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        # For the largest contributions in a year (covering)
+        db.Index('ix_state_contributions_year_kind_percentage',
+                 'year', 'kind', 'percentage', 'state_code', 'state',
+                 'total'),
+        # For the names of the states available in the dashboard (covering)
+        db.Index('ix_state_contributions_state_code_state',
+                 'state_code', 'state'),
+    )
+
+
+class TradeTotals(db.Model):
+
+    kind = db.Column(db.String(6), primary_key=True)
+    year = db.Column(db.SmallInteger, primary_key=True)
+    state_code = db.Column(db.String(2), primary_key=True)
+    month = db.Column(db.SmallInteger, primary_key=True)
+    product_code = db.Column(db.Integer, primary_key=True)
+    state = db.Column(db.String(24), nullable=False)
+    product = db.Column(db.VARCHAR(344), nullable=False)
+    total = db.Column(db.BigInteger, nullable=False)
+
+    __table_args__ = (
+        # For the top products of a state in a month (covering)
+        db.Index('ix_trade_totals_kind_year_state_code_month_total',
+                 'kind', 'year', 'state_code', 'month', 'total', 'product',
+                 'state'),
+        # For the yearly totals of the products of a state, already in the
+        # order of the GROUP BY (covering)
+        db.Index('ix_trade_totals_kind_year_state_code_product_code',
+                 'kind', 'year', 'state_code', 'product_code', 'product',
+                 'state', 'total'),
+    )
+
+
+class SourceManifest(db.Model):
+
+    table_name = db.Column(db.String(32), primary_key=True)
+    kind = db.Column(db.String(6), primary_key=True)
+    year = db.Column(db.SmallInteger, primary_key=True)
+    source = db.Column(db.String(255), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    mtime = db.Column(db.Float, nullable=False)
+    checksum = db.Column(db.String(64), nullable=False)
+    loaded_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        # For the version of the data
+        db.Index('ix_source_manifest_loaded_at', 'loaded_at'),
+    )
@@ -0,0 +1,232 @@
+'''
+Queries of the dashboard. Each statement is built once, with bound
+parameters instead of values formatted into the SQL, and is compiled once
+per database dialect, since all executions share COMPILED_CACHE. The
+results are returned as lists of plain tuples.
+'''
+from sqlalchemy import (Integer, bindparam, desc, func, literal_column,
+                        select, union_all)
+
+from src import database
+from src.model import (StateContributions, TopByStateAndYear,
+                       TradeTotals)
+
+# Kinds of trade, which the batched queries get at once
+KINDS = ('import', 'export')
+
+# States which are shown in the dashboard
+STATE_CODES = ('AC', 'AL', 'AP', 'AM', 'BA', 'CE', 'DF', 'ES', 'GO', 'MA',
+               'MT', 'MS', 'MG', 'PR', 'PB', 'PA', 'PE', 'PI', 'RN', 'RS',
+               'RJ', 'RO', 'RR', 'SC', 'SE', 'SP', 'TO')
+
+# Compiled form of the statements, by dialect and statement
+COMPILED_CACHE = {}
+
+totals = TradeTotals.__table__
+contributions = StateContributions.__table__
+top_by_state = TopByStateAndYear.__table__
+
+STATE_NAMES = (
+    select([contributions.c.state_code, contributions.c.state])
+    .where(contributions.c.state_code.in_(STATE_CODES))
+    .distinct()
+    .order_by(contributions.c.state)
+)
+
+# The distinct years, found with a search of the index of the years for each
+# one (from the previous year), instead of a scan of the whole index
+first_year = select([func.min(top_by_state.c.year).label('year')])\
+    .cte('years', recursive=True)
+next_year = (
+    select([func.min(top_by_state.c.year)])
+    .where(top_by_state.c.year > first_year.c.year)
+    .scalar_subquery()
+)
+years = first_year.union_all(
+    select([next_year]).where(first_year.c.year.isnot(None)))
+
+YEARS = (
+    select([years.c.year])
+    .where(years.c.year.isnot(None))
+    .order_by(years.c.year)
+)
+
+yearly_total = func.sum(totals.c.total).label('total')
+
+
+def select_top_products(kind, by_month, columns=()):
+    '''
+    Build the statement selecting the top products of the given kind of
+    trade (a bound parameter or a value) in a month or in a year, with any
+    other columns before those of the products
+    '''
+    criterion = ((totals.c.kind == kind) &
+                 (totals.c.year == bindparam('year')) &
+                 (totals.c.state_code == bindparam('state_code')))
+    if by_month:
+        statement = (
+            select(list(columns) +
+                   [totals.c.product, totals.c.state, totals.c.total])
+            .where(criterion & (totals.c.month == bindparam('month')))
+            .order_by(desc(totals.c.total))
+        )
+    else:
+        statement = (
+            select(list(columns) +
+                   [totals.c.product, totals.c.state, yearly_total])
+            .where(criterion)
+            .group_by(totals.c.product_code, totals.c.product,
+                      totals.c.state)
+            .order_by(desc(yearly_total))
+        )
+    return statement.limit(bindparam('count', type_=Integer))
+
+
+def select_top_products_of_kinds(by_month):
+    '''
+    Build the statement selecting the top products of each kind of trade,
+    prefixed by the kind, with a UNION ALL of the statements for each kind,
+    ordered by kind and in decreasing order of total (since the order of the
+    rows of a UNION is not kept otherwise)
+    '''
+    return union_all(*[
+        select([select_top_products(kind, by_month, [totals.c.kind])
+                .alias(f'{kind}s')])
+        for kind in KINDS
+    ]).order_by(literal_column('kind'), desc(literal_column('total')))
+
+
+TOP_PRODUCTS_BY_MONTH = select_top_products(bindparam('kind'), True)
+TOP_PRODUCTS_BY_YEAR = select_top_products(bindparam('kind'), False)
+TOP_PRODUCTS_BY_MONTH_OF_KINDS = select_top_products_of_kinds(True)
+TOP_PRODUCTS_BY_YEAR_OF_KINDS = select_top_products_of_kinds(False)
+
+ALL_CONTRIBUTIONS = (
+    select([contributions.c.state_code, contributions.c.state,
+            contributions.c.total, contributions.c.percentage])
+    .where((contributions.c.year == bindparam('year')) &
+           (contributions.c.kind == bindparam('kind')))
+    .order_by(desc(contributions.c.percentage))
+)
+
+TOP_CONTRIBUTIONS = ALL_CONTRIBUTIONS.limit(bindparam('limit', type_=Integer))
+
+CONTRIBUTIONS_OF_KINDS = (
+    select([contributions.c.kind, contributions.c.state_code,
+            contributions.c.state, contributions.c.total,
+            contributions.c.percentage])
+    .where(contributions.c.year == bindparam('year'))
+    .order_by(contributions.c.kind, desc(contributions.c.percentage))
+)
+
+
+def execute(statement, **params):
+    '''
+    Execute the statement with the given parameters, reusing its compiled
+    form, and get the rows of the result as tuples
+    '''
+    with database.db.engine.connect() as connection:
+        result = connection.execution_options(
+            compiled_cache=COMPILED_CACHE).execute(statement, params)
+        return [tuple(row) for row in result]
+
+
+def get_state_names():
+    """
+    Get the codes and names of the states with data, ordered by name.
+    """
+    return execute(STATE_NAMES)
+
+
+def get_years():
+    """
+    Get the years with data, in increasing order.
+    """
+    return [int(year) for year, in execute(YEARS)]
+
+
+def get_top_products(kind, state, year, month, count=3):
+    """
+    Get products with the largest FOB values in USD, as tuples of the name
+    of the product, the name of the state and the total, in increasing
+    order of total.
+
+    The products are ranked directly from the totals by month, state and
+    product, so any number of them can be requested, not just the ones which
+    were precomputed for the top products tables.
+
+    Parameters:
+        kind: (str): The kind of trade. One of 'import' or 'export'.
+        state: (str): The UF code of the state of origin/destiny the trade
+        year: (int): The year of the trade
+        month: (int): The month of the trade, or None for the whole year
+        count: (int): How many products to get
+    """
+    if month:
+        rows = execute(TOP_PRODUCTS_BY_MONTH, kind=kind, year=year,
+                       state_code=state, month=month, count=count)
+    else:
+        rows = execute(TOP_PRODUCTS_BY_YEAR, kind=kind, year=year,
+                       state_code=state, count=count)
+    return rows[::-1]
+
+
+def get_top_contributions(kind, year, limit=3):
+    """
+    Get states with largest contributions to the yearly total, as tuples of
+    the code and the name of the state, its total and its percentage of the
+    total of the country, in increasing order of total.
+
+    Parameters:
+        kind: (str): The kind of trade. One of 'import' or 'export'.
+        year: (int): The year of the trades
+        limit: (int): Limit the results to this many states.
+    """
+    if limit is None:
+        rows = execute(ALL_CONTRIBUTIONS, kind=kind, year=year)
+    else:
+        rows = execute(TOP_CONTRIBUTIONS, kind=kind, year=year, limit=limit)
+    return sorted(rows, key=lambda row: row[2])
+
+
+def group_by_kind(rows):
+    '''
+    Split the rows prefixed by the kind of trade into lists of rows by kind
+    '''
+    groups = {kind: [] for kind in KINDS}
+    for kind, *row in rows:
+        groups[kind].append(tuple(row))
+    return groups
+
+
+def get_contributions_of_kinds(year):
+    """
+    Get the contributions of all states to the yearly totals of both kinds
+    of trade with a single query, as lists of tuples like those of
+    get_top_contributions, by kind, in decreasing order of percentage.
+
+    Parameters:
+        year: (int): The year of the trades
+    """
+    return group_by_kind(execute(CONTRIBUTIONS_OF_KINDS, year=year))
+
+
+def get_top_products_of_kinds(state, year, month, count=3):
+    """
+    Get products with the largest FOB values in USD of both kinds of trade
+    with a single query, as lists of tuples like those of get_top_products,
+    by kind, in increasing order of total.
+
+    Parameters:
+        state: (str): The UF code of the state of origin/destiny the trade
+        year: (int): The year of the trade
+        month: (int): The month of the trade, or None for the whole year
+        count: (int): How many products of each kind to get
+    """
+    if month:
+        rows = execute(TOP_PRODUCTS_BY_MONTH_OF_KINDS, year=year,
+                       state_code=state, month=month, count=count)
+    else:
+        rows = execute(TOP_PRODUCTS_BY_YEAR_OF_KINDS, year=year,
+                       state_code=state, count=count)
+    return {kind: rows[::-1] for kind, rows in group_by_kind(rows).items()}
@@ -0,0 +1,94 @@
+import atexit
+import multiprocessing
+import os
+import threading
+
+from src.charts import get_backend
+
+
+def warm_up(backend):
+    '''
+    Import the chart backend and render a chart with some text, so that
+    (with matplotlib) the fonts are loaded before the first chart is
+    rendered
+    '''
+    get_backend(backend).get_plot(['Aquecimento'], [1], title='Aquecimento')
+
+
+def run(job):
+    '''
+    Run a job, given as a tuple of a function, its positional arguments and
+    its keyword arguments, and return its result
+    '''
+    function, args, kwargs = job
+    return function(*args, **kwargs)
+
+
+class RenderPool:
+    '''
+    Pool of processes which render charts in parallel, since matplotlib can
+    not be used from several threads at once.
+
+    All the processes are started (and warmed up with the chart backend) at
+    once, before the first jobs are submitted. Each worker of the app has
+    its own pool, started in the worker itself, since the processes of a
+    pool can not be shared after a fork (gunicorn.conf.py starts it as soon
+    as each worker is ready). With a size of 0, the jobs are run one after
+    another in the worker.
+    '''
+
+    def __init__(self, size=0, backend='matplotlib'):
+        self.size = size
+        self.backend = backend
+        self.pool = None
+        self.pid = None
+        # Several threads of a worker may start the pool at once
+        self.lock = threading.Lock()
+
+    def init_app(self, app):
+        self.size = app.config.get('RENDER_POOL_SIZE', self.size)
+        self.backend = app.config.get('CHART_BACKEND', self.backend)
+
+    def is_running(self):
+        return self.pool is not None and self.pid == os.getpid()
+
+    def start(self):
+        '''
+        Start the processes of the pool, unless they are already running
+        '''
+        if self.size < 1 or self.is_running():
+            return
+        with self.lock:
+            if self.is_running():
+                return
+            self.pool = multiprocessing.Pool(self.size, initializer=warm_up,
+                                             initargs=(self.backend,))
+            self.pid = os.getpid()
+        atexit.unregister(self.stop)
+        atexit.register(self.stop)
+
+    def stop(self):
+        with self.lock:
+            if self.is_running():
+                self.pool.terminate()
+                self.pool.join()
+            self.pool = None
+            self.pid = None
+
+    def render_all(self, jobs):
+        '''
+        Run all the jobs at once in the processes of the pool, and return
+        their results in the same order. A single job is run right away, as
+        there is nothing to run in parallel with it.
+        '''
+        if self.size < 1 or len(jobs) < 2:
+            return [run(job) for job in jobs]
+        self.start()
+        return self.pool.map(run, jobs, chunksize=1)
+
+
+pool = RenderPool()
+
+
+def init_app(app):
+    pool.init_app(app)
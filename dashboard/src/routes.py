@@ -1,47 +1,32 @@
 import base64
-import io
+import hashlib
 from datetime import datetime
-from textwrap import fill
 
-import matplotlib.pyplot as plt
-import matplotlib.ticker as ticker
-import pandas as pd
-from flask import abort, redirect, render_template, url_for
-from matplotlib.backends.backend_agg import FigureCanvasAgg
+from flask import (abort, current_app, make_response, redirect,
+                   render_template, request, url_for)
+from werkzeug.http import is_resource_modified
 
-from src import database
+from src import cache, rendering
+from src.charts import get_backend, large_num_formatter  # noqa: F401
+from src.lookups import lookups
+from src.manifest import get_version_time
+from src.loader import get_loader
 
 
 def get_available_state_codes():
     """
-    Get states' codes and names from DB and return them as a dataframe
+    Get the codes and names of the states with data, as an immutable mapping
+    ordered by name, from the lookups memoized by the worker
     """
-    with database.db.engine.connect() as connection:
-        query = '''
-        SELECT DISTINCT(state_code) state_code,
-               state
-        FROM state_contributions
-        WHERE state_code IN ('AC', 'AL', 'AP', 'AM', 'BA', 'CE', 'DF', 'ES',
-                             'GO', 'MA', 'MT', 'MS', 'MG', 'PR', 'PB', 'PA',
-                             'PE', 'PI', 'RN', 'RS', 'RJ', 'RO', 'RR', 'SC',
-                             'SE', 'SP', 'TO')
-        ORDER BY state
-        '''
-        return pd.read_sql(query, connection, index_col='state_code')
+    return lookups.get_state_names()
 
 
 def get_available_years():
     """
-    Get the years which are present in the DB and return them as a list of
-    integers.
+    Get the years with data, as a tuple of integers, from the lookups
+    memoized by the worker
     """
-    with database.db.engine.connect() as connection:
-        query = '''
-        SELECT DISTINCT(year)
-        FROM top_by_state_and_year
-        ORDER BY year
-        '''
-        return pd.read_sql(query, connection).year.astype(int).values.tolist()
+    return lookups.get_years()
 
 
 def get_month_name(month):
@@ -81,159 +66,234 @@ def get_month_options(year):
     return []
 
 
-def get_top_products(kind, state, year, month, count=3, index=None):
-    """
-    Get products with the largest FOB values in USD and return them as a
-    dataframe.
-
-    Parameters:
-        kind: (str): The kind of trade. One of 'import' or 'export'.
-        state: (str): The UF code of the state of origin/destiny the trade
-        year: (str): The year of the trade
-        count: (int): How many products to get
-    """
-    if month:
-        table = 'top_by_state_and_month'
-        period_filter = f't.year=\'{year}\' AND t.month=\'{month}\''
-    else:
-        table = 'top_by_state_and_year'
-        period_filter = f't.year=\'{year}\''
-
-    query = f'''
-    SELECT t.product, t.state, t.total
-    FROM {table} t
-    WHERE {period_filter}
-        AND t.state_code='{state}'
-        AND t.kind='{kind}'
-    ORDER BY t.total
-    LIMIT {count}
+def get_data_url(image, mimetype='image/png'):
+    '''
+    Generate a data url using the base 64 encoding of the image
     '''
-    with database.db.engine.connect() as connection:
-        return pd.read_sql(query, connection, index_col=index)\
-                .sort_values('total')
+    image_in_base_64 = 'data:{};base64,{}'.format(
+        mimetype, base64.b64encode(image).decode('utf8')
+    )
 
+    return image_in_base_64
+
+
+# Titles of the charts of each kind of trade
+TOP_PRODUCTS_TITLES = {
+    'import': 'Produtos mais importados',
+    'export': 'Produtos mais exportados'
+}
+TOP_STATES_TITLES = {
+    'import': 'Maiores importadores',
+    'export': 'Maiores exportadores'
+}
+CONTRIBUTION_TITLES = {
+    'import': 'Representatividade das importações do estado no ano\n'
+              'em relação ao total de importações do país',
+    'export': 'Representatividade das exportações do estado no ano\n'
+              'em relação ao total de exportações do país'
+}
+
+# How long browsers and proxies may keep the charts of a given data version
+CHART_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def get_top_products_options(kind, state_code, year, month):
+    state_name = get_available_state_codes()[state_code]
+    group = f'({state_name}, {get_month_name(month)} de {year})'
+    return {
+        'ylabel': 'Produto',
+        'title': f'{TOP_PRODUCTS_TITLES[kind]} {group}'
+    }
 
-def get_top_contributions(kind, year, limit=3, index=None):
-    """
-    Get states with largest contributions to the yearly total and return them
-    as a dataframe.
 
-    Parameters:
-        kind: (str): The kind of trade. One of 'import' or 'export'.
-        year: (str): The year of the trades
-        limit: (int): Limit the results to this many states.
-    """
-    limit = f'LIMIT {limit}' if limit is not None else ''
-
-    query = f'''
-    SELECT s.state_code, s.state, s.total, s.percentage
-    FROM state_contributions s
-    WHERE year = '{year}'
-      AND kind = '{kind}'
-    ORDER BY s.percentage DESC
-    {limit}
-    '''
-    with database.db.engine.connect() as connection:
-        return pd.read_sql(query, connection, index_col=index)\
-                .sort_values('total')
+def get_top_states_options(kind, state_code, year, month):
+    return {
+        'ylabel': 'Estado',
+        'title': f'{TOP_STATES_TITLES[kind]} ({year})'
+    }
 
 
-def large_num_formatter(num, pos=None):
-    """
-    Format large numbers using appropriate sufixes for powers of 1000
+def get_contribution_options(kind, state_code, year, month):
+    return {
+        'state': state_code,
+        'title': CONTRIBUTION_TITLES[kind]
+    }
+
+
+def prepare_top_products(kind, state_code, year, month):
+    rows = get_loader().get_top_products(kind, state_code, year, month)
+    return get_backend().get_plot, (
+        [product for product, _, _ in rows],
+        [total for _, _, total in rows]
+    ), get_top_products_options(kind, state_code, year, month)
+
+
+def prepare_top_states(kind, state_code, year, month):
+    rows = get_loader().get_top_contributions(kind, year)
+    return get_backend().get_plot, (
+        [state for _, state, _, _ in rows],
+        [total for _, _, total, _ in rows]
+    ), get_top_states_options(kind, state_code, year, month)
+
+
+def prepare_contribution(kind, state_code, year, month):
+    return get_backend().get_contribution_plot, (
+        get_loader().get_top_contributions(kind, year, limit=None),
+    ), get_contribution_options(kind, state_code, year, month)
+
+
+# Functions preparing the rendering of each type of chart (by loading its
+# data and returning the plot function with its arguments), and the
+# endpoints serving them
+CHARTS = {
+    'top-products': (prepare_top_products, 'top_products_chart'),
+    'top-states': (prepare_top_states, 'top_states_chart'),
+    'contribution': (prepare_contribution, 'contribution_chart')
+}
+
+
+def get_charts(charts, version):
+    '''
+    Get the PNG images of the charts from the chart cache, rendering the
+    ones which are not cached for the given version of the data all at once
+    in the render pool
 
     Parameters:
-        num: (int): The tick value to be formatted
-        pos: (int): Position of the ticker
-    """
-    for unit in ['', 'mil', 'Mi.', 'Bi.']:
-        if abs(num) < 1000.0:
-            return "%3.1f %s" % (num, unit)
-        num /= 1000.0
-    return "%.1f %s" % (num, 'Tri.')
+        charts: (list): Tuples with the type of chart (one of the keys of
+        CHARTS), the kind of trade, the code of the state (if the chart
+        depends on it), the year and the month (or None for the whole year)
+        version: (str): The version of the data
+    '''
+    # The images of each backend are cached separately
+    backend = get_backend().NAME
+    images = {}
+    jobs = {}
+    for chart in charts:
+        image = cache.charts.get((backend,) + chart, version)
+        if image is not None:
+            images[chart] = image
+        elif chart not in jobs:
+            prepare = CHARTS[chart[0]][0]
+            jobs[chart] = prepare(*chart[1:])
+    rendered = rendering.pool.render_all(list(jobs.values()))
+    for chart, image in zip(jobs, rendered):
+        cache.charts.set((backend,) + chart, version, image)
+        images[chart] = image
+    return [images[chart] for chart in charts]
+
+
+def get_chart_url(chart, version=None):
+    '''
+    Get the URL of the endpoint of a chart, given as a tuple like those of
+    get_charts, with the version of the data (if any) as its query string
+    '''
+    chart, kind, state_code, year, month = chart
+    return url_for(CHARTS[chart][1], kind=kind, state_code=state_code,
+                   year=year, month=month, extension=get_backend().EXTENSION,
+                   v=version)
 
 
-def get_data_url(fig):
+def get_chart_data(chart, version):
     '''
-    Generate a data url using the base 64 encoding of the figure
+    Get what the browser needs to draw a chart, given as a tuple like those
+    of get_charts, by itself: the type of the plot, the URL of the data in
+    the JSON API (with the version of the data) and the options of the plot
     '''
-    png_image = io.BytesIO()
-    canvas = FigureCanvasAgg(fig)
-    canvas.print_png(png_image)
+    chart, kind, state_code, year, month = chart
+    if chart == 'top-products':
+        plot = 'bar'
+        url = url_for('top_products_data', kind=kind, state_code=state_code,
+                      year=year, month=month, v=version)
+        options = get_top_products_options(kind, state_code, year, month)
+    elif chart == 'top-states':
+        plot = 'bar'
+        url = url_for('contributions_data', kind=kind, year=year, limit=3,
+                      v=version)
+        options = get_top_states_options(kind, state_code, year, month)
+    else:
+        plot = 'pie'
+        url = url_for('contributions_data', kind=kind, year=year, v=version)
+        options = get_contribution_options(kind, state_code, year, month)
+    return {'plot': plot, 'url': url, 'options': options}
 
-    png_image_in_base_64 = 'data:image/png;base64,{}'.format(
-        base64.b64encode(png_image.getvalue()).decode('utf8')
-    )
 
-    return png_image_in_base_64
+def get_chart_srcs(charts, version):
+    '''
+    Get the sources of the charts for img tags: the URLs of their endpoints,
+    which change with the version of the data so they can be cached for
+    long, or their data urls if the charts are inlined in the page. If the
+    charts are drawn by the browser, get what it needs to draw them instead
+    (see get_chart_data).
+    '''
+    if current_app.config.get('CLIENT_CHARTS'):
+        return [get_chart_data(chart, version) for chart in charts]
+    if current_app.config.get('INLINE_CHARTS'):
+        mimetype = get_backend().MIMETYPE
+        return [get_data_url(image, mimetype)
+                for image in get_charts(charts, version)]
+    return [get_chart_url(chart, version) for chart in charts]
+
 
+def check_period(state_code, year, month=None):
+    '''
+    Abort with a 404 error unless there is data for the state in the given
+    year and month
+    '''
+    if state_code is not None and \
+            state_code not in get_available_state_codes():
+        abort(404)
+    if year not in get_available_years():
+        abort(404)
+    if month is not None and month not in get_month_options(year):
+        abort(404)
 
-def get_contribution_plot(df, state, title=None):
-    """
-    Make a pie chart of the percentage of contribution of each state
 
-    Parameters:
-        df: (pandas.core.frame.DataFrame): Dataframe to be plotted
-        state: (str): The code of the state
-    """
-    threshold = 3
-
-    def pct_format(percent, skip_small_values=True):
-        if percent <= threshold and skip_small_values:
-            return ''
-        return '%1.1f%%' % percent
-
-    # Highlight the current state
-    explode = [0.03 if code != state else 0.2 for code in df.state_code]
-    colors = ['#CCC' if code != state else '#66F'
-              for code in df.state_code]
-
-    # Hide the percentages of small contributions, unless it is for the
-    # current state. In that case, show it as part of the label, since it would
-    # not fit inside its slice.
-    labels = [name if df['percentage'][name] > threshold else
-              name + ' ({})'.format(
-                  pct_format(df['percentage'][name],
-                             skip_small_values=False)
-                            ) if df['state_code'][name] == state
-              else '' for name in df.index]
-
-    fig, ax = plt.subplots()
-    ax.pie(df.total, colors=colors, autopct=pct_format, startangle=90,
-           explode=explode, labels=labels)
-    if title:
-        ax.set_title(title, pad=20)
-    plt.tight_layout()
-    return get_data_url(fig)
-
-
-def get_plot(df, ylabel='Produto', title=None):
-    """
-    Make a horizontal bar plot of the dataframe.
+def send_chart(chart, kind, state_code, year, extension, month=None):
+    '''
+    Respond with the image of a chart, with a strong ETag. If the URL has
+    the current version of the data, the image can be cached for long, since
+    the URL changes when new data is loaded. Otherwise, it must be
+    revalidated.
+    '''
+    backend = get_backend()
+    if extension != backend.EXTENSION:
+        abort(404)
+    check_period(state_code, year, month)
+    version = lookups.get_version()
+    png_image, = get_charts([(chart, kind, state_code, year, month)],
+                            version)
+    response = make_response(png_image)
+    response.mimetype = backend.MIMETYPE
+    response.set_etag(hashlib.sha1(png_image).hexdigest())
+    if request.args.get('v') == version:
+        response.headers['Cache-Control'] = \
+            f'public, max-age={CHART_MAX_AGE}, immutable'
+    else:
+        response.headers['Cache-Control'] = 'public, no-cache'
+    return response.make_conditional(request)
 
-    Parameters:
-        df: (pandas.core.frame.DataFrame): Dataframe to be plotted
-        title: (str): Text to be used as title for the plot
+
+def top_products_chart(kind, state_code, year, extension, month=None):
+    """
+    Chart of the products most traded by the state in the given period
     """
-    fig, ax = plt.subplots(figsize=(10, len(df)*0.5 + 1.5))
+    return send_chart('top-products', kind, state_code, year, extension,
+                      month)
 
-    df.plot(kind='barh', ax=ax, legend=False)
-    for container in ax.containers:
-        plt.setp(container, height=0.5)
-    for i, v in enumerate(df['total']):
-        ax.text(v, i, str(large_num_formatter(v)), color='blue', va='center',
-                fontweight='bold')
 
-    if title:
-        ax.set_title(title)
-    ax.set_ylabel(ylabel)
-    ax.set_xlabel('Valor total anual (US$)')
+def top_states_chart(kind, year, extension):
+    """
+    Chart of the states with the largest trades in the given year
+    """
+    return send_chart('top-states', kind, None, year, extension)
 
-    ax.set_yticklabels([fill(p, 50) for p in df.index])
-    ax.xaxis.set_major_formatter(ticker.FuncFormatter(large_num_formatter))
 
-    plt.tight_layout()
-    return get_data_url(fig)
+def contribution_chart(kind, state_code, year, extension):
+    """
+    Chart of the contribution of the state to the trades of the country in
+    the given year
+    """
+    return send_chart('contribution', kind, state_code, year, extension)
 
 
 def index():
@@ -248,75 +308,50 @@ def index():
     ))
 
 
-def dashboard(state_code, year, month=None):
+def get_dashboard_charts(state_code, year, month):
+    '''
+    Get the charts of a dashboard page, by the name of its variable in the
+    template, as tuples like those of get_charts
+    '''
+    charts = {}
+    if month is None:
+        charts['img_top_importers'] = ('top-states', 'import', None, year,
+                                       None)
+        charts['img_top_exporters'] = ('top-states', 'export', None, year,
+                                       None)
+        charts['img_contribution_to_imports'] = ('contribution', 'import',
+                                                 state_code, year, None)
+        charts['img_contribution_to_exports'] = ('contribution', 'export',
+                                                 state_code, year, None)
+    charts['img_top_imports'] = ('top-products', 'import', state_code, year,
+                                 month)
+    charts['img_top_exports'] = ('top-products', 'export', state_code, year,
+                                 month)
+    return charts
+
+
+def render_dashboard(state_code, year, month, version):
     """
-    Show statistics about imports and exports for the state and year provided
-    in the URL.
-
-    Parameters:
-        state_code: (str): The code of the state of origin/destiny the trade
-        (default the first state available).
-        year: (int): The year of the trade (default the first year available).
+    Render the page with the statistics about imports and exports for the
+    state and year (and month) provided, for the given version of the data.
     """
     available_state_codes = get_available_state_codes()
-    if state_code not in available_state_codes.index:
+    if state_code not in available_state_codes:
         return abort(404)
-    state_name = available_state_codes['state'][state_code]
 
     available_years = get_available_years()
     if year not in available_years:
         return abort(404)
     month_options = get_month_options(year)
 
-    if month_options and month in month_options:
-        month_name = get_month_name(month)
-    else:
+    if not month_options or month not in month_options:
         month = None
-        month_name = 'todos os meses'
 
-    if month is None:
-        group = f'({year})'
-        img_top_importers = get_plot(
-            get_top_contributions('import', year, index='state'),
-            ylabel='Estado',
-            title=f'Maiores importadores {group}'
-        )
-        img_top_exporters = get_plot(
-            get_top_contributions('export', year, index='state'),
-            ylabel='Estado',
-            title=f'Maiores exportadores {group}'
-        )
-        img_contribution_to_imports = get_contribution_plot(
-            get_top_contributions('import', year, limit=None, index='state'),
-            state=state_code,
-            title='Representatividade das importações do estado no'
-            + ' ano\nem relação ao total de importações do país'
-        )
-        img_contribution_to_exports = get_contribution_plot(
-            get_top_contributions('export', year, limit=None, index='state'),
-            state=state_code,
-            title='Representatividade das exportações do estado no'
-            + ' ano\nem relação ao total de exportações do país'
-        )
-    else:
-        img_top_importers = None
-        img_top_exporters = None
-        img_contribution_to_imports = None
-        img_contribution_to_exports = None
-
-    group = f'({state_name}, {month_name} de {year})'
-    img_top_imports = get_plot(
-        get_top_products('import', state_code, year, month, index='product'),
-        ylabel='Produto',
-        title=f'Produtos mais importados {group}'
-    )
-    img_top_exports = get_plot(
-        get_top_products('export', state_code, year, month, index='product'),
-        ylabel='Produto',
-        title=f'Produtos mais exportados {group}'
-    )
+    charts = get_dashboard_charts(state_code, year, month)
+    srcs = dict(zip(charts, get_chart_srcs(list(charts.values()), version)))
     return render_template(
         'dashboard.html',
+        client_charts=bool(current_app.config.get('CLIENT_CHARTS')),
         month_options=[None] + month_options,
         month=month,
         get_month_name=get_month_name,
@@ -324,15 +359,76 @@ def dashboard(state_code, year, month=None):
         year=year,
         available_state_codes=available_state_codes,
         state_code=state_code,
-        img_top_imports=img_top_imports,
-        img_top_exports=img_top_exports,
-        img_top_importers=img_top_importers,
-        img_top_exporters=img_top_exporters,
-        img_contribution_to_imports=img_contribution_to_imports,
-        img_contribution_to_exports=img_contribution_to_exports
+        img_top_imports=srcs.get('img_top_imports'),
+        img_top_exports=srcs.get('img_top_exports'),
+        img_top_importers=srcs.get('img_top_importers'),
+        img_top_exporters=srcs.get('img_top_exporters'),
+        img_contribution_to_imports=srcs.get('img_contribution_to_imports'),
+        img_contribution_to_exports=srcs.get('img_contribution_to_exports')
     )
 
 
+def get_page_month(state_code, year, month):
+    '''
+    Abort with a 404 error unless there is data for the state in the given
+    year, and get the month of the page (None for a month without data, as
+    for the page of the whole year)
+    '''
+    check_period(state_code, year)
+    if month not in get_month_options(year):
+        return None
+    return month
+
+
+def get_page_key(state_code, year, month):
+    '''
+    Get what determines the contents of a dashboard page, besides the
+    version of the data: its URL, the months with data available (which
+    depend on the current year), and how the charts are included
+    '''
+    return ('dashboard', state_code, year, month, datetime.now().year,
+            bool(current_app.config.get('INLINE_CHARTS')),
+            bool(current_app.config.get('CLIENT_CHARTS')))
+
+
+def dashboard(state_code, year, month=None):
+    """
+    Show statistics about imports and exports for the state and year provided
+    in the URL.
+
+    The page only changes when new data is loaded, so it is sent with an
+    ETag and a Last-Modified date derived from the version of the data, and
+    requests for an unchanged page get an empty 304 response. The rendered
+    pages may also be kept in the page cache.
+
+    Parameters:
+        state_code: (str): The code of the state of origin/destiny the trade
+        (default the first state available).
+        year: (int): The year of the trade (default the first year available).
+    """
+    # Check the URL before answering a conditional request, so that those
+    # for pages without data get a 404 error instead of a 304 response
+    month = get_page_month(state_code, year, month)
+    version = lookups.get_version()
+    key = get_page_key(state_code, year, month)
+    etag = hashlib.sha1(repr((key, version)).encode('utf-8')).hexdigest()
+    last_modified = get_version_time(version)
+    if not is_resource_modified(request.environ, etag=etag,
+                                last_modified=last_modified):
+        response = make_response('', 304)
+    else:
+        page = cache.pages.get_or_render(
+            key, version,
+            lambda: render_dashboard(state_code, year, month,
+                                     version).encode('utf-8'))
+        response = make_response(page)
+    response.set_etag(etag, weak=True)
+    response.last_modified = last_modified
+    response.headers['Cache-Control'] = \
+        f'public, max-age={current_app.config.get("PAGE_MAX_AGE", 0)}'
+    return response
+
+
 def page_not_found(e):
     return render_template('404.html'), 404
 
@@ -345,4 +441,21 @@ def init_app(app):
                      view_func=dashboard)
     app.add_url_rule('/dashboard/<string:state_code>/<int:year>/<int:month>',
                      view_func=dashboard)
+    kinds = '<any(import, export):kind>'
+    # The extension of the images of the chart backend
+    extension = '<any(png, svg):extension>'
+    app.add_url_rule(
+        f'/chart/top-products/{kinds}/<string:state_code>/<int:year>.'
+        f'{extension}',
+        view_func=top_products_chart)
+    app.add_url_rule(
+        f'/chart/top-products/{kinds}/<string:state_code>/<int:year>/'
+        f'<int:month>.{extension}',
+        view_func=top_products_chart)
+    app.add_url_rule(f'/chart/top-states/{kinds}/<int:year>.{extension}',
+                     view_func=top_states_chart)
+    app.add_url_rule(
+        f'/chart/contribution/{kinds}/<string:state_code>/<int:year>.'
+        f'{extension}',
+        view_func=contribution_chart)
     app.register_error_handler(404, page_not_found)
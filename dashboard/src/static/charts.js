@@ -0,0 +1,259 @@
+// Draw the charts of the dashboard in the browser, as SVG images like those
+// of src/charts/svg.py, from the data of the JSON API (see src/api.py).
+// Each chart is a <figure class="chart"> with the type of plot, the URL of
+// its data and the options of the plot in data attributes.
+(function () {
+    'use strict';
+
+    var DPI = 100;
+    var FONT = 'DejaVu Sans, Bitstream Vera Sans, Arial, sans-serif';
+    var FONT_SIZE = 10 * DPI / 72;
+    var TITLE_SIZE = 12 * DPI / 72;
+    // Approximate width of a character, relative to the size of the font
+    var CHAR_WIDTH = 0.55;
+    var BAR_COLOR = '#1f77b4';
+    var PERCENTAGE_THRESHOLD = 3;
+
+    function escape(text) {
+        return String(text).replace(/&/g, '&amp;').replace(/</g, '&lt;')
+            .replace(/>/g, '&gt;').replace(/"/g, '&quot;');
+    }
+
+    function largeNumFormat(num) {
+        var units = ['', 'mil', 'Mi.', 'Bi.'];
+        for (var i = 0; i < units.length; i++) {
+            if (Math.abs(num) < 1000) {
+                return num.toFixed(1) + ' ' + units[i];
+            }
+            num /= 1000;
+        }
+        return num.toFixed(1) + ' Tri.';
+    }
+
+    function pctFormat(percent, skipSmallValues) {
+        if (percent <= PERCENTAGE_THRESHOLD && skipSmallValues) {
+            return '';
+        }
+        return percent.toFixed(1) + '%';
+    }
+
+    // Break the text into lines of at most width characters
+    function fill(text, width) {
+        var lines = [];
+        var line = '';
+        text.split(/\s+/).forEach(function (word) {
+            if (line && line.length + word.length + 1 > width) {
+                lines.push(line);
+                line = word;
+            } else {
+                line = line ? line + ' ' + word : word;
+            }
+        });
+        lines.push(line);
+        return lines.join('\n');
+    }
+
+    // Get a text element with its lines centered vertically on the point
+    function text(x, y, content, attributes) {
+        attributes = attributes || {};
+        var size = attributes.size || FONT_SIZE;
+        var lines = String(content).split('\n');
+        var extra = '';
+        if (attributes.rotate !== undefined) {
+            extra += ' transform="rotate(' + attributes.rotate + ' ' + x +
+                ' ' + y + ')"';
+        }
+        if (attributes.fill) {
+            extra += ' fill="' + attributes.fill + '"';
+        }
+        if (attributes.bold) {
+            extra += ' font-weight="bold"';
+        }
+        var firstDy = 0.35 - 1.2 * (lines.length - 1) / 2;
+        var tspans = lines.map(function (line, i) {
+            return '<tspan x="' + x + '" dy="' +
+                (i === 0 ? firstDy : 1.2) + 'em">' + escape(line) +
+                '</tspan>';
+        }).join('');
+        return '<text x="' + x + '" y="' + y + '" font-size="' + size +
+            '" text-anchor="' + (attributes.anchor || 'middle') + '"' +
+            extra + '>' + tspans + '</text>';
+    }
+
+    function svg(width, height, elements) {
+        return '<svg xmlns="http://www.w3.org/2000/svg" width="' + width +
+            '" height="' + height + '" viewBox="0 0 ' + width + ' ' +
+            height + '" font-family="' + FONT + '">' +
+            '<rect width="100%" height="100%" fill="white"/>' +
+            elements.join('') + '</svg>';
+    }
+
+    function textWidth(content) {
+        var longest = Math.max.apply(null, String(content).split('\n')
+            .map(function (line) { return line.length; }));
+        return longest * FONT_SIZE * CHAR_WIDTH;
+    }
+
+    // Get a round step for about the given number of intervals up to the
+    // limit
+    function tickStep(limit, intervals) {
+        var magnitude = Math.pow(10, Math.floor(
+            Math.log10(limit / intervals)));
+        var factors = [1, 2, 2.5, 5, 10];
+        for (var i = 0; i < factors.length; i++) {
+            if (magnitude * factors[i] * intervals >= limit) {
+                return magnitude * factors[i];
+            }
+        }
+        return magnitude * 10;
+    }
+
+    // Make a horizontal bar plot of the totals
+    function barPlot(labels, totals, options) {
+        var width = 10 * DPI;
+        var height = (totals.length * 0.5 + 1.5) * DPI;
+        labels = labels.map(function (label) { return fill(label, 50); });
+        var left = 15 + 1.5 * FONT_SIZE + 10 +
+            Math.max.apply(null, labels.map(textWidth).concat([0]));
+        var right = width - 15 - textWidth('999.9 Mi.');
+        var top = 15 + (options.title ? TITLE_SIZE * 1.5 : 0);
+        var bottom = height - 15 - 3 * FONT_SIZE;
+
+        var xLimit = 1.05 * Math.max.apply(null, totals.concat([0])) || 1;
+        // Limits of the axes, with margins like those of matplotlib
+        var yMargin = 0.05 * (totals.length - 0.5);
+        var yLow = -0.25 - yMargin;
+        var yHigh = totals.length - 0.75 + yMargin;
+        function getX(value) {
+            return left + (right - left) * value / xLimit;
+        }
+        function getY(value) {
+            return bottom - (bottom - top) * (value - yLow) / (yHigh - yLow);
+        }
+
+        var elements = [];
+        if (options.title) {
+            elements.push(text(width / 2, 15 + TITLE_SIZE * 0.6,
+                               options.title, {size: TITLE_SIZE}));
+        }
+        var barHeight = (bottom - top) * 0.5 / (yHigh - yLow);
+        totals.forEach(function (total, i) {
+            var y = getY(i);
+            elements.push('<rect x="' + left + '" y="' +
+                          (y - barHeight / 2) + '" width="' +
+                          (getX(total) - left) + '" height="' + barHeight +
+                          '" fill="' + BAR_COLOR + '"/>');
+            elements.push(text(getX(total), y, largeNumFormat(total),
+                               {anchor: 'start', fill: 'blue', bold: true}));
+            elements.push(text(left - 7, y, labels[i], {anchor: 'end'}));
+        });
+        var step = tickStep(xLimit, 8);
+        for (var j = 0; j * step <= xLimit; j++) {
+            var tick = j * step;
+            elements.push('<line x1="' + getX(tick) + '" y1="' + bottom +
+                          '" x2="' + getX(tick) + '" y2="' + (bottom + 3.5) +
+                          '" stroke="black"/>');
+            elements.push(text(getX(tick), bottom + 5 + FONT_SIZE * 0.6,
+                               largeNumFormat(tick)));
+        }
+        elements.push('<rect x="' + left + '" y="' + top + '" width="' +
+                      (right - left) + '" height="' + (bottom - top) +
+                      '" fill="none" stroke="black" stroke-width="0.8"/>');
+        elements.push(text((left + right) / 2, height - 15 - FONT_SIZE / 2,
+                           'Valor total anual (US$)'));
+        elements.push(text(15 + FONT_SIZE / 2, (top + bottom) / 2,
+                           options.ylabel || 'Produto', {rotate: -90}));
+        return svg(width, height, elements);
+    }
+
+    // Make a pie chart of the percentage of contribution of each state,
+    // highlighting the given state
+    function piePlot(data, options) {
+        var width = 640;
+        var height = 480;
+        var titleLines = options.title ? options.title.split('\n').length : 0;
+        var top = 20 + (titleLines ? titleLines * TITLE_SIZE * 1.2 + 20 : 0);
+        var radius = Math.min(width, height - top) * 0.3;
+        var cx = width / 2;
+        var cy = top + (height - top) / 2;
+        var elements = [];
+        if (titleLines) {
+            elements.push(text(cx, 20 + titleLines * TITLE_SIZE * 0.6,
+                               options.title, {size: TITLE_SIZE}));
+        }
+        var sum = data.totals.reduce(function (a, b) { return a + b; }, 0) ||
+            1;
+        // Start at the top and go counterclockwise, as matplotlib does
+        var angle = 90;
+        data.totals.forEach(function (total, i) {
+            var current = data.state_codes[i] === options.state;
+            var percentage = data.percentages[i];
+            var sweep = 360 * total / sum;
+            var middle = (angle + sweep / 2) * Math.PI / 180;
+            var explode = current ? 0.2 : 0.03;
+            var color = current ? '#66F' : '#CCC';
+            var x = cx + explode * radius * Math.cos(middle);
+            var y = cy - explode * radius * Math.sin(middle);
+            if (sweep >= 360) {
+                elements.push('<circle cx="' + x + '" cy="' + y + '" r="' +
+                              radius + '" fill="' + color + '"/>');
+            } else if (sweep > 0) {
+                var start = angle * Math.PI / 180;
+                var end = (angle + sweep) * Math.PI / 180;
+                elements.push(
+                    '<path d="M' + x + ',' + y + ' L' +
+                    (x + radius * Math.cos(start)) + ',' +
+                    (y - radius * Math.sin(start)) + ' A' + radius + ',' +
+                    radius + ' 0 ' + (sweep > 180 ? 1 : 0) + ' 0 ' +
+                    (x + radius * Math.cos(end)) + ',' +
+                    (y - radius * Math.sin(end)) + ' Z" fill="' + color +
+                    '"/>');
+            }
+            var percent = pctFormat(100 * total / sum, true);
+            if (percent) {
+                elements.push(text(x + 0.6 * radius * Math.cos(middle),
+                                   y - 0.6 * radius * Math.sin(middle),
+                                   percent));
+            }
+            // Show the percentage of a small contribution of the state in
+            // its label, since it would not fit inside its slice
+            var label = '';
+            if (percentage > PERCENTAGE_THRESHOLD) {
+                label = data.states[i];
+            } else if (current) {
+                label = data.states[i] + ' (' +
+                    pctFormat(percentage, false) + ')';
+            }
+            if (label) {
+                var lx = x + 1.1 * radius * Math.cos(middle);
+                elements.push(text(lx, y - 1.1 * radius * Math.sin(middle),
+                                   label, {anchor: lx > x ? 'start' : 'end'}));
+            }
+            angle += sweep;
+        });
+        return svg(width, height, elements);
+    }
+
+    function draw(figure) {
+        var options = JSON.parse(figure.dataset.options);
+        return fetch(figure.dataset.url).then(function (response) {
+            if (!response.ok) {
+                throw new Error(response.status + ' ' + response.statusText);
+            }
+            return response.json();
+        }).then(function (data) {
+            if (figure.dataset.plot === 'pie') {
+                figure.innerHTML = piePlot(data, options);
+            } else {
+                figure.innerHTML = barPlot(data.products || data.states,
+                                           data.totals, options);
+            }
+        }).catch(function (error) {
+            figure.textContent = 'Erro ao carregar o gráfico: ' + error;
+        });
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        document.querySelectorAll('figure.chart[data-url]').forEach(draw);
+    });
+}());
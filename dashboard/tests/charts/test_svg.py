@@ -0,0 +1,64 @@
+from xml.dom import minidom
+
+import pytest
+from src.charts import get_backend, svg
+
+ROWS = [('SP', 'São Paulo', 50, 50.0), ('RJ', 'Rio de Janeiro', 48, 48.0),
+        ('AC', 'Acre', 2, 2.0)]
+
+
+def get_texts(image):
+    document = minidom.parseString(image)
+    return [''.join(node.data for node in tspan.childNodes)
+            for tspan in document.getElementsByTagName('tspan')]
+
+
+class TestSvgCharts:
+
+    def test_plot(self):
+        image = svg.get_plot(['Abelhas', 'Óleos & <gorduras>'], [100, 2000],
+                             title='Produtos')
+        texts = get_texts(image)
+        assert 'Produtos' in texts
+        assert 'Óleos & <gorduras>' in texts
+        assert '2.0 mil' in texts
+        assert b'&lt;gorduras&gt;' in image
+
+    def test_long_labels_are_wrapped(self):
+        label = 'Partes e acessórios dos veículos automóveis das posições ' \
+            '87.01 a 87.05'
+        texts = get_texts(svg.get_plot([label], [300100200]))
+        assert 'Partes e acessórios dos veículos automóveis das' in texts
+        assert '300.1 Mi.' in texts
+
+    def test_contribution_plot(self):
+        image = svg.get_contribution_plot(ROWS, 'AC', title='Contribuição')
+        texts = get_texts(image)
+        assert texts == ['Contribuição', '50.0%', 'São Paulo', '48.0%',
+                         'Rio de Janeiro', 'Acre (2.0%)']
+        assert image.count(b'fill="#66F"') == 1
+
+
+class TestChartBackend:
+
+    def test_unknown_backend(self, app, monkeypatch):
+        monkeypatch.setitem(app.config, 'CHART_BACKEND', 'ascii')
+        with app.app_context(), pytest.raises(ValueError):
+            get_backend()
+
+    def test_svg_charts(self, app, client, monkeypatch):
+        monkeypatch.setitem(app.config, 'CHART_BACKEND', 'svg')
+        response = client.get('/chart/top-states/import/2019.svg')
+        assert response.status_code == 200
+        assert response.mimetype == 'image/svg+xml'
+        minidom.parseString(response.data)
+        assert client.get('/chart/top-states/import/2019.png').status_code \
+            == 404
+
+    def test_dashboard_with_svg_charts(self, app, client, monkeypatch):
+        monkeypatch.setitem(app.config, 'CHART_BACKEND', 'svg')
+        response = client.get('/dashboard/SP/2019')
+        assert response.data.count(b'.svg?v=') == 6
+        monkeypatch.setitem(app.config, 'INLINE_CHARTS', True)
+        response = client.get('/dashboard/SP/2019')
+        assert response.data.count(b'src="data:image/svg+xml;base64,') == 6
@@ -0,0 +1,51 @@
+import os
+
+from src.commands.charts import (CURRENT_LINK, get_static_path,
+                                 get_version_dir)
+from src.lookups import lookups
+
+
+class TestGetStaticPath:
+
+    def test_chart(self):
+        assert get_static_path('out', '/chart/top-states/import/2019.png'
+                               '?v=1') == \
+            os.path.join('out', 'chart', 'top-states', 'import', '2019.png')
+
+    def test_page(self):
+        assert get_static_path('out', '/dashboard/SP/2019') == \
+            os.path.join('out', 'dashboard', 'SP', '2019', 'index.html')
+
+
+class TestPrerender:
+
+    def test_all_charts_and_pages(self, client, runner, tmp_path):
+        result = runner.invoke(args=['charts', 'prerender', '--output-dir',
+                                     str(tmp_path), '--jobs', 1])
+        assert result.exit_code == 0, result.output
+        version = lookups.get_version()
+        current = tmp_path / CURRENT_LINK
+        assert os.readlink(current) == get_version_dir(version)
+        page = current / 'dashboard' / 'SP' / '2019' / 'index.html'
+        assert page.read_bytes() == client.get('/dashboard/SP/2019').data
+        chart = current / 'chart' / 'top-products' / 'export' / 'SP' / \
+            '2019.png'
+        assert chart.read_bytes() == \
+            client.get('/chart/top-products/export/SP/2019.png').data
+        # 6 charts of each of the 2 years
+        assert len(list((current / 'chart').glob('**/*.png'))) == 12
+
+    def test_older_versions_are_removed(self, client, runner, tmp_path):
+        old_dir = get_version_dir('20200101000000000000')
+        (tmp_path / old_dir / 'dashboard').mkdir(parents=True)
+        runner.invoke(args=['charts', 'prerender', '--output-dir',
+                            str(tmp_path), '--jobs', 1])
+        version_dirs = [name for name in os.listdir(tmp_path)
+                        if name.startswith('v-')]
+        assert version_dirs == [get_version_dir(lookups.get_version())]
+
+    def test_other_files_are_kept(self, client, runner, tmp_path):
+        (tmp_path / 'other' / 'dashboard').mkdir(parents=True)
+        runner.invoke(args=['charts', 'prerender', '--output-dir',
+                            str(tmp_path), '--jobs', 1])
+        assert (tmp_path / 'other' / 'dashboard').is_dir()
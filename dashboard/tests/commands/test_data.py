@@ -1,4 +1,13 @@
-from src.commands.data import get_products, get_states
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from src.commands.data import (TRADE_COLUMNS, get_products, get_states,
+                               get_top_positions, get_trades)
+from src.manifest import (get_checksum, get_fingerprint, is_unchanged,
+                          update_fingerprint)
 
 
 class TestGetProducts:
@@ -111,55 +120,55 @@ class TestAggregateByMonthAndStateAndAdd:
         query = 'SELECT * FROM top_by_state_and_month'
         expected = [
             ('GO', 'Goiás', 2019, 1, 'import', 29393010, 'Cafeína', 237),
-            ('GO', 'Goiás', 2019, 4, 'import', 29393010, 'Cafeína', 882),
-            ('GO', 'Goiás', 2019, 6, 'import', 29393010, 'Cafeína', 2964),
-            ('GO', 'Goiás', 2019, 11, 'import', 29393010, 'Cafeína', 252),
             ('GO', 'Goiás', 2019, 2, 'import', 29061100, 'Mentol', 2028),
+            ('GO', 'Goiás', 2019, 4, 'import', 29393010, 'Cafeína', 882),
             ('GO', 'Goiás', 2019, 5, 'import', 29061100, 'Mentol', 1292),
+            ('GO', 'Goiás', 2019, 6, 'import', 29393010, 'Cafeína', 2964),
             ('GO', 'Goiás', 2019, 7, 'import', 29061100, 'Mentol', 466),
             ('GO', 'Goiás', 2019, 8, 'import', 29061100, 'Mentol', 2340),
+            ('GO', 'Goiás', 2019, 11, 'import', 29393010, 'Cafeína', 252),
             ('RJ', 'Rio de Janeiro', 2019, 1, 'import', 90153000, 'Níveis',
              72),
             ('RJ', 'Rio de Janeiro', 2019, 2, 'import', 90153000, 'Níveis',
              2111),
-            ('RJ', 'Rio de Janeiro', 2019, 7, 'import', 90153000, 'Níveis',
-             664),
-            ('RJ', 'Rio de Janeiro', 2019, 10, 'import', 90153000, 'Níveis',
-             2188),
             ('RJ', 'Rio de Janeiro', 2019, 4, 'import', 19059020, 'Bolachas',
              942),
-            ('RJ', 'Rio de Janeiro', 2019, 9, 'import', 19059020, 'Bolachas',
-             2239),
             ('RJ', 'Rio de Janeiro', 2019, 5, 'import', 48202000, 'Cadernos',
              42),
             ('RJ', 'Rio de Janeiro', 2019, 6, 'import', 48202000, 'Cadernos',
              1202),
-            ('SC', 'Santa Catarina', 2019, 1, 'import', 48202000, 'Cadernos',
-             1872),
-            ('SC', 'Santa Catarina', 2019, 7, 'import', 48202000, 'Cadernos',
-             84),
-            ('SC', 'Santa Catarina', 2019, 8, 'import', 48202000, 'Cadernos',
-             8974),
-            ('SC', 'Santa Catarina', 2019, 10, 'import', 48202000, 'Cadernos',
-             4855),
+            ('RJ', 'Rio de Janeiro', 2019, 7, 'import', 90153000, 'Níveis',
+             664),
+            ('RJ', 'Rio de Janeiro', 2019, 9, 'import', 19059020, 'Bolachas',
+             2239),
+            ('RJ', 'Rio de Janeiro', 2019, 10, 'import', 90153000, 'Níveis',
+             2188),
             ('RJ', 'Rio de Janeiro', 2019, 11, 'import', 22086000, 'Vodca',
              6458),
             ('RJ', 'Rio de Janeiro', 2019, 12, 'import', 22086000, 'Vodca',
              25024),
+            ('SC', 'Santa Catarina', 2019, 1, 'import', 48202000, 'Cadernos',
+             1872),
             ('SC', 'Santa Catarina', 2019, 2, 'import', 96091000, 'Lápis',
              274563),
+            ('SC', 'Santa Catarina', 2019, 3, 'import', 84831040, 'Manivelas',
+             1054),
             ('SC', 'Santa Catarina', 2019, 4, 'import', 96091000, 'Lápis',
              828),
             ('SC', 'Santa Catarina', 2019, 5, 'import', 96091000, 'Lápis',
              623828),
+            ('SC', 'Santa Catarina', 2019, 6, 'import', 84831040, 'Manivelas',
+             1715),
+            ('SC', 'Santa Catarina', 2019, 7, 'import', 48202000, 'Cadernos',
+             84),
+            ('SC', 'Santa Catarina', 2019, 8, 'import', 48202000, 'Cadernos',
+             8974),
             ('SC', 'Santa Catarina', 2019, 9, 'import', 96091000, 'Lápis',
              36593),
+            ('SC', 'Santa Catarina', 2019, 10, 'import', 48202000, 'Cadernos',
+             4855),
             ('SC', 'Santa Catarina', 2019, 11, 'import', 96091000, 'Lápis',
              371146),
-            ('SC', 'Santa Catarina', 2019, 3, 'import', 84831040, 'Manivelas',
-             1054),
-            ('SC', 'Santa Catarina', 2019, 6, 'import', 84831040, 'Manivelas',
-             1715),
             ('TO', 'Tocantins', 2019, 1, 'import', 90051000, 'Binóculos', 530),
             ('TO', 'Tocantins', 2019, 3, 'import', 90051000, 'Binóculos', 460),
             ('TO', 'Tocantins', 2019, 5, 'import', 90051000, 'Binóculos', 757),
@@ -201,3 +210,430 @@ class TestAggregateStateContributionsAndAdd:
         ]
         actual = db.engine.execute(query).fetchall()
         assert actual == expected
+
+
+class TestAggregateAllAndAdd:
+
+    imports_path = 'dashboard/tests/IMP_2019-sample.csv'
+    products_path = 'dashboard/tests/NCM-sample-iso-8859-1.csv'
+    states_path = 'dashboard/tests/UF-sample-iso-8859-1.csv'
+    tables = ['top_by_state_and_year', 'top_by_state_and_month',
+              'state_contributions']
+
+    def get_rows(self, db):
+        return {table: db.engine.execute(f'SELECT * FROM {table}').fetchall()
+                for table in self.tables}
+
+    def test_same_rows_as_individual_commands(self, db, runner):
+        options = ['--kind', 'import', '--year', 2019]
+        for command in ['aggregate-by-state-and-add',
+                        'aggregate-by-month-and-state-and-add']:
+            runner.invoke(args=['data', command, self.imports_path,
+                                self.states_path, self.products_path,
+                                *options])
+        runner.invoke(args=['data', 'aggregate-state-contributions-and-add',
+                            self.imports_path, self.states_path, *options])
+        expected = self.get_rows(db)
+        for table in self.tables:
+            db.engine.execute(f'DELETE FROM {table}')
+
+        result = runner.invoke(args=['data', 'aggregate-all-and-add',
+                                     self.imports_path, self.states_path,
+                                     self.products_path, *options,
+                                     '--force'])
+        assert 'Finished ranking of products imported in 2019 by state.' \
+            in result.output
+        assert ('Finished ranking of products imported in 2019 by month '
+                'and state.') in result.output
+        assert ('Finished aggregation of states contributions to the '
+                'imports in 2019') in result.output
+        actual = self.get_rows(db)
+        assert all(actual[table] for table in self.tables)
+        assert actual == expected
+
+    def test_trade_totals(self, db, runner):
+        runner.invoke(args=['data', 'aggregate-all-and-add',
+                            self.imports_path, self.states_path,
+                            self.products_path, '--kind', 'import',
+                            '--year', 2019])
+        query = '''
+        SELECT state_code, SUM(total), COUNT(*)
+        FROM trade_totals
+        GROUP BY state_code
+        ORDER BY state_code
+        '''
+        expected = [('GO', 11624, 9), ('RJ', 43145, 17), ('SC', 1392246, 15),
+                    ('TO', 8099, 5)]
+        assert db.engine.execute(query).fetchall() == expected
+        query = '''
+        SELECT *
+        FROM trade_totals
+        WHERE state_code = 'TO' AND month = 8
+        '''
+        expected = [('import', 2019, 'TO', 8, 90051000, 'Tocantins',
+                     'Binóculos', 5638)]
+        assert db.engine.execute(query).fetchall() == expected
+
+    @pytest.mark.parametrize('command', [
+        'aggregate-by-state-and-add', 'aggregate-by-month-and-state-and-add'])
+    def test_trade_totals_of_product_rankings(self, db, runner, command):
+        options = ['--kind', 'import', '--year', 2019]
+        runner.invoke(args=['data', 'aggregate-all-and-add',
+                            self.imports_path, self.states_path,
+                            self.products_path, *options])
+        query = 'SELECT * FROM trade_totals ORDER BY 1, 2, 3, 4, 5'
+        expected = db.engine.execute(query).fetchall()
+        db.engine.execute('DELETE FROM trade_totals')
+
+        runner.invoke(args=['data', command, self.imports_path,
+                            self.states_path, self.products_path, *options,
+                            '--force'])
+        actual = db.engine.execute(query).fetchall()
+        assert actual and actual == expected
+
+
+class TestChunkedAggregation:
+
+    imports_path = 'dashboard/tests/IMP_2019-sample.csv'
+    products_path = 'dashboard/tests/NCM-sample-iso-8859-1.csv'
+    states_path = 'dashboard/tests/UF-sample-iso-8859-1.csv'
+    tables = ['top_by_state_and_year', 'top_by_state_and_month',
+              'state_contributions', 'trade_totals']
+
+    def get_rows(self, db):
+        rows = {table: db.engine.execute(f'SELECT * FROM {table}').fetchall()
+                for table in self.tables}
+        for table in self.tables:
+            db.engine.execute(f'DELETE FROM {table}')
+        return rows
+
+    @pytest.mark.parametrize('chunksize', [1, 7, 1000])
+    def test_same_rows_as_without_chunks(self, db, runner, chunksize):
+        options = ['--kind', 'import', '--year', 2019]
+        commands = [
+            ['aggregate-by-state-and-add', self.imports_path,
+             self.states_path, self.products_path, *options],
+            ['aggregate-by-month-and-state-and-add', self.imports_path,
+             self.states_path, self.products_path, *options],
+            ['aggregate-state-contributions-and-add', self.imports_path,
+             self.states_path, *options],
+            ['aggregate-all-and-add', self.imports_path, self.states_path,
+             self.products_path, *options]
+        ]
+        for command in commands:
+            runner.invoke(args=['data', *command, '--force'])
+            expected = self.get_rows(db)
+            result = runner.invoke(
+                args=['data', *command, '--chunksize', chunksize, '--force'])
+            assert result.exit_code == 0
+            actual = self.get_rows(db)
+            assert any(actual.values())
+            assert actual == expected
+
+
+class TestGetTrades:
+
+    imports_path = 'dashboard/tests/IMP_2019-sample.csv'
+
+    def test_for_compact_types(self):
+        trades = get_trades(self.imports_path, 2019, list(TRADE_COLUMNS))
+        actual = trades.dtypes.astype(str).to_dict()
+        expected = {'year': 'int16', 'month': 'int8', 'product_code': 'int32',
+                    'state_code': 'category', 'total': 'int64'}
+        assert actual == expected
+
+    def test_for_categories_of_all_chunks(self, monkeypatch):
+        monkeypatch.setattr('src.commands.data.READ_CHUNKSIZE', 7)
+        trades = get_trades(self.imports_path, 2019, list(TRADE_COLUMNS))
+        actual = list(trades['state_code'].cat.categories)
+        expected = ['GO', 'RJ', 'SC', 'TO']
+        assert actual == expected
+        assert len(trades) == 50
+
+    def test_for_rows_of_other_years(self):
+        trades = get_trades(self.imports_path, 2018, list(TRADE_COLUMNS))
+        assert len(trades) == 0
+
+
+class TestStage:
+
+    imports_path = 'dashboard/tests/IMP_2019-sample.csv'
+    products_path = 'dashboard/tests/NCM-sample-iso-8859-1.csv'
+    states_path = 'dashboard/tests/UF-sample-iso-8859-1.csv'
+    tables = ['top_by_state_and_year', 'top_by_state_and_month',
+              'state_contributions', 'trade_totals']
+
+    def get_rows(self, db):
+        rows = {table: db.engine.execute(f'SELECT * FROM {table}').fetchall()
+                for table in self.tables}
+        for table in self.tables:
+            db.engine.execute(f'DELETE FROM {table}')
+        return rows
+
+    def test_partitions(self, runner, tmp_path):
+        result = runner.invoke(args=['data', 'stage', self.imports_path,
+                                     str(tmp_path), '--kind', 'import',
+                                     '--year', 2019])
+        assert 'Finished staging the imports of 2019.' in result.output
+        partition = tmp_path / 'kind=import' / 'year=2019'
+        actual = sorted(path.name for path in partition.iterdir())
+        expected = [f'month={month}' for month in range(1, 13)]
+        assert actual == sorted(expected)
+
+    def test_skip_up_to_date(self, runner, tmp_path):
+        args = ['data', 'stage', self.imports_path, str(tmp_path),
+                '--kind', 'import', '--year', 2019]
+        runner.invoke(args=args)
+        result = runner.invoke(args=args)
+        assert 'The imports of 2019 are already staged.' in result.output
+        result = runner.invoke(args=args + ['--force'])
+        assert 'Finished staging the imports of 2019.' in result.output
+
+    def test_same_rows_as_csv(self, db, runner, tmp_path):
+        options = ['--kind', 'import', '--year', 2019]
+        runner.invoke(args=['data', 'stage', self.imports_path,
+                            str(tmp_path), *options])
+        runner.invoke(args=['data', 'aggregate-all-and-add',
+                            self.imports_path, self.states_path,
+                            self.products_path, *options])
+        expected = self.get_rows(db)
+        result = runner.invoke(args=['data', 'aggregate-all-and-add',
+                                     str(tmp_path), self.states_path,
+                                     self.products_path, *options])
+        assert result.exit_code == 0
+        actual = self.get_rows(db)
+        assert all(actual.values())
+        assert actual == expected
+
+    def test_other_kind_not_read(self, db, runner, tmp_path):
+        runner.invoke(args=['data', 'stage', self.imports_path,
+                            str(tmp_path), '--kind', 'import', '--year', 2019])
+        runner.invoke(args=['data', 'stage', self.imports_path,
+                            str(tmp_path), '--kind', 'export', '--year', 2019])
+        runner.invoke(args=['data', 'aggregate-state-contributions-and-add',
+                            str(tmp_path), self.states_path,
+                            '--kind', 'export', '--year', 2019])
+        query = 'SELECT SUM(total) FROM state_contributions'
+        assert db.engine.execute(query).scalar() == 1455114
+
+    def test_other_partition_restaged(self, runner, tmp_path):
+        for kind in ['import', 'export']:
+            runner.invoke(args=['data', 'stage', self.imports_path,
+                                str(tmp_path), '--kind', kind,
+                                '--year', 2019])
+        columns = list(TRADE_COLUMNS)
+        expected = get_trades(str(tmp_path), 2019, columns, kind='import')
+        # The files of the exports are being rewritten by another process,
+        # so they can not be read yet
+        for path in (tmp_path / 'kind=export').glob('**/*.parquet'):
+            path.write_bytes(b'PAR1')
+        actual = get_trades(str(tmp_path), 2019, columns, kind='import')
+        assert actual.equals(expected)
+        csv_trades = get_trades(self.imports_path, 2019, columns)
+        assert actual.dtypes.astype(str).to_dict() == \
+            csv_trades.dtypes.astype(str).to_dict()
+        assert len(actual) == len(csv_trades)
+
+    def test_partition_not_staged(self, db, runner, tmp_path):
+        runner.invoke(args=['data', 'stage', self.imports_path,
+                            str(tmp_path), '--kind', 'import', '--year', 2019])
+        result = runner.invoke(args=['data', 'aggregate-all-and-add',
+                                     str(tmp_path), self.states_path,
+                                     self.products_path, '--kind', 'export',
+                                     '--year', 2019])
+        assert result.exit_code == 1
+        assert isinstance(result.exception, SystemExit)
+        assert 'flask data stage' in result.output
+
+
+class TestBuildAll:
+
+    imports_path = 'dashboard/tests/IMP_2019-sample.csv'
+    products_path = 'dashboard/tests/NCM-sample-iso-8859-1.csv'
+    states_path = 'dashboard/tests/UF-sample-iso-8859-1.csv'
+    tables = ['top_by_state_and_year', 'top_by_state_and_month',
+              'state_contributions', 'trade_totals']
+
+    def get_rows(self, db):
+        rows = {table: db.engine.execute(
+            f'SELECT * FROM {table} ORDER BY kind').fetchall()
+            for table in self.tables}
+        for table in self.tables:
+            db.engine.execute(f'DELETE FROM {table}')
+        return rows
+
+    @pytest.fixture
+    def data_dir(self, tmp_path):
+        for name in ['IMP_2019.csv', 'EXP_2019.csv']:
+            shutil.copy(self.imports_path, tmp_path / name)
+        return tmp_path
+
+    @pytest.mark.parametrize('options', [[], ['--chunksize', 10]])
+    def test_same_rows_as_aggregate_all(self, db, runner, data_dir,
+                                        options):
+        for kind, name in [('import', 'IMP_2019.csv'),
+                           ('export', 'EXP_2019.csv')]:
+            runner.invoke(args=['data', 'aggregate-all-and-add',
+                                str(data_dir / name), self.states_path,
+                                self.products_path, '--kind', kind,
+                                '--year', 2019])
+        expected = self.get_rows(db)
+
+        result = runner.invoke(args=[
+            'data', 'build-all', str(data_dir), self.states_path,
+            self.products_path, '--first-year', 2019, '--last-year', 2019,
+            '--jobs', 2, '--stage-dir', str(data_dir / 'staged'), '--force',
+            *options
+        ])
+        assert 'Finished processing all files.' in result.output
+        actual = self.get_rows(db)
+        assert all(actual.values())
+        assert actual == expected
+        assert (data_dir / 'staged' / 'kind=export' / 'year=2019').is_dir()
+
+    def test_missing_file(self, db, runner, data_dir):
+        result = runner.invoke(args=[
+            'data', 'build-all', str(data_dir), self.states_path,
+            self.products_path, '--first-year', 2018, '--last-year', 2019,
+            '--kind', 'import'
+        ])
+        assert result.exit_code != 0
+        assert 'IMP_2018.csv' in result.output
+        query = 'SELECT COUNT(*) FROM top_by_state_and_year'
+        assert db.engine.execute(query).scalar() == 0
+
+
+class TestIncrementalReload:
+
+    imports_path = 'dashboard/tests/IMP_2019-sample.csv'
+    products_path = 'dashboard/tests/NCM-sample-iso-8859-1.csv'
+    states_path = 'dashboard/tests/UF-sample-iso-8859-1.csv'
+
+    @pytest.fixture
+    def data_dir(self, tmp_path):
+        shutil.copy(self.imports_path, tmp_path / 'IMP_2019.csv')
+        return tmp_path
+
+    def build_all(self, runner, data_dir):
+        return runner.invoke(args=[
+            'data', 'build-all', str(data_dir), self.states_path,
+            self.products_path, '--first-year', 2019, '--last-year', 2019,
+            '--kind', 'import', '--jobs', 1
+        ])
+
+    def get_totals(self, db):
+        query = 'SELECT SUM(total) FROM state_contributions'
+        return db.engine.execute(query).scalar()
+
+    def test_manifest(self, db, runner, data_dir):
+        self.build_all(runner, data_dir)
+        query = '''
+        SELECT table_name, kind, year, source, size
+        FROM source_manifest
+        ORDER BY table_name
+        '''
+        source = str(data_dir / 'IMP_2019.csv')
+        size = (data_dir / 'IMP_2019.csv').stat().st_size
+        expected = [
+            ('state_contributions', 'import', 2019, source, size),
+            ('top_by_state_and_month', 'import', 2019, source, size),
+            ('top_by_state_and_year', 'import', 2019, source, size),
+            ('trade_totals', 'import', 2019, source, size)
+        ]
+        assert db.engine.execute(query).fetchall() == expected
+
+    def test_skip_unchanged_file(self, db, runner, data_dir):
+        self.build_all(runner, data_dir)
+        result = self.build_all(runner, data_dir)
+        assert 'All files were already processed.' in result.output
+        assert self.get_totals(db) == 1455114
+
+    def test_skip_touched_file(self, db, runner, data_dir):
+        self.build_all(runner, data_dir)
+        os.utime(data_dir / 'IMP_2019.csv', (0, 0))
+        result = self.build_all(runner, data_dir)
+        assert 'Skipping unchanged file' in result.output
+        assert 'Finished ranking' not in result.output
+        result = self.build_all(runner, data_dir)
+        assert 'All files were already processed.' in result.output
+
+    def test_replace_changed_file(self, db, runner, data_dir):
+        self.build_all(runner, data_dir)
+        query = 'SELECT COUNT(*) FROM top_by_state_and_year'
+        count = db.engine.execute(query).scalar()
+        with open(data_dir / 'IMP_2019.csv', 'a') as f:
+            f.write('"2019";"01";"22086000";"10";"249";"RJ";"04";"0817600";'
+                    '0;0;1000\n')
+        result = self.build_all(runner, data_dir)
+        assert 'Finished ranking of products imported in 2019 by state.' \
+            in result.output
+        assert self.get_totals(db) == 1455114 + 1000
+        assert db.engine.execute(query).scalar() == count
+
+    def test_skip_single_command(self, db, runner):
+        args = ['data', 'aggregate-state-contributions-and-add',
+                self.imports_path, self.states_path,
+                '--kind', 'import', '--year', 2019]
+        runner.invoke(args=args)
+        result = runner.invoke(args=args)
+        assert 'were already aggregated' in result.output
+        result = runner.invoke(args=args + ['--force'])
+        assert 'Finished aggregation' in result.output
+        assert self.get_totals(db) == 1455114
+
+    def test_touched_file_is_checked_without_updating_manifest(self, db,
+                                                               runner,
+                                                               data_dir):
+        self.build_all(runner, data_dir)
+        csv_path = str(data_dir / 'IMP_2019.csv')
+        os.utime(csv_path, (0, 0))
+        fingerprint = get_fingerprint(csv_path)
+        tables = ['trade_totals']
+        assert not is_unchanged(tables, 'import', 2019, fingerprint)
+        fingerprint = fingerprint._replace(checksum=get_checksum(csv_path))
+        assert is_unchanged(tables, 'import', 2019, fingerprint)
+        query = 'SELECT mtime FROM source_manifest'
+        assert 0.0 not in {mtime for mtime, in
+                           db.engine.execute(query).fetchall()}
+        update_fingerprint(tables, 'import', 2019, fingerprint)
+        assert is_unchanged(tables, 'import', 2019,
+                            fingerprint._replace(checksum=None))
+
+
+class TestGetTopPositions:
+
+    def test_for_largest_values_of_each_group(self):
+        values = np.array([5, 1, 9, 7, 3, 2, 8, 4])
+        starts = np.array([0, 5])
+        positions, ranks = get_top_positions(values, starts, 2)
+        assert list(positions) == [2, 3, 6, 7]
+        assert list(ranks) == [1, 2, 1, 2]
+
+    def test_for_groups_smaller_than_n(self):
+        values = np.array([1, 2, 3, 4])
+        starts = np.array([0, 1, 3])
+        positions, ranks = get_top_positions(values, starts, 3)
+        assert list(positions) == [0, 2, 1, 3]
+        assert list(ranks) == [1, 1, 2, 1]
+
+    def test_for_deterministic_ties(self):
+        values = np.array([4, 7, 4, 4, 7, 1])
+        positions, ranks = get_top_positions(values, np.array([0]), 3)
+        assert list(positions) == [1, 4, 0]
+        assert list(ranks) == [1, 2, 3]
+
+    def test_for_no_groups(self):
+        positions, ranks = get_top_positions(np.array([]), np.array([]), 3)
+        assert len(positions) == len(ranks) == 0
+
+    def test_same_ranking_as_full_sort(self):
+        rng = np.random.default_rng(42)
+        values = rng.integers(0, 1000, 5000)
+        starts = np.array([0, 17, 18, 1000, 2500, 4999])
+        positions, ranks = get_top_positions(values, starts, 5)
+        expected = []
+        for start, end in zip(starts, np.append(starts[1:], len(values))):
+            group = values[start:end]
+            order = sorted(range(len(group)), key=lambda i: (-group[i], i))
+            expected += [start + i for i in order[:5]]
+        assert list(positions) == expected
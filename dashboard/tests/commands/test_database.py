@@ -13,9 +13,11 @@ class TestCreate:
         result = runner.invoke(args=['database', 'create'])
         actual = db.engine.table_names()
         expected = [
+            'source_manifest',
             'state_contributions',
             'top_by_state_and_month',
-            'top_by_state_and_year'
+            'top_by_state_and_year',
+            'trade_totals'
         ]
         assert actual == expected
         assert 'All tables were created' in result.output
@@ -27,9 +29,11 @@ class TestDrop:
         # Before running the command
         actual = db.engine.table_names()
         expected = [
+            'source_manifest',
             'state_contributions',
             'top_by_state_and_month',
-            'top_by_state_and_year'
+            'top_by_state_and_year',
+            'trade_totals'
         ]
         assert actual == expected
 
@@ -44,9 +48,11 @@ class TestDrop:
         # Before running the command
         actual = db.engine.table_names()
         expected = [
+            'source_manifest',
             'state_contributions',
             'top_by_state_and_month',
-            'top_by_state_and_year'
+            'top_by_state_and_year',
+            'trade_totals'
         ]
         assert actual == expected
 
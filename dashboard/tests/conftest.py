@@ -1,12 +1,16 @@
 import pytest
 from src import create_app
+from src.cache import charts
+from src.lookups import lookups
 from src.database import db as _db
-from src.model import StateContributions, TopByStateAndYear
+from src.model import StateContributions, TopByStateAndYear, TradeTotals
 
 
 @pytest.fixture(scope='session')
-def app():
+def app(tmp_path_factory):
     app = create_app('testing')
+    app.config['DIMENSION_CACHE_DIR'] = str(tmp_path_factory.mktemp('cache'))
+    app.config['CHART_CACHE_DIR'] = str(tmp_path_factory.mktemp('charts'))
     with app.app_context():
         yield app
 
@@ -24,8 +28,12 @@ def db(app):
 
 
 @pytest.fixture(scope='function')
-def client(app, db):
+def client(app, db, tmp_path):
     add_sample_data(db)
+    # Each test has its own data, so it must not get charts from other tests
+    charts.cache_dir = str(tmp_path / 'charts')
+    charts.clear()
+    lookups.clear()
     yield app.test_client()
 
 
@@ -86,6 +94,28 @@ def add_sample_data(db):
             total=300200100
         )
     ]
+    trade_totals = [
+        TradeTotals(
+            kind=kind,
+            year=2019,
+            state_code='SP',
+            month=month,
+            product_code=product_code,
+            state='São Paulo',
+            product=product,
+            total=total
+        )
+        for kind in ['import', 'export']
+        for month, product_code, product, total in [
+            (1, '01064100', 'Abelhas', 100200300),
+            (2, '01064100', 'Abelhas', 200300400),
+            (1, '90051000', 'Binóculos', 5638),
+            (2, '90051000', 'Binóculos', 400300200),
+            (1, '85171231', 'Telefones celulares', 300100200),
+            (3, '02011000', 'Carcaças de bovino', 1000)
+        ]
+    ]
     db.session.add_all(state_contributions)
     db.session.add_all(top_products)
+    db.session.add_all(trade_totals)
     db.session.commit()
@@ -0,0 +1,70 @@
+from src import routes
+from src.manifest import get_data_version
+
+
+class TestDataRoutes:
+
+    def test_states(self, client):
+        response = client.get('/api/states')
+        assert response.status_code == 200
+        assert response.get_json() == {'version': get_data_version(),
+                                       'state_codes': ['SP'],
+                                       'states': ['São Paulo']}
+
+    def test_years(self, client):
+        assert client.get('/api/years').get_json()['years'] == [2018, 2019]
+
+    def test_top_products(self, client):
+        data = client.get('/api/top-products/import/SP/2019').get_json()
+        assert data['products'] == ['Telefones celulares', 'Abelhas',
+                                    'Binóculos']
+        assert data['totals'] == [300100200, 300500700, 400305838]
+
+    def test_contributions(self, client):
+        data = client.get('/api/contributions/export/2019').get_json()
+        assert data['state_codes'] == ['SP']
+        assert data['totals'] == [111222333]
+        assert data['percentages'] == [4.44]
+        data = client.get('/api/contributions/export/2019',
+                          query_string={'limit': 0}).get_json()
+        assert data['state_codes'] == []
+
+    def test_missing_data(self, client):
+        for url in ['/api/top-products/transit/SP/2019',
+                    '/api/top-products/import/XX/2019',
+                    '/api/top-products/import/SP/2019/13',
+                    '/api/contributions/import/1900']:
+            assert client.get(url).status_code == 404
+        assert client.get('/api/contributions/import/2019',
+                          query_string={'limit': -1}).status_code == 400
+
+    def test_cache_headers(self, client):
+        url = '/api/top-products/export/SP/2019'
+        response = client.get(url)
+        assert response.cache_control.max_age == 60
+        etag, weak = response.get_etag()
+        assert etag and not weak
+        response = client.get(url, headers={'If-None-Match': f'"{etag}"'})
+        assert response.status_code == 304
+        response = client.get(url, query_string={'v': get_data_version()})
+        assert response.cache_control.max_age == routes.CHART_MAX_AGE
+
+
+class TestClientCharts:
+
+    def test_page_without_images(self, app, client, monkeypatch):
+        monkeypatch.setitem(app.config, 'CLIENT_CHARTS', True)
+
+        def fail(*args, **kwargs):
+            raise AssertionError('No chart should be rendered')
+        monkeypatch.setattr(routes, 'get_charts', fail)
+        response = client.get('/dashboard/SP/2019')
+        assert b'<img' not in response.data
+        assert response.data.count(b'<figure class="chart"') == 6
+        assert b'/static/charts.js' in response.data
+        version = get_data_version()
+        for url in ['/api/contributions/import/2019?limit=3&amp;v=',
+                    '/api/contributions/export/2019?v=',
+                    '/api/top-products/import/SP/2019?v=']:
+            assert bytes(f'data-url="{url}{version}"', 'utf-8') \
+                in response.data
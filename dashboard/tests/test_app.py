@@ -1,5 +1,8 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 
+from src import routes
+from src.model import SourceManifest
+from src.manifest import get_data_version
 from src.routes import get_month_name, large_num_formatter
 
 
@@ -75,3 +78,133 @@ class TestSomeRoutes:
         assert b'Dashboard' in response.data
         assert response.data.count(b'<img') == 6
         assert bytes('Estatísticas', 'utf-8') in response.data
+
+    def test_page_with_chart_urls(self, client):
+        response = client.get('/dashboard/SP/2019')
+        version = get_data_version()
+        for url in ['/chart/top-states/import/2019.png',
+                    '/chart/top-states/export/2019.png',
+                    '/chart/contribution/import/SP/2019.png',
+                    '/chart/contribution/export/SP/2019.png',
+                    '/chart/top-products/import/SP/2019.png',
+                    '/chart/top-products/export/SP/2019.png']:
+            assert bytes(f'src="{url}?v={version}"', 'utf-8') in response.data
+        assert b'data:image/png' not in response.data
+
+    def test_page_with_inline_charts(self, app, client, monkeypatch):
+        monkeypatch.setitem(app.config, 'INLINE_CHARTS', True)
+        response = client.get('/dashboard/SP/2019')
+        assert response.data.count(b'src="data:image/png;base64,') == 6
+
+
+class TestChartRoutes:
+    def test_chart_with_current_version(self, client):
+        version = get_data_version()
+        response = client.get('/chart/top-products/import/SP/2019.png',
+                              query_string={'v': version})
+        assert response.status_code == 200
+        assert response.mimetype == 'image/png'
+        assert response.data.startswith(b'\x89PNG')
+        etag, weak = response.get_etag()
+        assert etag and not weak
+        assert response.cache_control.public
+        assert response.cache_control.max_age == routes.CHART_MAX_AGE
+
+    def test_chart_without_version_must_be_revalidated(self, client):
+        response = client.get('/chart/contribution/export/SP/2019.png')
+        assert response.status_code == 200
+        assert response.cache_control.no_cache
+
+    def test_conditional_request(self, client):
+        url = '/chart/top-states/export/2019.png'
+        etag, _ = client.get(url).get_etag()
+        response = client.get(url, headers={'If-None-Match': f'"{etag}"'})
+        assert response.status_code == 304
+        assert not response.data
+
+    def test_monthly_chart(self, client, monkeypatch):
+        url = '/chart/top-products/export/SP/2019/1.png'
+        assert client.get(url).status_code == 404
+        monkeypatch.setattr(routes, 'get_month_options',
+                            lambda year: list(range(1, 13)))
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.data != client.get(
+            '/chart/top-products/export/SP/2019.png').data
+
+    def test_missing_charts(self, client):
+        for url in ['/chart/top-products/transit/SP/2019.png',
+                    '/chart/top-products/import/XX/2019.png',
+                    '/chart/top-products/import/SP/1900.png',
+                    '/chart/top-products/import/SP/2019/13.png',
+                    '/chart/top-states/import/1900.png',
+                    '/chart/contribution/import/XX/2019.png']:
+            assert client.get(url).status_code == 404
+
+
+class TestConditionalDashboard:
+    url = '/dashboard/SP/2019'
+
+    def add_manifest_entry(self, db, loaded_at):
+        db.session.add(SourceManifest(
+            table_name='trade_totals', kind='import', year=2019,
+            source='IMP_2019.csv', size=1, mtime=0.0, checksum='0',
+            loaded_at=loaded_at))
+        db.session.commit()
+
+    def test_headers(self, db, client):
+        self.add_manifest_entry(db, datetime(2020, 1, 2, 3, 4, 5, 678))
+        response = client.get(self.url)
+        assert response.status_code == 200
+        etag, weak = response.get_etag()
+        assert etag and weak
+        assert response.headers['Last-Modified'] == \
+            'Thu, 02 Jan 2020 03:04:05 GMT'
+        assert response.cache_control.public
+        assert response.cache_control.max_age == 60
+
+    def test_unchanged_page(self, db, client, monkeypatch):
+        self.add_manifest_entry(db, datetime(2020, 1, 2, 3, 4, 5, 678))
+        response = client.get(self.url)
+
+        def fail(*args, **kwargs):
+            raise AssertionError('The page should not be rendered')
+        monkeypatch.setattr(routes, 'render_dashboard', fail)
+        headers = {'If-None-Match': response.headers['ETag']}
+        not_modified = client.get(self.url, headers=headers)
+        assert not_modified.status_code == 304
+        assert not not_modified.data
+        headers = {'If-Modified-Since': response.headers['Last-Modified']}
+        assert client.get(self.url, headers=headers).status_code == 304
+
+    def test_page_changed_by_new_data(self, db, client):
+        self.add_manifest_entry(db, datetime(2020, 1, 2, 3, 4, 5, 678))
+        response = client.get(self.url)
+        db.session.query(SourceManifest).update(
+            {'loaded_at': datetime(2020, 1, 3)})
+        db.session.commit()
+        headers = {'If-None-Match': response.headers['ETag']}
+        response = client.get(self.url, headers=headers)
+        assert response.status_code == 200
+        assert response.data
+        headers = {'If-Modified-Since': datetime(2020, 1, 2)
+                   + timedelta(hours=12)}
+        assert client.get(self.url, headers=headers).status_code == 200
+
+    def test_other_pages_have_other_etags(self, client):
+        etag, _ = client.get(self.url).get_etag()
+        other_etag, _ = client.get('/dashboard/SP/2018').get_etag()
+        assert etag != other_etag
+
+    def test_conditional_requests_for_pages_without_data(self, db, client):
+        self.add_manifest_entry(db, datetime(2020, 1, 2, 3, 4, 5, 678))
+        response = client.get(self.url)
+        headers = {'If-Modified-Since': response.headers['Last-Modified']}
+        for url in ['/dashboard/ZZ/2019', '/dashboard/SP/1900']:
+            assert client.get(url, headers=headers).status_code == 404
+
+    def test_month_without_data(self, client):
+        etag, _ = client.get(self.url).get_etag()
+        response = client.get(self.url + '/77')
+        assert response.status_code == 200
+        assert response.get_etag()[0] == etag
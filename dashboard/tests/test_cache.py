@@ -0,0 +1,120 @@
+import os
+
+import pytest
+from src import routes
+from src.cache import RenderCache, charts, pages
+from src.charts import mpl
+from src.manifest import get_data_version, get_version_time
+from src.model import SourceManifest
+
+
+class TestRenderCache:
+
+    def test_get_missing_chart(self, tmp_path):
+        cache = RenderCache('CHART', cache_dir=str(tmp_path))
+        assert cache.get(('top-products', 'import', 'SP', 2019, None),
+                         '1') is None
+
+    def test_least_recently_used_charts_are_evicted(self):
+        cache = RenderCache('CHART', max_size=2)
+        cache.set('a', '1', b'A')
+        cache.set('b', '1', b'B')
+        assert cache.get('a', '1') == b'A'
+        cache.set('c', '1', b'C')
+        assert list(cache.items) == ['a', 'c']
+        assert cache.get('b', '1') is None
+
+    def test_charts_are_shared_on_disk(self, tmp_path):
+        cache = RenderCache('CHART', cache_dir=str(tmp_path))
+        other_cache = RenderCache('CHART', cache_dir=str(tmp_path))
+        cache.set('a', '1', b'A')
+        assert other_cache.get('a', '1') == b'A'
+        assert 'a' in other_cache.items
+
+    def test_charts_are_invalidated_by_new_versions(self, tmp_path):
+        cache = RenderCache('CHART', cache_dir=str(tmp_path))
+        cache.set('a', '1', b'A')
+        assert cache.get('a', '2') is None
+        assert not cache.items
+        assert len(os.listdir(tmp_path)) == 0
+        cache.set('a', '2', b'AA')
+        assert cache.get('a', '2') == b'AA'
+        assert len(os.listdir(tmp_path)) == 1
+
+    def test_other_directories_are_kept(self, tmp_path):
+        (tmp_path / 'data').mkdir()
+        (tmp_path / 'data' / 'trades.db').write_bytes(b'')
+        cache = RenderCache('CHART', cache_dir=str(tmp_path))
+        cache.set('a', '1', b'A')
+        cache.set('a', '2', b'AA')
+        assert sorted(os.listdir(tmp_path))[0] == 'data'
+        assert len(os.listdir(tmp_path)) == 2
+        assert (tmp_path / 'data' / 'trades.db').exists()
+
+    def test_get_or_render(self):
+        cache = RenderCache('CHART')
+        renders = []
+
+        def render():
+            renders.append(1)
+            return b'A'
+        assert cache.get_or_render('a', '1', render) == b'A'
+        assert cache.get_or_render('a', '1', render) == b'A'
+        assert len(renders) == 1
+
+
+class TestDataVersion:
+
+    def test_version_changes_when_data_is_loaded(self, db, runner):
+        assert get_data_version() == '0'
+        runner.invoke(args=['data', 'aggregate-all-and-add',
+                            'dashboard/tests/IMP_2019-sample.csv',
+                            'dashboard/tests/UF-sample-iso-8859-1.csv',
+                            'dashboard/tests/NCM-sample-iso-8859-1.csv',
+                            '--kind', 'import', '--year', 2019])
+        assert SourceManifest.query.count() == 4
+        version = get_data_version()
+        assert get_version_time(version) == \
+            SourceManifest.query.first().loaded_at
+        runner.invoke(args=['data', 'aggregate-all-and-add',
+                            'dashboard/tests/IMP_2019-sample.csv',
+                            'dashboard/tests/UF-sample-iso-8859-1.csv',
+                            'dashboard/tests/NCM-sample-iso-8859-1.csv',
+                            '--kind', 'import', '--year', 2019, '--force'])
+        assert get_data_version() != version
+
+
+class TestCachedDashboard:
+
+    def test_repeated_views_skip_rendering(self, app, client, monkeypatch):
+        monkeypatch.setitem(app.config, 'INLINE_CHARTS', True)
+        response = client.get('/dashboard/SP/2019')
+        assert response.status_code == 200
+        assert len(charts.items) == 6
+
+        def fail(*args, **kwargs):
+            pytest.fail('The chart should have been cached')
+        monkeypatch.setattr(mpl, 'get_plot', fail)
+        monkeypatch.setattr(mpl, 'get_contribution_plot', fail)
+        assert client.get('/dashboard/SP/2019').data == response.data
+        assert client.get('/chart/top-states/import/2019.png').status_code \
+            == 200
+        # Other workers get the charts from the disk
+        charts.clear()
+        assert client.get('/dashboard/SP/2019').data == response.data
+
+
+class TestPageCache:
+
+    def test_pages_are_cached_when_enabled(self, client, monkeypatch):
+        response = client.get('/dashboard/SP/2019')
+        assert not pages.items
+        monkeypatch.setattr(pages, 'max_size', 8)
+        assert client.get('/dashboard/SP/2019').data == response.data
+        assert len(pages.items) == 1
+
+        def fail(*args, **kwargs):
+            pytest.fail('The page should have been cached')
+        monkeypatch.setattr(routes, 'render_dashboard', fail)
+        assert client.get('/dashboard/SP/2019').data == response.data
+        pages.clear()
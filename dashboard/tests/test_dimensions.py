@@ -0,0 +1,62 @@
+import os
+import shutil
+
+import pytest
+
+from src.commands.data import get_states
+from src.dimensions import get_cache_path, load_names
+
+
+class TestLoadNames:
+
+    csv_path = 'dashboard/tests/UF-sample-iso-8859-1.csv'
+
+    @pytest.fixture
+    def states_path(self, tmp_path):
+        path = tmp_path / 'UF.csv'
+        shutil.copy(self.csv_path, path)
+        return str(path)
+
+    @pytest.fixture
+    def reader(self):
+        calls = []
+
+        def read_state_names(csv_path):
+            calls.append(csv_path)
+            return get_states(csv_path).set_index('state_code')['state']
+        read_state_names.calls = calls
+        return read_state_names
+
+    def test_for_names_by_code(self, states_path, reader):
+        names = load_names(states_path, reader)
+        assert names['RJ'] == 'Rio de Janeiro'
+        assert list(names.index) == ['TO', 'RJ', 'SC', 'GO', 'ZN']
+
+    def test_for_cache_hit(self, states_path, reader, tmp_path):
+        cache_dir = str(tmp_path / 'cache')
+        load_names(states_path, reader, cache_dir)
+        assert os.path.isfile(get_cache_path(states_path, cache_dir))
+        names = load_names(states_path, reader, cache_dir)
+        assert len(reader.calls) == 1
+        assert names['GO'] == 'Goiás'
+
+    def test_for_default_cache_dir(self, states_path, reader, tmp_path):
+        load_names(states_path, reader)
+        assert os.path.dirname(get_cache_path(states_path)) == \
+            str(tmp_path / '.cache')
+        assert os.path.isfile(get_cache_path(states_path))
+
+    def test_for_touched_file(self, states_path, reader):
+        load_names(states_path, reader)
+        os.utime(states_path, (0, 0))
+        load_names(states_path, reader)
+        load_names(states_path, reader)
+        assert len(reader.calls) == 1
+
+    def test_for_changed_file(self, states_path, reader):
+        load_names(states_path, reader)
+        with open(states_path, 'a', encoding='ISO-8859-1') as f:
+            f.write('"43";"RS";"Rio Grande do Sul";"REGIAO SUL"\n')
+        names = load_names(states_path, reader)
+        assert len(reader.calls) == 2
+        assert names['RS'] == 'Rio Grande do Sul'
@@ -0,0 +1,54 @@
+import os
+import re
+import subprocess
+import sys
+
+DASHBOARD_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Most seconds that importing the app (in each web worker and each command)
+# may take, with a margin for slower machines
+MAX_IMPORT_TIME = float(os.environ.get('MAX_IMPORT_TIME') or 1.0)
+
+# Modules which only some commands (or the charts) need
+HEAVY_MODULES = {'matplotlib', 'numpy', 'pandas', 'pyarrow'}
+
+
+def get_import_times(*args):
+    '''
+    Run python with the given arguments and -X importtime, and get the
+    cumulative time (in seconds) taken to import each module
+    '''
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime'] + list(args),
+        cwd=DASHBOARD_DIR, capture_output=True, text=True, check=True,
+        env=dict(os.environ, FLASK_APP='wsgi', FLASK_ENV='testing'))
+    times = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r'import time:\s+\d+ \|\s+(\d+) \|\s+(\S+)$', line)
+        if match:
+            times[match.group(2)] = int(match.group(1)) / 1e6
+    return times
+
+
+def get_heavy_modules(times):
+    return HEAVY_MODULES & {name.split('.')[0] for name in times}
+
+
+class TestImports:
+
+    def test_app_does_not_import_heavy_modules(self):
+        assert get_heavy_modules(get_import_times('-c', 'import wsgi')) == \
+            set()
+
+    def test_app_import_time(self):
+        # The best of a few runs, as the first ones may read from the disk
+        best = min(get_import_times('-c', 'import wsgi')['wsgi']
+                   for _ in range(3))
+        assert best < MAX_IMPORT_TIME
+
+    def test_commands_do_not_import_matplotlib(self):
+        times = get_import_times('-m', 'flask', 'data', '--help')
+        assert 'pandas' in times
+        assert 'matplotlib' not in get_heavy_modules(times)
+        times = get_import_times('-m', 'flask', 'database', '--help')
+        assert get_heavy_modules(times) == set()
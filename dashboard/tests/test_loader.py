@@ -0,0 +1,66 @@
+import pytest
+from sqlalchemy import event
+from src import queries
+from src.database import db as _db
+from src.loader import DashboardLoader, get_loader
+from src.lookups import lookups
+
+
+@pytest.fixture
+def statements(client):
+    '''
+    List of the statements executed in the database during the test
+    '''
+    executed = []
+
+    def add_statement(conn, cursor, statement, *args):
+        executed.append(statement)
+    event.listen(_db.engine, 'before_cursor_execute', add_statement)
+    yield executed
+    event.remove(_db.engine, 'before_cursor_execute', add_statement)
+
+
+class TestDashboardLoader:
+
+    @pytest.mark.parametrize('kind', ['import', 'export'])
+    @pytest.mark.parametrize('limit', [1, 3, None])
+    def test_same_contributions_as_queries(self, client, kind, limit):
+        loader = DashboardLoader()
+        assert loader.get_top_contributions(kind, 2019, limit) == \
+            queries.get_top_contributions(kind, 2019, limit)
+
+    @pytest.mark.parametrize('kind', ['import', 'export'])
+    @pytest.mark.parametrize('month', [None, 1, 3])
+    @pytest.mark.parametrize('count', [1, 3, 10])
+    def test_same_top_products_as_queries(self, client, kind, month, count):
+        loader = DashboardLoader()
+        assert loader.get_top_products(kind, 'SP', 2019, month, count) == \
+            queries.get_top_products(kind, 'SP', 2019, month, count)
+
+    def test_datasets_are_loaded_once(self, client, statements):
+        loader = DashboardLoader()
+        for kind in ['import', 'export']:
+            loader.get_top_contributions(kind, 2019)
+            loader.get_top_contributions(kind, 2019, limit=None)
+            loader.get_top_products(kind, 'SP', 2019, None)
+        assert len(statements) == 2
+
+    def test_loader_is_request_scoped(self, app, client):
+        with app.test_request_context():
+            loader = get_loader()
+            assert get_loader() is loader
+        with app.test_request_context():
+            assert get_loader() is not loader
+
+
+class TestDashboardQueries:
+
+    def test_round_trips_of_a_yearly_page(self, app, client, statements,
+                                          monkeypatch):
+        monkeypatch.setitem(app.config, 'INLINE_CHARTS', True)
+        monkeypatch.setattr(lookups, 'ttl', 60)
+        lookups.get_snapshot()
+        statements.clear()
+        response = client.get('/dashboard/SP/2019')
+        assert response.data.count(b'src="data:image/png;base64,') == 6
+        assert len(statements) == 2
@@ -0,0 +1,63 @@
+from datetime import datetime
+
+import pytest
+from src import lookups as lookups_module
+from src.lookups import Lookups
+from src.model import SourceManifest, StateContributions
+
+
+def add_manifest_entry(db, loaded_at):
+    db.session.merge(SourceManifest(
+        table_name='state_contributions', kind='import', year=2019,
+        source='IMP_2019.csv', size=1, mtime=0.0, checksum='0',
+        loaded_at=loaded_at))
+    db.session.commit()
+
+
+def add_state(db, state_code, state):
+    db.session.add(StateContributions(
+        kind='import', year=2019, state_code=state_code, state=state,
+        total=1, percentage=1.0))
+    db.session.commit()
+
+
+class TestLookups:
+
+    def test_values_are_immutable(self, client):
+        lookups = Lookups()
+        assert dict(lookups.get_state_names()) == {'SP': 'São Paulo'}
+        assert lookups.get_years() == (2018, 2019)
+        with pytest.raises(TypeError):
+            lookups.get_state_names()['RJ'] = 'Rio de Janeiro'
+
+    def test_values_are_reloaded_when_version_changes(self, db):
+        add_manifest_entry(db, datetime(2020, 1, 1))
+        add_state(db, 'SP', 'São Paulo')
+        lookups = Lookups()
+        assert list(lookups.get_state_names()) == ['SP']
+
+        add_state(db, 'AC', 'Acre')
+        assert list(lookups.get_state_names()) == ['SP']
+        add_manifest_entry(db, datetime(2020, 1, 2))
+        assert list(lookups.get_state_names()) == ['AC', 'SP']
+
+    def test_version_is_checked_after_ttl(self, db, monkeypatch):
+        lookups = Lookups(ttl=60)
+        assert lookups.get_version() == '0'
+        add_manifest_entry(db, datetime(2020, 1, 1))
+        assert lookups.get_version() == '0'
+        monkeypatch.setattr(lookups_module.time, 'monotonic',
+                            lambda: lookups.snapshot.checked_at + 60)
+        assert lookups.get_version() == '20200101000000000000'
+
+    def test_no_queries_within_ttl(self, client, monkeypatch):
+        lookups = Lookups(ttl=60)
+        lookups.get_snapshot()
+
+        def fail():
+            pytest.fail('The lookups should have been memoized')
+        monkeypatch.setattr(lookups_module, 'get_data_version', fail)
+        monkeypatch.setattr(lookups_module, 'load_state_names', fail)
+        monkeypatch.setattr(lookups_module, 'load_years', fail)
+        assert 'SP' in lookups.get_state_names()
+        assert 2019 in lookups.get_years()
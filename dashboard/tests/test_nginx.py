@@ -0,0 +1,36 @@
+import os
+import re
+
+import pytest
+
+NGINX_CONF = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir,
+                          'nginx', 'nginx.conf')
+
+# A location block (which has no nested blocks), with its modifier, its URI
+# and its directives
+LOCATION = re.compile(r'location\s+(?:(=)\s+)?(\S+)\s*\{([^{}]*)\}')
+
+
+@pytest.fixture(scope='module')
+def locations():
+    with open(NGINX_CONF) as f:
+        # Without the comments
+        conf = re.sub(r'#.*', '', f.read())
+    return {(modifier, uri): body
+            for modifier, uri, body in LOCATION.findall(conf)}
+
+
+class TestNginxConf:
+
+    def test_home_page_is_requested_from_the_app(self, locations):
+        # try_files would check the directory of the prerendered files for
+        # "/", and nginx would answer with a 403 error instead of the
+        # redirect of the app
+        body = locations['=', '/']
+        assert 'try_files' not in body
+        assert re.search(r'proxy_pass\s+http://flask-dashboard;', body)
+
+    def test_other_files_fall_back_to_the_app(self, locations):
+        for uri in ['/', '/chart/', '/dashboard/']:
+            assert re.search(r'try_files\s+\S+\s+@app;', locations['', uri])
+        assert 'proxy_pass' in locations['', '@app']
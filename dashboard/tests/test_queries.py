@@ -0,0 +1,71 @@
+from src import queries
+from src.queries import (get_state_names, get_top_contributions,
+                         get_top_products, get_top_products_of_kinds,
+                         get_years)
+
+
+class TestGetTopProducts:
+    def test_for_yearly_totals(self, client):
+        rows = get_top_products('import', 'SP', 2019, None)
+        assert rows == [('Telefones celulares', 'São Paulo', 300100200),
+                        ('Abelhas', 'São Paulo', 300500700),
+                        ('Binóculos', 'São Paulo', 400305838)]
+
+    def test_for_monthly_totals(self, client):
+        rows = get_top_products('export', 'SP', 2019, 1)
+        assert [product for product, _, _ in rows] == \
+            ['Binóculos', 'Abelhas', 'Telefones celulares']
+        assert [total for _, _, total in rows] == \
+            [5638, 100200300, 300100200]
+
+    def test_for_arbitrary_counts(self, client):
+        for count in range(1, 5):
+            rows = get_top_products('import', 'SP', 2019, None, count=count)
+            assert len(rows) == count
+        rows = get_top_products('import', 'SP', 2019, None, count=10)
+        assert len(rows) == 4
+        totals = [total for _, _, total in rows]
+        assert totals == sorted(totals)
+
+    def test_for_parameters_with_quotes(self, client):
+        assert get_top_products('import', "SP' OR 'a'='a", 2019, None) == []
+
+
+class TestGetTopProductsOfKinds:
+    def test_same_rows_as_for_each_kind(self, client):
+        for month in [None, 1]:
+            rows = get_top_products_of_kinds('SP', 2019, month, count=2)
+            assert rows == {
+                kind: get_top_products(kind, 'SP', 2019, month, count=2)
+                for kind in queries.KINDS}
+
+
+class TestGetTopContributions:
+    def test_with_limit(self, client):
+        assert get_top_contributions('export', 2019, limit=1) == \
+            [('SP', 'São Paulo', 111222333, 4.44)]
+
+    def test_without_limit(self, client):
+        assert get_top_contributions('import', 2019, limit=None) == \
+            [('SP', 'São Paulo', 123456789, 4.2)]
+        assert get_top_contributions('import', 2018, limit=None) == []
+
+
+class TestLookupQueries:
+    def test_state_names(self, client):
+        assert get_state_names() == [('SP', 'São Paulo')]
+
+    def test_years(self, client):
+        assert get_years() == [2018, 2019]
+
+    def test_no_years(self, db):
+        assert get_years() == []
+
+
+class TestCompiledCache:
+    def test_statements_are_compiled_once(self, client):
+        queries.COMPILED_CACHE.clear()
+        get_top_products('import', 'SP', 2019, None)
+        get_top_products('export', 'SP', 2019, None, count=5)
+        get_top_products('import', 'SP', 2019, 1)
+        assert len(queries.COMPILED_CACHE) == 2
@@ -0,0 +1,69 @@
+import pytest
+from src import queries
+from src.database import db as _db
+from src.manifest import DATA_VERSION
+
+# The queries run by the dashboard, with sample values of their parameters
+DASHBOARD_QUERIES = {
+    'data version': (DATA_VERSION, {}),
+    'state names': (queries.STATE_NAMES, {}),
+    'years': (queries.YEARS, {}),
+    'top products by month': (
+        queries.TOP_PRODUCTS_BY_MONTH,
+        {'kind': 'import', 'year': 2019, 'state_code': 'SP', 'month': 1,
+         'count': 3}),
+    'top products by year': (
+        queries.TOP_PRODUCTS_BY_YEAR,
+        {'kind': 'import', 'year': 2019, 'state_code': 'SP', 'count': 3}),
+    'top contributions': (
+        queries.TOP_CONTRIBUTIONS,
+        {'kind': 'import', 'year': 2019, 'limit': 3}),
+    'all contributions': (
+        queries.ALL_CONTRIBUTIONS, {'kind': 'import', 'year': 2019}),
+    'contributions of kinds': (
+        queries.CONTRIBUTIONS_OF_KINDS, {'year': 2019}),
+    'top products by month of kinds': (
+        queries.TOP_PRODUCTS_BY_MONTH_OF_KINDS,
+        {'year': 2019, 'state_code': 'SP', 'month': 1, 'count': 3}),
+    'top products by year of kinds': (
+        queries.TOP_PRODUCTS_BY_YEAR_OF_KINDS,
+        {'year': 2019, 'state_code': 'SP', 'count': 3}),
+}
+
+
+def get_sql(statement, params):
+    return str(statement.params(**params).compile(
+        dialect=_db.engine.dialect, compile_kwargs={'literal_binds': True}))
+
+
+def get_full_scans(connection, sql):
+    '''
+    Get the steps of the plan of the query which read a whole table (or a
+    whole index, besides the table)
+    '''
+    backend = connection.engine.url.get_backend_name()
+    if backend == 'sqlite':
+        plan = [row[-1].replace('SCAN TABLE ', 'SCAN ') for row in
+                connection.execute(f'EXPLAIN QUERY PLAN {sql}')]
+        # Scans of the (few) rows of subqueries and CTEs are fine
+        return [step for step in plan if step.startswith('SCAN ')
+                and step.split()[1] in _db.metadata.tables]
+    if backend == 'postgresql':
+        # Only use a sequential scan if there is no other way, since the
+        # tables of the tests are too small for the planner to avoid them.
+        # The setting only lasts until the end of the transaction.
+        with connection.begin():
+            connection.execute('SET LOCAL enable_seqscan = off')
+            plan = [row[0] for row in connection.execute(f'EXPLAIN {sql}')]
+        return [step for step in plan if 'Seq Scan' in step]
+    pytest.skip(f'Query plans are not checked on {backend}')
+
+
+class TestQueryPlans:
+
+    @pytest.mark.parametrize('name', list(DASHBOARD_QUERIES))
+    def test_no_full_scans(self, client, name):
+        statement, params = DASHBOARD_QUERIES[name]
+        with _db.engine.connect() as connection:
+            assert get_full_scans(connection,
+                                  get_sql(statement, params)) == []
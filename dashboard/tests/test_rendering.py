@@ -0,0 +1,78 @@
+import threading
+import time
+
+import pytest
+from src.rendering import RenderPool, run
+from src.charts.mpl import get_contribution_plot, get_plot
+
+JOBS = [
+    (get_plot, (['Abelhas', 'Binóculos'], [100, 2000]), {'title': 'A'}),
+    (get_plot, (['Telefones celulares'], [300100200]), {'ylabel': 'Estado'}),
+    (get_contribution_plot,
+     ([('SP', 'São Paulo', 50, 50.0), ('AC', 'Acre', 2, 2.0)],),
+     {'state': 'AC'}),
+]
+
+
+@pytest.fixture
+def pool():
+    pool = RenderPool(size=2)
+    yield pool
+    pool.stop()
+
+
+class TestRenderPool:
+
+    def test_same_images_as_without_pool(self, pool):
+        expected = [run(job) for job in JOBS]
+        assert pool.render_all(JOBS) == expected
+        assert all(image.startswith(b'\x89PNG') for image in expected)
+
+    def test_processes_are_started_once(self, pool):
+        pool.start()
+        processes = pool.pool
+        pool.render_all(JOBS)
+        assert pool.pool is processes
+
+    def test_processes_are_started_once_by_concurrent_threads(
+            self, pool, monkeypatch):
+        started = []
+
+        class Pool:
+            def __init__(self, *args, **kwargs):
+                started.append(self)
+                time.sleep(0.05)
+
+            def terminate(self):
+                pass
+
+            def join(self):
+                pass
+
+        monkeypatch.setattr('src.rendering.multiprocessing.Pool', Pool)
+        threads = [threading.Thread(target=pool.start) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(started) == 1
+        assert pool.pool is started[0]
+
+    def test_single_job_is_run_right_away(self, pool):
+        pool.render_all(JOBS[:1])
+        assert pool.pool is None
+
+    def test_pool_without_processes(self):
+        pool = RenderPool(size=0)
+        assert len(pool.render_all(JOBS)) == len(JOBS)
+        assert pool.pool is None
+
+
+class TestDashboardWithRenderPool:
+
+    def test_page_with_inline_charts(self, app, client, monkeypatch, pool):
+        monkeypatch.setitem(app.config, 'INLINE_CHARTS', True)
+        monkeypatch.setattr('src.rendering.pool', pool)
+        response = client.get('/dashboard/SP/2019')
+        assert response.data.count(b'src="data:image/png;base64,') == 6
+        assert pool.pool is not None